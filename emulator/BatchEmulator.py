@@ -0,0 +1,186 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+import numpy as np
+from HackEmulator import RAM_SIZE, ROM_SIZE, ADDRESS_MASK, SIGN_BIT, \
+    JUMP_LT, JUMP_EQ, JUMP_GT, DEST_A, DEST_D, DEST_M, halt_addresses
+
+
+def alu(x: np.ndarray, y: np.ndarray, control: int) -> np.ndarray:
+    """The ALU of project02/ALU.hdl, applied to many inputs at once. The
+    arrays are uint16, so the addition wraps around like the 16-bit adder.
+
+    Args:
+        x (np.ndarray): the x inputs.
+        y (np.ndarray): the y inputs.
+        control (int): the bits zx, nx, zy, ny, f, no, zx being the highest.
+
+    Returns:
+        np.ndarray: the outputs.
+    """
+    if control & 0b100000:
+        x = np.zeros_like(x)
+    if control & 0b010000:
+        x = ~x
+    if control & 0b001000:
+        y = np.zeros_like(y)
+    if control & 0b000100:
+        y = ~y
+    out = x + y if control & 0b000010 else x & y
+    if control & 0b000001:
+        out = ~out
+    return out
+
+
+def shift(value: np.ndarray, left: bool) -> np.ndarray:
+    """The shifts of project05/ExtendAlu.hdl. The right shift is arithmetic.
+
+    Args:
+        value (np.ndarray): uint16 inputs.
+        left (bool): shift left if True, right otherwise.
+
+    Returns:
+        np.ndarray: the outputs.
+    """
+    if left:
+        return value << 1
+    return (value.view(np.int16) >> 1).view(np.uint16)
+
+
+def decode(word: int) -> typing.Union[int, tuple]:
+    """Decodes a single instruction into the form run by BatchEmulator.
+
+    Args:
+        word (int): a 16-bit instruction.
+
+    Returns:
+        typing.Union[int, tuple]: the value of an A instruction, or a tuple
+        (control, shift, uses_m, dest, jump) for a C instruction, where
+        control holds the ALU bits, or is None for a shift, and shift is
+        (left, shift x) for a shift.
+    """
+    if not word & SIGN_BIT:
+        return word
+    if (word >> 13) & 0b11 == 0b11:
+        control, shift_bits = (word >> 6) & 0b111111, None
+    else:
+        control, shift_bits = None, (bool(word & 0x800), bool(word & 0x400))
+    return control, shift_bits, bool(word & 0x1000), (word >> 3) & 0b111, \
+        word & 0b111
+
+
+class BatchEmulator:
+    """Runs one Hack program on many machines at once, each with its own
+    registers and RAM, kept as NumPy arrays.
+
+    The machines are grouped by their PC, and a group executes its
+    instruction with vectorized operations, so machines that run the same
+    code in lockstep cost about as much as a single one. Machines halt at
+    the same places as HackEmulator.
+    """
+
+    def __init__(self, rom: typing.Sequence[int], n: int) -> None:
+        """Loads a program into n machines, with all their RAM cleared.
+
+        Args:
+            rom (typing.Sequence[int]): the program, one word per address.
+            n (int): number of machines.
+        """
+        if len(rom) > ROM_SIZE:
+            raise ValueError(f"Program too large: {len(rom)} words")
+        self.program = [decode(word) for word in rom]
+        self.program += [None] * (ROM_SIZE + 1 - len(self.program))
+        for address in halt_addresses(rom):
+            self.program[address] = None
+        self.n = n
+        self.ram = np.zeros((n, RAM_SIZE), dtype=np.uint16)
+        self.a = np.zeros(n, dtype=np.uint16)
+        self.d = np.zeros(n, dtype=np.uint16)
+        self.pc = np.zeros(n, dtype=np.int64)
+        self.halted = np.zeros(n, dtype=bool)
+        self.steps = np.zeros(n, dtype=np.int64)
+
+    def add_halt(self, address: int) -> None:
+        """Makes the machines halt when they reach the given address.
+
+        Args:
+            address (int): a ROM address.
+        """
+        self.program[address] = None
+
+    def run(self, max_steps: int = 1 << 62) -> int:
+        """Runs all machines until they halt or execute max_steps
+        instructions each.
+
+        Args:
+            max_steps (int): the maximal number of instructions each machine
+                executes in this run.
+
+        Returns:
+            int: the total number of instructions executed.
+        """
+        limit = self.steps + max_steps
+        total = 0
+        while True:
+            running = np.flatnonzero(~self.halted & (self.steps < limit))
+            if not running.size:
+                break
+            pcs = self.pc[running]
+            # the machines with the lowest PC go first. the others wait, so
+            # machines that took different branches meet again where the
+            # branches join, and run as one group from there on.
+            address = int(pcs.min())
+            machines = running[pcs == address]
+            if self.program[address] is None:
+                self.halted[machines] = True
+                continue
+            self.execute(address, machines)
+            self.steps[machines] += 1
+            total += len(machines)
+        return total
+
+    def execute(self, address: int, machines: np.ndarray) -> None:
+        """Executes the instruction at the given address on some machines.
+
+        Args:
+            address (int): the address of the instruction.
+            machines (np.ndarray): indices of machines whose PC is address.
+        """
+        op = self.program[address]
+        if op.__class__ is int:
+            self.a[machines] = op
+            self.pc[machines] = address + 1
+            return
+        control, shift_bits, uses_m, dest, jump = op
+        a = self.a[machines]
+        x = self.d[machines]
+        y = self.ram[machines, a & ADDRESS_MASK] if uses_m else a
+        if control is not None:
+            out = alu(x, y, control)
+        else:
+            left, shift_x = shift_bits
+            out = shift(x if shift_x else y, left)
+        # M is written at the address A had before this instruction
+        if dest & DEST_M:
+            self.ram[machines, a & ADDRESS_MASK] = out
+        if dest & DEST_D:
+            self.d[machines] = out
+        if dest & DEST_A:
+            self.a[machines] = out
+        if not jump:
+            self.pc[machines] = address + 1
+            return
+        negative = out >= SIGN_BIT
+        zero = out == 0
+        taken = np.zeros(len(machines), dtype=bool)
+        if jump & JUMP_LT:
+            taken |= negative
+        if jump & JUMP_EQ:
+            taken |= zero
+        if jump & JUMP_GT:
+            taken |= ~negative & ~zero
+        self.pc[machines] = np.where(taken, a & ADDRESS_MASK, address + 1)
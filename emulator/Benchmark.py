@@ -0,0 +1,289 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+from HackEmulator import HackEmulator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the assembler is imported from project06, its modules don't clash with ours.
+sys.path.append(os.path.join(ROOT, "project06"))
+from Assembler import Assembler  # noqa: E402
+
+# Jack programs that don't need the OS: Sys.init runs Main.main and then
+# Sys.halt, where the emulator is stopped.
+JACK_SYS = """
+class Sys {
+    function void init() {
+        do Main.main();
+        do Sys.halt();
+        return;
+    }
+    function void halt() {
+        while (true) {}
+        return;
+    }
+}
+"""
+JACK_PROGRAMS = {
+    # recursive calls, fib(18) is stored in RAM[8000]
+    "fib": """
+class Main {
+    function int fib(int n) {
+        if (n < 2) { return n; }
+        return Main.fib(n - 1) + Main.fib(n - 2);
+    }
+    function void main() {
+        var Array result;
+        let result = 8000;
+        let result[0] = Main.fib(18);
+        return;
+    }
+}
+""",
+    # bubble sort of 100 numbers in RAM[8000..8099], in reverse order at first
+    "bubble": """
+class Main {
+    function void main() {
+        var Array a;
+        var int i, j, n, t;
+        let a = 8000;
+        let n = 100;
+        let i = 0;
+        while (i < n) { let a[i] = n - i; let i = i + 1; }
+        let i = 0;
+        while (i < n) {
+            let j = n - 1;
+            while (j > i) {
+                if (a[j] < a[j - 1]) {
+                    let t = a[j];
+                    let a[j] = a[j - 1];
+                    let a[j - 1] = t;
+                }
+                let j = j - 1;
+            }
+            let i = i + 1;
+        }
+        return;
+    }
+}
+""",
+}
+
+
+def assemble(path: str) -> typing.Tuple[typing.List[int], typing.Dict[str, int]]:
+    """
+    Args:
+        path (str): path of a .asm file.
+
+    Returns:
+        typing.Tuple[typing.List[int], typing.Dict[str, int]]: the program
+        and its symbol table.
+    """
+    assembler = Assembler()
+    with open(path) as input_file:
+        assembler.feed(input_file)
+    return assembler.resolve(), assembler.symbols.symbols
+
+
+def build_jack(name: str, jack_code: str,
+               work_dir: str) -> typing.Tuple[typing.List[int], int]:
+    """Compiles, translates and assembles a Jack program with the project11
+    compiler and the project08 VM translator.
+
+    Args:
+        name (str): name of the program.
+        jack_code (str): the code of its Main class.
+        work_dir (str): a directory for the build.
+
+    Returns:
+        typing.Tuple[typing.List[int], int]: the program and the address of
+        Sys.halt.
+    """
+    program_dir = os.path.join(work_dir, name)
+    os.makedirs(program_dir)
+    for class_name, code in (("Main", jack_code), ("Sys", JACK_SYS)):
+        with open(os.path.join(program_dir, f"{class_name}.jack"), 'w') as f:
+            f.write(code)
+    for tool in ("project11/JackCompiler.py", "project08/Main.py"):
+        subprocess.run([sys.executable, os.path.join(ROOT, tool), program_dir],
+                       check=True, capture_output=True)
+    words, symbols = assemble(os.path.join(program_dir, f"{name}.asm"))
+    return words, symbols["Sys.halt"]
+
+
+def measure(emulator: HackEmulator) -> typing.Tuple[int, float]:
+    """
+    Returns:
+        typing.Tuple[int, float]: the number of instructions the emulator
+        ran until it halted, and the time it took in seconds.
+    """
+    start = time.perf_counter()
+    steps = emulator.run()
+    return steps, time.perf_counter() - start
+
+
+def run_mult(words: typing.List[int],
+             emulator_class: type = HackEmulator) -> typing.Tuple[int, float]:
+    """Multiplies a range of numbers with project04/mult."""
+    total_steps, total_seconds = 0, 0.0
+    for x in range(1, 30):
+        for y in range(100, 1000, 100):
+            emulator = emulator_class(words)
+            emulator.ram[0], emulator.ram[1] = x, y
+            steps, seconds = measure(emulator)
+            if emulator.ram[2] != x * y:
+                sys.exit(f"mult: {x} * {y} = {emulator.ram[2]}")
+            total_steps += steps
+            total_seconds += seconds
+    return total_steps, total_seconds
+
+
+def run_sort(words: typing.List[int],
+             emulator_class: type = HackEmulator) -> typing.Tuple[int, float]:
+    """Sorts 300 numbers, given in reverse order, with project04/sort."""
+    base, length = 2048, 300
+    emulator = emulator_class(words)
+    emulator.ram[14], emulator.ram[15] = base, length
+    for i in range(length):
+        emulator.ram[base + i] = i
+    result = measure(emulator)
+    if list(emulator.ram[base:base + length]) != list(range(length))[::-1]:
+        sys.exit("sort: wrong result")
+    return result
+
+
+def run_jack(name: str, words: typing.List[int], halt_address: int,
+             emulator_class: type = HackEmulator) -> typing.Tuple[int, float]:
+    """Runs one of JACK_PROGRAMS, built by build_jack()."""
+    emulator = emulator_class(words)
+    emulator.add_halt(halt_address)
+    result = measure(emulator)
+    if name == "fib" and emulator.ram[8000] != 2584:
+        sys.exit(f"fib: wrong result {emulator.ram[8000]}")
+    if name == "bubble" and \
+            list(emulator.ram[8000:8100]) != list(range(1, 101)):
+        sys.exit("bubble: wrong result")
+    return result
+
+
+def random_inputs(program: str, n: int) -> typing.List[typing.Dict[int, int]]:
+    """
+    Args:
+        program (str): "mult" or "sort".
+        n (int): number of inputs.
+
+    Returns:
+        typing.List[typing.Dict[int, int]]: n random RAM inputs, address ->
+        value, for the given project04 program.
+    """
+    inputs = []
+    for _ in range(n):
+        if program == "mult":
+            inputs.append({0: random.randrange(200), 1: random.randrange(150)})
+        else:
+            ram = {14: 2048, 15: 30}
+            for address in range(2048, 2048 + 30):
+                ram[address] = random.randrange(1 << 16)
+            inputs.append(ram)
+    return inputs
+
+
+def compare_batch(words: typing.List[int],
+                  inputs: typing.List[typing.Dict[int, int]],
+                  sample: int) -> typing.Tuple[float, float]:
+    """Runs a program on every input with one BatchEmulator, and on a sample
+    of the inputs with single emulators, and checks they get the same RAM.
+
+    Args:
+        words (typing.List[int]): the program.
+        inputs (typing.List[typing.Dict[int, int]]): RAM inputs.
+        sample (int): number of inputs to run with single emulators.
+
+    Returns:
+        typing.Tuple[float, float]: the aggregate throughput of the batch
+        and of the single emulators, in instructions per second.
+    """
+    from BatchEmulator import BatchEmulator
+    batch = BatchEmulator(words, len(inputs))
+    for machine, ram in enumerate(inputs):
+        for address, value in ram.items():
+            batch.ram[machine, address] = value
+    batch_steps, batch_seconds = measure(batch)
+    single_steps, single_seconds = 0, 0.0
+    for machine, ram in enumerate(inputs[:sample]):
+        emulator = HackEmulator(words)
+        for address, value in ram.items():
+            emulator.ram[address] = value
+        steps, seconds = measure(emulator)
+        single_steps += steps
+        single_seconds += seconds
+        if list(emulator.ram) != batch.ram[machine].tolist():
+            sys.exit(f"batch: machine {machine} differs")
+    return batch_steps / batch_seconds, single_steps / single_seconds
+
+
+if "__main__" == __name__:
+    arg_parser = argparse.ArgumentParser(prog="Benchmark")
+    arg_parser.add_argument(
+        "--batch", type=int, metavar="N",
+        help="instead, run mult and sort on N random inputs at once with the "
+             "NumPy batch emulator")
+    arg_parser.add_argument(
+        "--blocks", action="store_true",
+        help="also run every program with the block compiling emulator")
+    args = arg_parser.parse_args()
+    project04 = os.path.join(ROOT, "project04")
+    if args.batch:
+        random.seed(0)
+        print(f"{'program':>10} {'batch MIPS':>11} {'single MIPS':>12}")
+        for name, path in (("mult", "mult/Mult.asm"),
+                           ("sort", "sort/Sort.asm")):
+            batch_speed, single_speed = compare_batch(
+                assemble(os.path.join(project04, path))[0],
+                random_inputs(name, args.batch), min(args.batch, 100))
+            print(f"{name:>10} {batch_speed / 1e6:>11.2f} "
+                  f"{single_speed / 1e6:>12.2f}")
+        sys.exit()
+    emulator_classes = [HackEmulator]
+    if args.blocks:
+        from BlockEmulator import BlockEmulator
+        emulator_classes.append(BlockEmulator)
+    # the instruction count and the seconds of every emulator, by program
+    results = {}
+    mult_words = assemble(os.path.join(project04, "mult", "Mult.asm"))[0]
+    sort_words = assemble(os.path.join(project04, "sort", "Sort.asm"))[0]
+    results["mult"] = [run_mult(mult_words, emulator_class)
+                       for emulator_class in emulator_classes]
+    results["sort"] = [run_sort(sort_words, emulator_class)
+                       for emulator_class in emulator_classes]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name, jack_code in JACK_PROGRAMS.items():
+            words, halt_address = build_jack(name, jack_code, temp_dir)
+            results[name] = [run_jack(name, words, halt_address, emulator_class)
+                             for emulator_class in emulator_classes]
+    if not args.blocks:
+        print(f"{'program':>10} {'instructions':>13} {'seconds':>9} "
+              f"{'MIPS':>6}")
+        for name, ((steps, seconds),) in results.items():
+            print(f"{name:>10} {steps:>13} {seconds:>9.3f} "
+                  f"{steps / seconds / 1e6:>6.2f}")
+        sys.exit()
+    print(f"{'program':>10} {'instructions':>13} {'interpreter MIPS':>17} "
+          f"{'blocks MIPS':>12} {'speedup':>8}")
+    for name, ((steps, seconds), (block_steps, block_seconds)) in \
+            results.items():
+        if block_steps != steps:
+            sys.exit(f"{name}: {steps} instructions, {block_steps} in blocks")
+        print(f"{name:>10} {steps:>13} {steps / seconds / 1e6:>17.2f} "
+              f"{steps / block_seconds / 1e6:>12.2f} "
+              f"{seconds / block_seconds:>7.2f}x")
@@ -0,0 +1,232 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import collections
+import typing
+from HackEmulator import HackEmulator, alu, ADDRESS_MASK, WORD_MASK, \
+    SIGN_BIT, JUMP_ALWAYS, DEST_A, DEST_D, DEST_M
+
+# the compiled blocks of the programs loaded most recently, by the program
+# and the addresses added with add_halt(), so new emulators of a program
+# reuse them. only this many programs are kept, least recently used first.
+BLOCK_CACHE = collections.OrderedDict()
+MAX_CACHED_PROGRAMS = 8
+
+# Python expressions of the standard ALU computations on x = D and y = A or
+# M, by their zx, nx, zy, ny, f, no bits. every other computation calls alu().
+ALU_EXPRESSIONS = {
+    0b101010: "0",
+    0b111111: "1",
+    0b111010: f"{WORD_MASK}",
+    0b001100: "{x}",
+    0b110000: "{y}",
+    0b001101: f"{{x}} ^ {WORD_MASK}",
+    0b110001: f"{{y}} ^ {WORD_MASK}",
+    0b001111: f"-{{x}} & {WORD_MASK}",
+    0b110011: f"-{{y}} & {WORD_MASK}",
+    0b011111: f"({{x}} + 1) & {WORD_MASK}",
+    0b110111: f"({{y}} + 1) & {WORD_MASK}",
+    0b001110: f"({{x}} - 1) & {WORD_MASK}",
+    0b110010: f"({{y}} - 1) & {WORD_MASK}",
+    0b000010: f"({{x}} + {{y}}) & {WORD_MASK}",
+    0b010011: f"({{x}} - {{y}}) & {WORD_MASK}",
+    0b000111: f"({{y}} - {{x}}) & {WORD_MASK}",
+    0b000000: "{x} & {y}",
+    0b010101: "{x} | {y}",
+}
+# the conditions of the conditional jumps on the unsigned output
+JUMP_CONDITIONS = {
+    0b001: f"0 < out < {SIGN_BIT}",
+    0b010: "out == 0",
+    0b011: f"out < {SIGN_BIT}",
+    0b100: f"out >= {SIGN_BIT}",
+    0b101: "out != 0",
+    0b110: f"out == 0 or out >= {SIGN_BIT}",
+}
+
+
+def comp_expression(word: int, y: str) -> str:
+    """
+    Args:
+        word (int): a C instruction.
+        y (str): the expression of its y input, A or M.
+
+    Returns:
+        str: a Python expression of the instruction's computation on d.
+    """
+    if (word >> 13) & 0b11 == 0b11:
+        control = (word >> 6) & 0b111111
+        expression = ALU_EXPRESSIONS.get(control)
+        if expression is None:
+            return f"alu(d, {y}, {control})"
+        return expression.format(x="d", y=y)
+    value = "d" if word & 0x400 else y
+    if word & 0x800:
+        return f"({value} << 1) & {WORD_MASK}"
+    return f"({value} >> 1) | ({value} & {SIGN_BIT})"
+
+
+def block_source(rom: typing.Sequence[int], program: list,
+                 start: int) -> typing.Tuple[str, int]:
+    """Translates the basic block that starts at the given address into the
+    source of a Python function block(a, d, ram), which returns the new A,
+    D and PC.
+
+    A block ends with its first jump, or just before an address the
+    emulator halts at. The value of A is followed through the block, so
+    M is read and written at a constant address when A is known.
+
+    Args:
+        rom (typing.Sequence[int]): the program.
+        program (list): the decoded program of the emulator, where None
+            marks an address to halt at.
+        start (int): address of the first instruction of the block.
+
+    Returns:
+        typing.Tuple[str, int]: the source, and the number of instructions
+        in the block.
+    """
+    lines = ["def block(a, d, ram):"]
+    # the value of A, if it is known at this point of the block
+    known_a = None
+    address = start
+    while True:
+        if address >= len(rom) or program[address] is None:
+            lines.append(f"    return a, d, {address}")
+            break
+        word = rom[address]
+        address += 1
+        if not word & SIGN_BIT:
+            known_a = word
+            lines.append(f"    a = {word}")
+            continue
+        # M is used, and the jump goes to, the address A had before this
+        # instruction
+        target = f"{known_a & ADDRESS_MASK}" if known_a is not None \
+            else f"a & {ADDRESS_MASK}"
+        y = f"ram[{target}]" if word & 0x1000 else "a"
+        dest = (word >> 3) & 0b111
+        jump = word & 0b111
+        lines.append(f"    out = {comp_expression(word, y)}")
+        if dest & DEST_M:
+            lines.append(f"    ram[{target}] = out")
+        if dest & DEST_D:
+            lines.append("    d = out")
+        if dest & DEST_A:
+            if jump and known_a is None:
+                lines.append(f"    target = {target}")
+                target = "target"
+            lines.append("    a = out")
+            known_a = None
+        if jump == JUMP_ALWAYS:
+            lines.append(f"    return a, d, {target}")
+            break
+        if jump:
+            lines.append(f"    if {JUMP_CONDITIONS[jump]}:")
+            lines.append(f"        return a, d, {target}")
+            lines.append(f"    return a, d, {address}")
+            break
+    return "\n".join(lines) + "\n", address - start
+
+
+def cached_blocks(key: typing.Tuple[bytes, typing.FrozenSet[int]]) -> dict:
+    """
+    Args:
+        key (typing.Tuple[bytes, typing.FrozenSet[int]]): the program and
+            the addresses it halts at.
+
+    Returns:
+        dict: the shared compiled blocks of the program, which start out
+        empty if it isn't cached. an evicted program keeps its blocks for
+        the emulators already running it.
+    """
+    if key in BLOCK_CACHE:
+        BLOCK_CACHE.move_to_end(key)
+    else:
+        BLOCK_CACHE[key] = {}
+        if len(BLOCK_CACHE) > MAX_CACHED_PROGRAMS:
+            BLOCK_CACHE.popitem(last=False)
+    return BLOCK_CACHE[key]
+
+
+class BlockEmulator(HackEmulator):
+    """A HackEmulator that translates every basic block of the program into
+    a Python function the first time it is reached, and then runs the
+    program a block at a time.
+
+    Jumps to a computed address, like the return of a VM function, simply
+    end their block, and the next block is looked up by the new PC. The
+    ROM can't be written, so compiled blocks never go stale, and they are
+    shared by all the emulators of the same program. The instruction by
+    instruction interpreter is still used where a block would run past
+    max_steps.
+    """
+
+    def __init__(self, rom: typing.Sequence[int]) -> None:
+        """Loads a program and resets the machine.
+
+        Args:
+            rom (typing.Sequence[int]): the program, one word per address.
+        """
+        super().__init__(rom)
+        self.halts = frozenset()
+        # the compiled block and its length, by the address it starts at
+        self.blocks = cached_blocks((self.rom.tobytes(), self.halts))
+
+    def add_halt(self, address: int) -> None:
+        super().add_halt(address)
+        # blocks running through the address must now stop before it, so
+        # they are taken from the cache of the new set of halts
+        self.halts |= {address}
+        self.blocks = cached_blocks((self.rom.tobytes(), self.halts))
+
+    def compile_block(self, start: int) -> typing.Tuple[typing.Callable, int]:
+        """
+        Args:
+            start (int): address of the first instruction of the block.
+
+        Returns:
+            typing.Tuple[typing.Callable, int]: the compiled block, and the
+            number of instructions in it.
+        """
+        source, length = block_source(self.rom, self.program, start)
+        namespace = {"alu": alu}
+        exec(compile(source, f"<block {start}>", "exec"), namespace)
+        self.blocks[start] = namespace["block"], length
+        return self.blocks[start]
+
+    def run(self, max_steps: int = 1 << 62) -> int:
+        """Runs the program until it halts, leaves the ROM, or executes
+        max_steps instructions.
+
+        Args:
+            max_steps (int): the maximal number of instructions to execute.
+
+        Returns:
+            int: the number of instructions executed.
+        """
+        program = self.program
+        blocks = self.blocks
+        ram = self.ram
+        a, d, pc = self.a, self.d, self.pc
+        steps = 0
+        while True:
+            if program[pc] is None:
+                self.halted = True
+                break
+            block = blocks.get(pc)
+            if block is None:
+                block = self.compile_block(pc)
+            function, length = block
+            if steps + length > max_steps:
+                self.a, self.d, self.pc = a, d, pc
+                self.steps += steps
+                return steps + super().run(max_steps - steps)
+            a, d, pc = function(a, d, ram)
+            steps += length
+        self.a, self.d, self.pc = a, d, pc
+        self.steps += steps
+        return steps
@@ -0,0 +1,213 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import typing
+from HackEmulator import HackEmulator
+from Benchmark import ROOT, assemble
+
+# classes of the OS in project12 that all the programs use
+OS_CLASSES = ["Math", "Memory", "Array"]
+# and the ones that programs which print text use as well
+OUTPUT_CLASSES = OS_CLASSES + ["String", "Output"]
+# initializes the OS classes, Memory first since Math.init allocates an
+# array, runs Main.main and then Sys.halt, where the emulator is stopped.
+JACK_SYS = """
+class Sys {
+    function void init() {
+        do Memory.init();
+        do Math.init();
+        do Main.main();
+        do Sys.halt();
+        return;
+    }
+    function void halt() {
+        while (true) {}
+        return;
+    }
+}
+"""
+# every program writes its results from this address on
+RESULT_BASE = 8000
+# the screen memory map, which is compared along with the results
+SCREEN_BASE = 16384
+SCREEN_SIZE = 8192
+# Memory.init makes the heap a single free block, and its size is kept in
+# this address. Memory.alloc cuts blocks off the end of the block, so the
+# size the block lost is the number of words allocated.
+HEAP_SIZE_ADDRESS = 2049
+HEAP_SIZE = 14335
+# Jack programs which the optimizer changes, by name, the number of results
+# they write, and the OS classes they use
+JACK_PROGRAMS = {
+    # the screen address and bit mask of every pixel of a 64x32 square
+    "pixels": ("""
+class Main {
+    function void main() {
+        var Array result;
+        var int x, y, address, sum, mask;
+        let result = 8000;
+        let y = 0;
+        while (y < 32) {
+            let x = 0;
+            while (x < 64) {
+                let address = (16384 + (y * 32)) + (x / 16);
+                let mask = x & (16 - 1);
+                let sum = sum + address + mask;
+                let x = x + 1;
+            }
+            let result[y] = sum;
+            let y = y + 1;
+        }
+        return;
+    }
+}
+""", 32, OS_CLASSES),
+    # fixed point numbers with 8 fraction bits, positive and negative
+    "fixed": ("""
+class Main {
+    function void main() {
+        var Array result;
+        var int i, value, half;
+        let result = 8000;
+        let i = 0;
+        while (i < 100) {
+            let value = (i - 50) * 256;
+            let half = value / 2;
+            let result[i] = (half / 256) + ((value / 64) * (2 * 2)) -
+                            (60 * 60 / 100);
+            let i = i + 1;
+        }
+        return;
+    }
+}
+""", 100, OS_CLASSES),
+    # prints the same messages on every line of the screen
+    "messages": ("""
+class Main {
+    function void main() {
+        var Array result;
+        var int i;
+        var String status;
+        let result = 8000;
+        do Output.init();
+        let i = 0;
+        while (i < 20) {
+            do Output.printString("line ");
+            do Output.printInt(i);
+            do Output.printString(" of 20: ");
+            let status = "all systems nominal";
+            do Output.printString(status);
+            do Output.println();
+            let result[i] = status.length();
+            let i = i + 1;
+        }
+        return;
+    }
+}
+""", 20, OUTPUT_CLASSES),
+}
+
+
+def build_jack(name: str, jack_code: str, os_classes: typing.List[str],
+               work_dir: str, compiler_options: typing.List[str]) \
+        -> typing.Tuple[typing.List[int], int]:
+    """Compiles a Jack program and the OS classes it uses with the project11
+    compiler, translates it with the project08 VM translator, and assembles
+    it.
+
+    Args:
+        name (str): name of the program.
+        jack_code (str): the code of its Main class.
+        os_classes (typing.List[str]): the OS classes it uses.
+        work_dir (str): a directory for the build.
+        compiler_options (typing.List[str]): options of the compiler, i.e
+            the optimization passes.
+
+    Returns:
+        typing.Tuple[typing.List[int], int]: the program and the address of
+        Sys.halt.
+    """
+    program_dir = os.path.join(work_dir, name)
+    os.makedirs(program_dir)
+    for class_name, code in (("Main", jack_code), ("Sys", JACK_SYS)):
+        with open(os.path.join(program_dir, f"{class_name}.jack"), 'w') as f:
+            f.write(code)
+    for class_name in os_classes:
+        shutil.copy(os.path.join(ROOT, "project12", f"{class_name}.jack"),
+                    program_dir)
+    compiler = [sys.executable,
+                os.path.join(ROOT, "project11", "JackCompiler.py"),
+                program_dir] + compiler_options
+    subprocess.run(compiler, check=True, capture_output=True)
+    subprocess.run([sys.executable, os.path.join(ROOT, "project08", "Main.py"),
+                    program_dir], check=True, capture_output=True)
+    words, symbols = assemble(os.path.join(program_dir, f"{name}.asm"))
+    return words, symbols["Sys.halt"]
+
+
+def run_jack(words: typing.List[int], halt_address: int,
+             n_results: int) -> typing.Tuple[int, int, typing.List[int]]:
+    """
+    Returns:
+        typing.Tuple[int, int, typing.List[int]]: the number of instructions
+        the program ran until it halted, the number of heap words it
+        allocated, and its results followed by the screen.
+    """
+    emulator = HackEmulator(words)
+    emulator.add_halt(halt_address)
+    steps = emulator.run()
+    heap_words = HEAP_SIZE - emulator.ram[HEAP_SIZE_ADDRESS]
+    return steps, heap_words, \
+        list(emulator.ram[RESULT_BASE:RESULT_BASE + n_results]) + \
+        list(emulator.ram[SCREEN_BASE:SCREEN_BASE + SCREEN_SIZE])
+
+
+if "__main__" == __name__:
+    # Builds every program with and without the optimization passes, checks
+    # that both get the same results, and compares their instruction counts,
+    # sizes and heap usage.
+    arg_parser = argparse.ArgumentParser(prog="CompilerBenchmark")
+    arg_parser.add_argument(
+        "programs", nargs="*", metavar="PROGRAM",
+        help=f"programs to run, by default all of them. can be: "
+             f"{', '.join(JACK_PROGRAMS)}")
+    arg_parser.add_argument(
+        "--passes", nargs="*", metavar="PASS",
+        help="passes of the optimized build, by default the ones of "
+             "--optimize")
+    args = arg_parser.parse_args()
+    optimized_options = ["--optimize"] if args.passes is None else \
+        ["--passes"] + args.passes
+    for name in args.programs:
+        if name not in JACK_PROGRAMS:
+            arg_parser.error(f"unknown program: {name}")
+    print(f"{'program':>10} {'instructions':>13} {'optimized':>10} "
+          f"{'speedup':>8} {'ROM words':>10} {'optimized':>10} "
+          f"{'heap words':>11} {'optimized':>10}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name in args.programs or JACK_PROGRAMS:
+            jack_code, n_results, os_classes = JACK_PROGRAMS[name]
+            runs = []
+            for build, options in (("plain", []),
+                                   ("optimized", optimized_options)):
+                words, halt_address = build_jack(
+                    name, jack_code, os_classes,
+                    os.path.join(temp_dir, build), options)
+                runs.append((len(words),) +
+                            run_jack(words, halt_address, n_results))
+            (size, steps, heap, results), \
+                (opt_size, opt_steps, opt_heap, opt_results) = runs
+            if results != opt_results:
+                sys.exit(f"{name}: the optimized program got other results")
+            print(f"{name:>10} {steps:>13} {opt_steps:>10} "
+                  f"{steps / opt_steps:>7.1f}x {size:>10} {opt_size:>10} "
+                  f"{heap:>11} {opt_heap:>10}")
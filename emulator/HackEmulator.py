@@ -0,0 +1,282 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import os
+import sys
+import typing
+from array import array
+
+# number of words in the data memory, the screen and the keyboard included
+RAM_SIZE = 1 << 15
+# number of words in the instruction memory
+ROM_SIZE = 1 << 15
+# addresses are 15 bits wide, A values are masked with this before M is used
+ADDRESS_MASK = RAM_SIZE - 1
+WORD_MASK = 0xFFFF
+SIGN_BIT = 0x8000
+# binary ROM images (see project06/Main.py) use this file extension
+BINARY_EXTENSION = ".rom"
+
+# the comp bits zx, nx, zy, ny, f, no of every standard computation, and the
+# computation itself on x = D and y = A or M. any other comp bits go through
+# the generic alu() below.
+ALU_COMPS = {
+    0b101010: lambda x, y: 0,
+    0b111111: lambda x, y: 1,
+    0b111010: lambda x, y: WORD_MASK,
+    0b001100: lambda x, y: x,
+    0b110000: lambda x, y: y,
+    0b001101: lambda x, y: x ^ WORD_MASK,
+    0b110001: lambda x, y: y ^ WORD_MASK,
+    0b001111: lambda x, y: -x & WORD_MASK,
+    0b110011: lambda x, y: -y & WORD_MASK,
+    0b011111: lambda x, y: (x + 1) & WORD_MASK,
+    0b110111: lambda x, y: (y + 1) & WORD_MASK,
+    0b001110: lambda x, y: (x - 1) & WORD_MASK,
+    0b110010: lambda x, y: (y - 1) & WORD_MASK,
+    0b000010: lambda x, y: (x + y) & WORD_MASK,
+    0b010011: lambda x, y: (x - y) & WORD_MASK,
+    0b000111: lambda x, y: (y - x) & WORD_MASK,
+    0b000000: lambda x, y: x & y,
+    0b010101: lambda x, y: x | y,
+}
+# the shifts of the extended ALU (see project05/ExtendAlu.hdl), by the
+# left bit (instruction[5]) and the shift-x bit (instruction[4]). the right
+# shift is arithmetic, it keeps the sign bit.
+SHIFT_COMPS = {
+    (1, 1): lambda x, y: (x << 1) & WORD_MASK,
+    (1, 0): lambda x, y: (y << 1) & WORD_MASK,
+    (0, 1): lambda x, y: (x >> 1) | (x & SIGN_BIT),
+    (0, 0): lambda x, y: (y >> 1) | (y & SIGN_BIT),
+}
+# the jump bits j1, j2, j3, taken when the output is negative, zero or
+# positive respectively. all three make an unconditional jump.
+JUMP_LT = 0b100
+JUMP_EQ = 0b010
+JUMP_GT = 0b001
+JUMP_ALWAYS = 0b111
+# dest bits, in the order of the instruction
+DEST_A = 0b100
+DEST_D = 0b010
+DEST_M = 0b001
+# the C instruction "0;JMP", which ends a program when it follows "@itself"
+HALT_JUMP = 0b1110101010000111
+
+
+def alu(x: int, y: int, control: int) -> int:
+    """The ALU of project02/ALU.hdl, for any combination of control bits.
+
+    Args:
+        x (int): the x input, a 16-bit word.
+        y (int): the y input, a 16-bit word.
+        control (int): the bits zx, nx, zy, ny, f, no, zx being the highest.
+
+    Returns:
+        int: the 16-bit output.
+    """
+    if control & 0b100000:
+        x = 0
+    if control & 0b010000:
+        x ^= WORD_MASK
+    if control & 0b001000:
+        y = 0
+    if control & 0b000100:
+        y ^= WORD_MASK
+    out = (x + y) & WORD_MASK if control & 0b000010 else x & y
+    if control & 0b000001:
+        out ^= WORD_MASK
+    return out
+
+
+def decode(word: int) -> typing.Union[int, tuple]:
+    """Decodes a single instruction into the form run by HackEmulator.
+
+    Args:
+        word (int): a 16-bit instruction.
+
+    Returns:
+        typing.Union[int, tuple]: the value of an A instruction, or a tuple
+        (comp, uses_m, dest, jump) for a C instruction, where comp is a
+        function of (D, A or M).
+    """
+    if not word & SIGN_BIT:
+        return word
+    if (word >> 13) & 0b11 == 0b11:
+        control = (word >> 6) & 0b111111
+        comp = ALU_COMPS.get(control)
+        if comp is None:
+            comp = lambda x, y, control=control: alu(x, y, control)
+    else:
+        comp = SHIFT_COMPS[(word >> 11) & 1, (word >> 10) & 1]
+    return comp, bool(word & 0x1000), (word >> 3) & 0b111, word & 0b111
+
+
+def halt_addresses(rom: typing.Sequence[int]) -> typing.List[int]:
+    """
+    Args:
+        rom (typing.Sequence[int]): a program.
+
+    Returns:
+        typing.List[int]: the address of every "@address" followed by
+        "0;JMP", the usual way to end a Hack program.
+    """
+    return [address for address in range(len(rom) - 1)
+            if rom[address] == address and rom[address + 1] == HALT_JUMP]
+
+
+def load_rom(path: str, byteorder: str = "little") -> array:
+    """Reads a program, either a textual .hack file or a binary .rom image.
+
+    Args:
+        path (str): path of the program.
+        byteorder (str): byte order of a binary image.
+
+    Returns:
+        array: the program, one 16-bit word per ROM address.
+    """
+    if os.path.splitext(path)[1].lower() == BINARY_EXTENSION:
+        rom = array('H')
+        with open(path, 'rb') as rom_file:
+            rom.frombytes(rom_file.read())
+        if byteorder != sys.byteorder:
+            rom.byteswap()
+        return rom
+    with open(path) as hack_file:
+        return array('H', [int(line, 2) for line in hack_file if line.strip()])
+
+
+def parse_assignment(text: str) -> typing.Tuple[int, int]:
+    """Parses a command line argument that sets a RAM word.
+
+    Args:
+        text (str): "address=value", i.e "0=17".
+
+    Returns:
+        typing.Tuple[int, int]: the address and the value as a 16-bit word.
+    """
+    address, value = text.split("=")
+    return int(address), int(value) & WORD_MASK
+
+
+def parse_range(text: str) -> range:
+    """Parses a command line argument that names RAM words.
+
+    Args:
+        text (str): "address" or "first:last", both included.
+
+    Returns:
+        range: the RAM addresses.
+    """
+    first, _, last = text.partition(":")
+    return range(int(first), int(last or first) + 1)
+
+
+class HackEmulator:
+    """Runs Hack machine code, including the shift extension of CpuMul.
+
+    Every ROM word is decoded once when the emulator is created, so the main
+    loop only unpacks a tuple and calls the computation of each C
+    instruction. The data memory is an array of 16-bit words.
+
+    A jump to an address that holds "@address" followed by "0;JMP", the
+    usual way to end a Hack program, halts the emulator.
+    """
+
+    def __init__(self, rom: typing.Sequence[int]) -> None:
+        """Loads a program and resets the machine.
+
+        Args:
+            rom (typing.Sequence[int]): the program, one word per address.
+        """
+        self.rom = array('H', rom)
+        if len(self.rom) > ROM_SIZE:
+            raise ValueError(f"Program too large: {len(self.rom)} words")
+        # the program is padded with None, which halts, up to the end of the
+        # address space and one past it, so the main loop never checks the
+        # PC against the program size.
+        self.program = [decode(word) for word in self.rom]
+        self.program += [None] * (ROM_SIZE + 1 - len(self.program))
+        # the halting loops are replaced by None, so the main loop doesn't
+        # have to check for them on every instruction.
+        for address in halt_addresses(self.rom):
+            self.program[address] = None
+        self.ram = array('H', bytes(2 * RAM_SIZE))
+        self.a = 0
+        self.d = 0
+        self.pc = 0
+        self.steps = 0
+        self.halted = False
+
+    def reset(self) -> None:
+        """Clears the registers and the data memory."""
+        self.ram = array('H', bytes(2 * RAM_SIZE))
+        self.a = self.d = self.pc = self.steps = 0
+        self.halted = False
+
+    def add_halt(self, address: int) -> None:
+        """Makes the emulator halt when it reaches the given address.
+
+        Args:
+            address (int): a ROM address.
+        """
+        self.program[address] = None
+
+    def run(self, max_steps: int = 1 << 62) -> int:
+        """Runs the program until it halts, leaves the ROM, or executes
+        max_steps instructions.
+
+        Args:
+            max_steps (int): the maximal number of instructions to execute.
+
+        Returns:
+            int: the number of instructions executed.
+        """
+        program = self.program
+        ram = self.ram
+        a, d, pc = self.a, self.d, self.pc
+        step = 0
+        for step in range(max_steps):
+            op = program[pc]
+            if op.__class__ is int:
+                a = op
+                pc += 1
+                continue
+            if op is None:
+                self.halted = True
+                break
+            comp, uses_m, dest, jump = op
+            if uses_m:
+                out = comp(d, ram[a & ADDRESS_MASK])
+            else:
+                out = comp(d, a)
+            if jump:
+                # the PC is loaded with the A register as it was before this
+                # instruction, like in the CPU where both change on one clock.
+                if jump == JUMP_ALWAYS or jump & (
+                        JUMP_LT if out & SIGN_BIT else
+                        JUMP_GT if out else JUMP_EQ):
+                    next_pc = a & ADDRESS_MASK
+                else:
+                    next_pc = pc + 1
+            else:
+                next_pc = pc + 1
+            if dest == DEST_D:
+                d = out
+            elif dest == DEST_M:
+                ram[a & ADDRESS_MASK] = out
+            elif dest:
+                if dest & DEST_M:
+                    ram[a & ADDRESS_MASK] = out
+                if dest & DEST_D:
+                    d = out
+                if dest & DEST_A:
+                    a = out
+            pc = next_pc
+        else:
+            step = max_steps
+        self.a, self.d, self.pc = a, d, pc
+        self.steps += step
+        return step
@@ -0,0 +1,49 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import sys
+import time
+from HackEmulator import HackEmulator, load_rom, parse_assignment, \
+    parse_range
+
+
+if "__main__" == __name__:
+    # Runs a Hack program until it halts, and prints the requested RAM words
+    # as signed numbers.
+    arg_parser = argparse.ArgumentParser(prog="CPUEmulator")
+    arg_parser.add_argument("input_path", help="a .hack or a .rom file")
+    arg_parser.add_argument(
+        "--byteorder", choices=["little", "big"], default="little",
+        help="byte order of the words in a binary .rom image")
+    arg_parser.add_argument(
+        "--steps", type=int, default=1 << 62,
+        help="stop after this many instructions")
+    arg_parser.add_argument(
+        "--set", type=parse_assignment, action="append", default=[],
+        metavar="ADDRESS=VALUE", help="initialize a RAM word")
+    arg_parser.add_argument(
+        "--dump", type=parse_range, action="append", default=[],
+        metavar="FIRST[:LAST]", help="print RAM words after the run")
+    args = arg_parser.parse_args()
+    try:
+        emulator = HackEmulator(load_rom(args.input_path, args.byteorder))
+    except (OSError, ValueError) as error:
+        sys.exit(f"Can't load {args.input_path}: {error}")
+    for address, value in args.set:
+        emulator.ram[address] = value
+    start = time.perf_counter()
+    steps = emulator.run(args.steps)
+    seconds = time.perf_counter() - start
+    print(f"{'halted' if emulator.halted else 'stopped'} at {emulator.pc} "
+          f"after {steps} instructions, {seconds:.3f}s "
+          f"({steps / max(seconds, 1e-9) / 1e6:.2f} MIPS)")
+    for addresses in args.dump:
+        for address in addresses:
+            value = emulator.ram[address]
+            if value & 0x8000:
+                value -= 0x10000
+            print(f"RAM[{address}] = {value}")
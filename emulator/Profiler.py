@@ -0,0 +1,402 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import collections
+import os
+import sys
+import typing
+from HackEmulator import HackEmulator, ADDRESS_MASK, SIGN_BIT, ROM_SIZE, \
+    JUMP_LT, JUMP_EQ, JUMP_GT, JUMP_ALWAYS, DEST_A, DEST_D, DEST_M
+from SourceMap import SourceMap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the assembler is imported from project06, its modules don't clash with ours.
+sys.path.append(os.path.join(ROOT, "project06"))
+from Assembler import Assembler, clean_line  # noqa: E402
+
+# the translator writes "(name)" and "(name$Start)" for every VM function,
+# and "(name$ret.file.n)" after every call
+FUNCTION_START_SUFFIX = "$Start"
+RETURN_LABEL = "$ret."
+# labels of the shared routines of the compact mode
+SHARED_PREFIX = "$$"
+# the code before the first function, and the bottom of every stack
+BOOTSTRAP = "(bootstrap)"
+# number of words a call pushes: return address, LCL, ARG, THIS, THAT
+FRAME_SIZE = 5
+LCL = 1
+SEGMENTS = {"constant", "local", "argument", "this", "that", "static", "temp",
+            "pointer"}
+ARITHMETIC = {"add", "sub", "neg", "eq", "gt", "lt", "and", "or", "not",
+              "shiftleft", "shiftright"}
+
+
+def command_kind(comment: str) -> typing.Optional[str]:
+    """Recognizes the comment the translator writes before a VM command.
+
+    Args:
+        comment (str): the text of a comment line, without "//".
+
+    Returns:
+        typing.Optional[str]: the kind of the command, i.e "push constant"
+        or "call", joined with "; " for commands the optimizer fused, or
+        None if the comment doesn't start a command.
+    """
+    kinds = []
+    for source in comment.strip().split("; "):
+        words = source.split()
+        if not words:
+            return None
+        keyword = words[0]
+        if keyword.startswith("C_"):
+            keyword = keyword[2:].lower()
+        if keyword in ("push", "pop") and len(words) == 3 and \
+                words[1] in SEGMENTS:
+            kinds.append(f"{keyword} {words[1]}")
+        elif keyword in ("label", "goto", "if-goto") and len(words) == 2:
+            kinds.append(keyword)
+        elif keyword in ARITHMETIC and len(words) == 1:
+            kinds.append(keyword)
+        elif keyword in ("CALL", "call") and len(words) == 3:
+            kinds.append("call")
+        elif source in ("Return", "return"):
+            kinds.append("return")
+        elif (len(words) > 2 and words[1] == "function") or \
+                (keyword == "function" and len(words) == 3):
+            kinds.append("function")
+        else:
+            return None
+    return "; ".join(kinds)
+
+
+def load_asm(path: str) -> typing.Tuple[typing.List[int],
+                                        typing.Dict[str, int],
+                                        typing.List[str]]:
+    """Assembles a translated VM program.
+
+    Args:
+        path (str): path of the .asm file.
+
+    Returns:
+        typing.Tuple[typing.List[int], typing.Dict[str, int],
+        typing.List[str]]: the program, its symbol table, and the kind of
+        VM command every instruction belongs to, which is "(unknown)" where
+        the translator wrote no comments, or the shared routine of the
+        compact mode.
+    """
+    with open(path) as input_file:
+        lines = input_file.readlines()
+    assembler = Assembler()
+    assembler.feed(lines)
+    words = assembler.resolve()
+    kinds = []
+    kind = "(unknown)"
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith("//"):
+            kind = command_kind(stripped[2:]) or kind
+            continue
+        line = clean_line(line)
+        if line.startswith("(" + SHARED_PREFIX):
+            # the code of a shared routine is a kind of its own
+            kind = line[1:line.find(')')]
+        elif line and line[0] != '(':
+            kinds.append(kind)
+    return words, assembler.symbols.symbols, kinds
+
+
+class ProfilingEmulator(HackEmulator):
+    """A HackEmulator that counts the instructions executed at every ROM
+    address, and follows the VM functions that are called and return.
+
+    A jump to the label of a function is a call, and its return address is
+    found in the frame the call pushed, right below LCL. A jump to a
+    return address of a call returns from the frames up to the one which
+    has it. The instructions between these events belong to the stack of
+    functions at the time.
+    """
+
+    def __init__(self, rom: typing.Sequence[int],
+                 symbols: typing.Dict[str, int]) -> None:
+        """Loads a program and resets the machine.
+
+        Args:
+            rom (typing.Sequence[int]): the program, one word per address.
+            symbols (typing.Dict[str, int]): its symbol table.
+        """
+        super().__init__(rom)
+        # function name -> address, shared routines included
+        self.entries = {
+            label: address for label, address in symbols.items()
+            if label + FUNCTION_START_SUFFIX in symbols or
+            label.startswith(SHARED_PREFIX)}
+        self.names = {address: label for label, address in
+                      self.entries.items() if not label.startswith(
+                          SHARED_PREFIX)}
+        self.return_addresses = {address for label, address in
+                                 symbols.items() if RETURN_LABEL in label}
+        # a jump to one of these addresses is a call or a return
+        self.events = bytearray(ROM_SIZE + 1)
+        for address in list(self.names) + list(self.return_addresses):
+            self.events[address] = 1
+        self.counts = [0] * (ROM_SIZE + 1)
+        # the call stack, as (function, return address, step of the call)
+        self.stack = []
+        # the functions in the stack, and how many times each one is there
+        self.active = collections.Counter()
+        self.calls = collections.Counter()
+        # instructions of every function, the functions it called included,
+        # counted once for recursive calls
+        self.inclusive = collections.Counter()
+        # (caller, callee) -> number of calls and their instructions
+        self.edge_calls = collections.Counter()
+        self.edge_inclusive = collections.Counter()
+        self.active_edges = collections.Counter()
+        # stack of functions, joined by ";" -> instructions in it
+        self.folded = collections.Counter()
+        self.last_event = 0
+
+    def event(self, pc: int, clock: int) -> None:
+        """Handles a jump to a function or a return address.
+
+        Args:
+            pc (int): the address jumped to.
+            clock (int): the number of instructions executed so far.
+        """
+        stack = self.stack
+        key = ";".join([BOOTSTRAP] + [frame[0] for frame in stack])
+        self.folded[key] += clock - self.last_event
+        self.last_event = clock
+        name = self.names.get(pc)
+        if name is not None:
+            caller = stack[-1][0] if stack else BOOTSTRAP
+            frame = (self.ram[LCL] - FRAME_SIZE) & ADDRESS_MASK
+            stack.append((name, self.ram[frame], clock))
+            self.calls[name] += 1
+            self.active[name] += 1
+            self.edge_calls[caller, name] += 1
+            self.active_edges[caller, name] += 1
+            return
+        if any(frame[1] == pc for frame in stack):
+            while self.pop_frame(clock) != pc:
+                pass
+
+    def pop_frame(self, clock: int) -> int:
+        """Returns from the function at the top of the stack.
+
+        Args:
+            clock (int): the number of instructions executed so far.
+
+        Returns:
+            int: the return address of the function.
+        """
+        name, return_address, start = self.stack.pop()
+        caller = self.stack[-1][0] if self.stack else BOOTSTRAP
+        self.active[name] -= 1
+        if not self.active[name]:
+            self.inclusive[name] += clock - start
+        self.active_edges[caller, name] -= 1
+        if not self.active_edges[caller, name]:
+            self.edge_inclusive[caller, name] += clock - start
+        return return_address
+
+    def finish(self) -> None:
+        """Accounts for the functions still running when the run stopped."""
+        self.event(-1, self.steps)
+        while self.stack:
+            self.pop_frame(self.steps)
+
+    def run(self, max_steps: int = 1 << 62) -> int:
+        """Runs the program like HackEmulator.run(), while profiling it.
+
+        Args:
+            max_steps (int): the maximal number of instructions to execute.
+
+        Returns:
+            int: the number of instructions executed.
+        """
+        program = self.program
+        ram = self.ram
+        counts = self.counts
+        events = self.events
+        a, d, pc = self.a, self.d, self.pc
+        step = 0
+        for step in range(max_steps):
+            op = program[pc]
+            if op.__class__ is int:
+                counts[pc] += 1
+                a = op
+                pc += 1
+                continue
+            if op is None:
+                self.halted = True
+                break
+            counts[pc] += 1
+            comp, uses_m, dest, jump = op
+            out = comp(d, ram[a & ADDRESS_MASK] if uses_m else a)
+            next_pc = pc + 1
+            if jump and (jump == JUMP_ALWAYS or jump & (
+                    JUMP_LT if out & SIGN_BIT else
+                    JUMP_GT if out else JUMP_EQ)):
+                next_pc = a & ADDRESS_MASK
+            if dest & DEST_M:
+                ram[a & ADDRESS_MASK] = out
+            if dest & DEST_D:
+                d = out
+            if dest & DEST_A:
+                a = out
+            pc = next_pc
+            if events[pc]:
+                self.event(pc, self.steps + step + 1)
+        else:
+            step = max_steps
+        self.a, self.d, self.pc = a, d, pc
+        self.steps += step
+        return step
+
+    def flat_profile(self, kinds: typing.List[str]) -> typing.Tuple[
+            typing.Counter, typing.Counter]:
+        """
+        Args:
+            kinds (typing.List[str]): the kind of VM command of every
+                instruction, as returned by load_asm().
+
+        Returns:
+            typing.Tuple[typing.Counter, typing.Counter]: the instructions
+            executed in the code of every function, and of every kind of VM
+            command.
+        """
+        starts = sorted((address, name) for name, address in
+                        self.entries.items())
+        functions = collections.Counter()
+        commands = collections.Counter()
+        name = BOOTSTRAP
+        next_start = 0
+        for address in range(len(self.rom)):
+            while next_start < len(starts) and \
+                    starts[next_start][0] <= address:
+                name = starts[next_start][1]
+                next_start += 1
+            count = self.counts[address]
+            if count:
+                functions[name] += count
+                commands[kinds[address] if address < len(kinds)
+                         else "(unknown)"] += count
+        return functions, commands
+
+
+def source_profile(emulator: ProfilingEmulator,
+                   source_map: SourceMap) -> typing.Counter:
+    """
+    Args:
+        emulator (ProfilingEmulator): an emulator after a run.
+        source_map (SourceMap): the source map of its program.
+
+    Returns:
+        typing.Counter: the instructions executed for every Jack line, as
+        "file.jack:line". Code that has no Jack source is counted by its VM
+        line, and code of no VM command as BOOTSTRAP.
+    """
+    lines = collections.Counter()
+    for address in range(len(emulator.rom)):
+        count = emulator.counts[address]
+        if not count:
+            continue
+        location = source_map.locate(address)
+        if location.jack_file is not None:
+            lines[f"{location.jack_file}:{location.jack_line}"] += count
+        elif location.vm_file is not None:
+            lines[f"{location.vm_file}:{location.vm_line}"] += count
+        else:
+            lines[BOOTSTRAP] += count
+    return lines
+
+
+def report(emulator: ProfilingEmulator, kinds: typing.List[str],
+           top: int, source_map: typing.Optional[SourceMap] = None) -> str:
+    """
+    Args:
+        emulator (ProfilingEmulator): an emulator after a run.
+        kinds (typing.List[str]): the kind of VM command of every instruction.
+        top (int): number of lines in each table.
+        source_map (typing.Optional[SourceMap]): if given, the source map of
+            the program, for a profile of the Jack lines.
+
+    Returns:
+        str: the flat profile of functions and of VM commands, and the call
+        graph.
+    """
+    total = max(emulator.steps, 1)
+    functions, commands = emulator.flat_profile(kinds)
+    lines = [f"{emulator.steps} instructions", "",
+             f"{'self':>12} {'%':>6} {'inclusive':>12} {'calls':>8}  function"]
+    for name, count in functions.most_common(top):
+        lines.append(f"{count:>12} {100 * count / total:>6.2f} "
+                     f"{emulator.inclusive[name]:>12} "
+                     f"{emulator.calls[name]:>8}  {name}")
+    lines += ["", f"{'self':>12} {'%':>6}  VM command"]
+    for kind, count in commands.most_common(top):
+        lines.append(f"{count:>12} {100 * count / total:>6.2f}  {kind}")
+    if source_map is not None:
+        lines += ["", f"{'self':>12} {'%':>6}  source line"]
+        for source, count in source_profile(
+                emulator, source_map).most_common(top):
+            lines.append(f"{count:>12} {100 * count / total:>6.2f}  {source}")
+    lines += ["", f"{'calls':>8} {'inclusive':>12}  caller -> callee"]
+    edges = sorted(emulator.edge_calls, reverse=True,
+                   key=lambda edge: emulator.edge_inclusive[edge])
+    for caller, callee in edges[:top]:
+        lines.append(f"{emulator.edge_calls[caller, callee]:>8} "
+                     f"{emulator.edge_inclusive[caller, callee]:>12}  "
+                     f"{caller} -> {callee}")
+    return "\n".join(lines)
+
+
+if "__main__" == __name__:
+    # Runs a translated VM program and reports where its instructions went.
+    arg_parser = argparse.ArgumentParser(prog="Profiler")
+    arg_parser.add_argument(
+        "input_path", help="a .asm file written by the project08 translator")
+    arg_parser.add_argument(
+        "--halt", action="append", metavar="LABEL",
+        help="halt at this label, Sys.halt by default")
+    arg_parser.add_argument(
+        "--steps", type=int, default=1 << 62,
+        help="stop after this many instructions")
+    arg_parser.add_argument(
+        "--top", type=int, default=20, help="number of lines in each table")
+    arg_parser.add_argument(
+        "--folded", metavar="PATH",
+        help="write the stacks in the folded format of flamegraph.pl")
+    arg_parser.add_argument(
+        "--source-map", action="store_true",
+        help="also profile the Jack lines, using the source maps written by "
+             "the translator and the compiler with --source-map")
+    args = arg_parser.parse_args()
+    source_map = None
+    try:
+        rom, symbols, kinds = load_asm(args.input_path)
+        if args.source_map:
+            source_map = SourceMap.from_asm(args.input_path)
+    except (OSError, ValueError) as error:
+        sys.exit(f"Can't load {args.input_path}: {error}")
+    emulator = ProfilingEmulator(rom, symbols)
+    halts = args.halt
+    if halts is None:
+        halts = ["Sys.halt"] if "Sys.halt" in symbols else []
+    for label in halts:
+        if label not in symbols:
+            sys.exit(f"Unknown label: {label}")
+        emulator.add_halt(symbols[label])
+    emulator.run(args.steps)
+    emulator.finish()
+    print(report(emulator, kinds, args.top, source_map))
+    if args.folded:
+        with open(args.folded, 'w') as folded_file:
+            for stack, count in sorted(emulator.folded.items()):
+                if count:
+                    folded_file.write(f"{stack} {count}\n")
@@ -0,0 +1,155 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import bisect
+import os
+import sys
+import typing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the assembler is imported from project06, its modules don't clash with ours.
+sys.path.append(os.path.join(ROOT, "project06"))
+from Assembler import Assembler, source_runs  # noqa: E402
+
+# every tool writes the source map of its output next to it, with this suffix
+MAP_EXTENSION = ".map"
+# the VM file of code which doesn't come from a VM command, in .asm maps
+NO_SOURCE = "-"
+
+
+class Location(typing.NamedTuple):
+    """Where the instruction at a ROM address came from. Every field is None
+    where it isn't known."""
+    asm_line: typing.Optional[int] = None
+    vm_file: typing.Optional[str] = None
+    vm_line: typing.Optional[int] = None
+    jack_file: typing.Optional[str] = None
+    jack_line: typing.Optional[int] = None
+
+
+def read_map(path: str) -> typing.Tuple[typing.Optional[str],
+                                        typing.List[typing.List[str]]]:
+    """Reads a side-car source map.
+
+    Args:
+        path (str): path of a .map file.
+
+    Returns:
+        typing.Tuple[typing.Optional[str], typing.List[typing.List[str]]]:
+        the source file named on the first line, or None if the map names a
+        source in every entry like the .asm maps do, and the words of every
+        entry.
+    """
+    with open(path) as map_file:
+        lines = [line.split() for line in map_file if line.strip()]
+    if lines and len(lines[0]) == 1:
+        return lines[0][0], lines[1:]
+    return None, lines
+
+
+class SourceMap:
+    """Follows the source maps of the toolchain from ROM addresses back to
+    the .asm, .vm and .jack lines they came from.
+
+    The assembler maps addresses to runs of .asm lines, the VM translator
+    maps runs of .asm lines to a VM file and line, and the compiler maps
+    runs of VM lines to Jack lines. Every map is a sorted list of runs, so
+    a lookup is a binary search at each stage.
+    """
+
+    def __init__(self, asm_runs: typing.List[typing.Tuple[int, int]],
+                 asm_map_path: str) -> None:
+        """
+        Args:
+            asm_runs (typing.List[typing.Tuple[int, int]]): the runs of .asm
+                lines of the program, as returned by source_runs().
+            asm_map_path (str): the map of the translator. The maps of the
+                compiler are looked up next to it, and VM files that have
+                none are only followed to their VM lines.
+        """
+        self.addresses = [address for address, _ in asm_runs]
+        self.address_lines = [line for _, line in asm_runs]
+        _, entries = read_map(asm_map_path)
+        self.asm_starts = [int(line) for line, _, _ in entries]
+        self.asm_sources = [(None if vm_file == NO_SOURCE else vm_file,
+                             int(vm_line)) for _, vm_file, vm_line in entries]
+        # the first VM line and the Jack line of every run, by VM file
+        self.vm_starts = {}
+        self.vm_sources = {}
+        self.jack_files = {}
+        directory = os.path.dirname(asm_map_path)
+        for vm_file, _ in self.asm_sources:
+            if vm_file is None or vm_file in self.jack_files:
+                continue
+            vm_map_path = os.path.join(directory, vm_file + MAP_EXTENSION)
+            if not os.path.exists(vm_map_path):
+                self.jack_files[vm_file] = None
+                continue
+            jack_file, entries = read_map(vm_map_path)
+            self.jack_files[vm_file] = jack_file
+            self.vm_starts[vm_file] = [int(line) for line, _ in entries]
+            self.vm_sources[vm_file] = [int(line) for _, line in entries]
+
+    @classmethod
+    def from_asm(cls, asm_path: str) -> "SourceMap":
+        """Loads the maps of a translated program, which is assembled again
+        for the lines of its instructions.
+
+        Args:
+            asm_path (str): path of the .asm file, with its map next to it.
+
+        Returns:
+            SourceMap: the source map of the program.
+        """
+        assembler = Assembler(source_map=True)
+        with open(asm_path) as input_file:
+            assembler.feed(input_file)
+        return cls(source_runs(assembler.lines), asm_path + MAP_EXTENSION)
+
+    @classmethod
+    def from_hack_map(cls, hack_map_path: str) -> "SourceMap":
+        """Loads the maps of an assembled program, starting at the map the
+        assembler wrote.
+
+        Args:
+            hack_map_path (str): path of the map of the .hack or .rom file.
+
+        Returns:
+            SourceMap: the source map of the program.
+        """
+        asm_file, entries = read_map(hack_map_path)
+        if asm_file is None:
+            raise ValueError(f"Not an assembler source map: {hack_map_path}")
+        return cls([(int(address), int(line)) for address, line in entries],
+                   os.path.join(os.path.dirname(hack_map_path),
+                                asm_file + MAP_EXTENSION))
+
+    def locate(self, address: int) -> Location:
+        """
+        Args:
+            address (int): a ROM address.
+
+        Returns:
+            Location: where the instruction at the address came from.
+        """
+        run = bisect.bisect_right(self.addresses, address) - 1
+        if run < 0:
+            return Location()
+        asm_line = self.address_lines[run] + address - self.addresses[run]
+        run = bisect.bisect_right(self.asm_starts, asm_line) - 1
+        if run < 0:
+            return Location(asm_line)
+        vm_file, vm_line = self.asm_sources[run]
+        if vm_file is None:
+            return Location(asm_line)
+        jack_file = self.jack_files.get(vm_file)
+        if jack_file is None:
+            return Location(asm_line, vm_file, vm_line)
+        run = bisect.bisect_right(self.vm_starts[vm_file], vm_line) - 1
+        if run < 0:
+            return Location(asm_line, vm_file, vm_line)
+        return Location(asm_line, vm_file, vm_line, jack_file,
+                        self.vm_sources[vm_file][run])
@@ -0,0 +1,301 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import tempfile
+import typing
+from array import array
+from Code import COMP_BINARY, DEST_BINARY, JUMP_BINARY, C_CMD_PREFIX, \
+    SHIFT_CMD_PREFIX, SHIFT_COMP_BINARY
+from SymbolTable import SymbolTable
+
+COMMENT_PREFIX = "//"
+# integer versions of the Code tables, already shifted into their place in
+# the 16-bit word, so a C command is encoded with two ORs.
+COMP_CODES = {mnemonic: int(C_CMD_PREFIX + bits, 2) << 6
+              for mnemonic, bits in COMP_BINARY.items()}
+COMP_CODES.update({mnemonic: int(SHIFT_CMD_PREFIX + bits, 2) << 6
+                   for mnemonic, bits in SHIFT_COMP_BINARY.items()})
+DEST_CODES = {mnemonic: int(bits, 2) << 3
+              for mnemonic, bits in DEST_BINARY.items()}
+JUMP_CODES = {mnemonic: int(bits, 2) for mnemonic, bits in JUMP_BINARY.items()}
+# an A command holds a 15-bit value, anything larger can't be loaded into A.
+MAX_A_VALUE = (1 << 15) - 1
+# number of instructions kept in memory at once by the streaming mode.
+STREAM_BLOCK_SIZE = 1 << 14
+# in the streaming spool, values from SPOOL_SYMBOL and up stand for the symbol
+# numbered (value - SPOOL_SYMBOL), smaller values are final 16-bit words.
+SPOOL_SYMBOL = 1 << 16
+# every distinct C command is encoded only once, later uses are a dict lookup.
+_c_command_cache = {}
+
+
+def clean_line(line: str) -> str:
+    """
+    Args:
+        line (str): a raw line of assembly code.
+
+    Returns:
+        str: the line without its comment and without any whitespace.
+    """
+    comment_index = line.find(COMMENT_PREFIX)
+    if comment_index != -1:
+        line = line[:comment_index]
+    return "".join(line.split())
+
+
+def encode_c_command(command: str) -> int:
+    """
+    Args:
+        command (str): a C command without whitespace, i.e "dest=comp;jump".
+
+    Returns:
+        int: the 16-bit binary code of the command.
+    """
+    word = _c_command_cache.get(command)
+    if word is None:
+        eq_index = command.find('=')
+        colon_index = command.find(';')
+        if colon_index == -1:
+            colon_index = len(command)
+        dest = command[:eq_index] if eq_index != -1 else ""
+        try:
+            word = COMP_CODES[command[eq_index + 1:colon_index]] | \
+                DEST_CODES[dest] | JUMP_CODES[command[colon_index + 1:]]
+        except KeyError:
+            raise ValueError(f"Invalid C command: {command}") from None
+        _c_command_cache[command] = word
+    return word
+
+
+class Assembler:
+    """Assembles Hack assembly in a single pass over the input.
+
+    Every line is cleaned and classified exactly once. A commands and C
+    commands are stored as their final 16-bit value right away, while A
+    commands that use a symbol get a placeholder and are listed as fixups,
+    which are resolved once all the labels in the program are known.
+    """
+
+    def __init__(self, source_map: bool = False) -> None:
+        """Creates a new assembler with an empty program.
+
+        Args:
+            source_map (bool): keep the input line of every instruction in
+                lines, for write_source_map().
+        """
+        self.symbols = SymbolTable()
+        # the assembled program, one int per ROM address.
+        self.words = []
+        # (ROM address, symbol) of every A command that uses a symbol.
+        self.fixups = []
+        # the line number of every instruction, if a source map is kept, and
+        # the number of lines fed so far.
+        self.lines = [] if source_map else None
+        self.line_count = 0
+
+    def feed(self, lines: typing.Iterable[str]) -> None:
+        """Classifies and encodes the given lines of assembly code.
+
+        Args:
+            lines (typing.Iterable[str]): lines of assembly code.
+        """
+        words = self.words
+        fixups = self.fixups
+        symbols = self.symbols
+        source_lines = self.lines
+        number = self.line_count
+        for number, line in enumerate(lines, self.line_count + 1):
+            line = clean_line(line)
+            if not line:
+                continue
+            first = line[0]
+            if source_lines is not None and first != '(':
+                source_lines.append(number)
+            if first == '@':
+                value = line[1:]
+                if value.isdigit():
+                    value = int(value)
+                    if value > MAX_A_VALUE:
+                        raise ValueError(f"A command value out of range: {line}")
+                    words.append(value)
+                else:
+                    fixups.append((len(words), value))
+                    words.append(0)
+            elif first == '(':
+                symbols.add_entry(line[1:line.find(')')], len(words))
+            else:
+                words.append(encode_c_command(line))
+        self.line_count = number
+
+    def resolve(self) -> typing.List[int]:
+        """Resolves every symbol used by an A command. Symbols which are not
+        labels are allocated as variables, in order of first appearance.
+
+        Returns:
+            typing.List[int]: the assembled program, one int per ROM address.
+        """
+        words = self.words
+        table = self.symbols.symbols
+        next_variable = SymbolTable.FIRST_USABLE_INDEX
+        for address, symbol in self.fixups:
+            value = table.get(symbol)
+            if value is None:
+                value = table[symbol] = next_variable
+                next_variable += 1
+            elif value > MAX_A_VALUE:
+                raise ValueError(f"Address of {symbol} is out of range: {value}")
+            words[address] = value
+        self.fixups = []
+        return words
+
+
+def write_hack(words: typing.Iterable[int], output_file: typing.TextIO) -> None:
+    """Writes assembled words in the textual .hack format, with one write.
+
+    Args:
+        words (typing.Iterable[int]): the assembled program.
+        output_file (typing.TextIO): writes all output to this file.
+    """
+    text = "\n".join([format(word, "016b") for word in words])
+    if text:
+        output_file.write(text + "\n")
+
+
+def source_runs(
+        lines: typing.List[int]) -> typing.List[typing.Tuple[int, int]]:
+    """
+    Args:
+        lines (typing.List[int]): the source line of every instruction, as
+            kept by an Assembler created with source_map=True.
+
+    Returns:
+        typing.List[typing.Tuple[int, int]]: (address, line) at the start of
+        every run of instructions from consecutive lines: the instruction at
+        the address came from the line, and each one after it in the run
+        from the next line.
+    """
+    runs = []
+    previous = None
+    for address, line in enumerate(lines):
+        if previous is None or line != previous + 1:
+            runs.append((address, line))
+        previous = line
+    return runs
+
+
+def write_source_map(lines: typing.List[int], source_name: str,
+                     map_file: typing.TextIO) -> None:
+    """Writes the side-car source map of an assembled program. The first
+    line is the name of the source file, and every following line is a run
+    of source_runs(), "address line".
+
+    Args:
+        lines (typing.List[int]): the source line of every instruction, as
+            kept by an Assembler created with source_map=True.
+        source_name (str): name of the .asm file.
+        map_file (typing.TextIO): writes the map to this file.
+    """
+    entries = [source_name] + [f"{address} {line}"
+                               for address, line in source_runs(lines)]
+    map_file.write("\n".join(entries) + "\n")
+
+
+def assemble_blocks(input_file: typing.TextIO,
+                    block_size: int = STREAM_BLOCK_SIZE
+                    ) -> typing.Iterator[typing.List[int]]:
+    """Assembles a single file with memory that does not grow with its size.
+
+    The input is read line by line through the file's own buffer, and the
+    encoded instructions are spooled to a temporary file as 32-bit values,
+    where an A command that uses a symbol is stored as the symbol's number.
+    After the labels are known the spool is read back block by block. Only
+    the symbols are kept in memory.
+
+    Args:
+        input_file (typing.TextIO): the file to assemble.
+        block_size (int): number of instructions to buffer at once.
+
+    Returns:
+        typing.Iterator[typing.List[int]]: the assembled program, in blocks
+        of at most block_size words.
+    """
+    symbols = SymbolTable()
+    # symbol name -> symbol number in the spool, and the other way around.
+    symbol_numbers = {}
+    symbol_names = []
+    with tempfile.TemporaryFile() as spool:
+        block = array('I')
+        address = 0
+        for line in input_file:
+            line = clean_line(line)
+            if not line:
+                continue
+            first = line[0]
+            if first == '(':
+                symbols.add_entry(line[1:line.find(')')], address)
+                continue
+            if first == '@':
+                value = line[1:]
+                if value.isdigit():
+                    value = int(value)
+                    if value > MAX_A_VALUE:
+                        raise ValueError(
+                            f"A command value out of range: {line}")
+                else:
+                    number = symbol_numbers.get(value)
+                    if number is None:
+                        number = symbol_numbers[value] = len(symbol_names)
+                        symbol_names.append(value)
+                    value = SPOOL_SYMBOL + number
+                block.append(value)
+            else:
+                block.append(encode_c_command(line))
+            address += 1
+            if len(block) >= block_size:
+                block.tofile(spool)
+                block = array('I')
+        block.tofile(spool)
+        # second pass over the spool: resolve symbols and hand out blocks.
+        spool.seek(0)
+        table = symbols.symbols
+        resolved = [None] * len(symbol_names)
+        next_variable = SymbolTable.FIRST_USABLE_INDEX
+        while True:
+            block = array('I')
+            block.frombytes(spool.read(block_size * block.itemsize))
+            if not block:
+                break
+            words = []
+            for value in block:
+                if value >= SPOOL_SYMBOL:
+                    number = value - SPOOL_SYMBOL
+                    value = resolved[number]
+                    if value is None:
+                        symbol = symbol_names[number]
+                        value = table.get(symbol)
+                        if value is None:
+                            value = table[symbol] = next_variable
+                            next_variable += 1
+                        elif value > MAX_A_VALUE:
+                            raise ValueError(f"Address of {symbol} is out of "
+                                             f"range: {value}")
+                        resolved[number] = value
+                words.append(value)
+            yield words
+
+
+def assemble_stream(input_file: typing.TextIO, output_file: typing.TextIO,
+                    block_size: int = STREAM_BLOCK_SIZE) -> None:
+    """Assembles a single file in the streaming mode of assemble_blocks,
+    writing the output incrementally.
+
+    Args:
+        input_file (typing.TextIO): the file to assemble.
+        output_file (typing.TextIO): writes all output to this file.
+        block_size (int): number of instructions to buffer at once.
+    """
+    for words in assemble_blocks(input_file, block_size):
+        write_hack(words, output_file)
@@ -0,0 +1,100 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import hashlib
+import os
+import subprocess
+import sys
+import tempfile
+import typing
+
+# runs a single assembly in a fresh interpreter, so the peak RSS it reports
+# belongs to that assembly alone. prints "<seconds> <peak RSS in KiB>".
+CHILD_CODE = """
+import resource, sys, time
+from Main import assemble_file
+start = time.perf_counter()
+with open(sys.argv[1]) as input_file, open(sys.argv[2], 'w') as output_file:
+    assemble_file(input_file, output_file, sys.argv[3] == "stream")
+print(time.perf_counter() - start,
+      resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+MODES = ["assemble_file", "stream"]
+# number of instructions in each block of the synthetic program.
+BLOCK_SIZE = 14
+# number of distinct labels in the synthetic program.
+N_LABELS = 64
+
+
+def generate_asm(path: str, n_blocks: int) -> None:
+    """Writes a synthetic program made of n_blocks copies of a small loop of
+    BLOCK_SIZE instructions. Only the first blocks define labels, so that
+    every label address still fits in an A command.
+
+    Args:
+        path (str): path of the .asm file to create.
+        n_blocks (int): number of loop blocks in the program.
+    """
+    with open(path, 'w') as output_file:
+        for i in range(n_blocks):
+            label = i % N_LABELS
+            if i == label:
+                output_file.write(f"(LOOP{label})\n")
+            output_file.write(
+                f"// block {i}\n@{i % 1000}\nD=A\n@count{i % 512}\nM=D\n"
+                f"@count{i % 512}\nMD=M-1\n@LOOP{label}\nD;JEQ\n"
+                f"@sum\nM=D+M\n@SP\nM=M<<\n@LOOP{label}\n0;JMP\n")
+
+
+def measure(mode: str, input_path: str,
+            output_path: str) -> typing.Tuple[float, int]:
+    """Assembles input_path in a child process using the given mode.
+
+    Args:
+        mode (str): one of MODES.
+        input_path (str): the file to assemble.
+        output_path (str): where to write the assembled program.
+
+    Returns:
+        typing.Tuple[float, int]: the run time in seconds and the peak RSS
+        in KiB.
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD_CODE, input_path, output_path, mode],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        check=True, capture_output=True, text=True)
+    seconds, peak = result.stdout.split()
+    return float(seconds), int(peak)
+
+
+if "__main__" == __name__:
+    arg_parser = argparse.ArgumentParser(prog="Benchmark")
+    arg_parser.add_argument("--blocks", type=int, nargs="+",
+                            default=[1000, 10000, 100000],
+                            help="program sizes, in loop blocks")
+    args = arg_parser.parse_args()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_path = os.path.join(temp_dir, "Bench.asm")
+        print(f"{'commands':>10} {'mode':>14} {'seconds':>9} "
+              f"{'peak KiB':>10}")
+        for n_blocks in args.blocks:
+            generate_asm(input_path, n_blocks)
+            digests = set()
+            for mode in MODES:
+                output_path = os.path.join(temp_dir, f"{mode}.hack")
+                seconds, peak = measure(mode, input_path, output_path)
+                print(f"{n_blocks * BLOCK_SIZE:>10} {mode:>14} "
+                      f"{seconds:>9.3f} {peak:>10}")
+                # only a digest is kept: the children are forked from this
+                # process, so its own size would show up in their peak RSS.
+                digest = hashlib.sha256()
+                with open(output_path, 'rb') as output_file:
+                    for chunk in iter(lambda: output_file.read(1 << 16), b""):
+                        digest.update(chunk)
+                digests.add(digest.digest())
+            if len(digests) != 1:
+                sys.exit("Benchmark failed: modes produced different output")
@@ -0,0 +1,230 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import typing
+
+# the cache directory and its size bound, in bytes, can be chosen with these
+# environment variables
+CACHE_DIR_ENV = "N2T_CACHE_DIR"
+CACHE_SIZE_ENV = "N2T_CACHE_SIZE"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache",
+                                 "nand2tetris")
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+
+def tool_version(tool: str, source_dir: str) -> str:
+    """
+    Args:
+        tool (str): the name of the tool using the cache.
+        source_dir (str): the directory of the tool's modules.
+
+    Returns:
+        str: a hash of the tool's name and the source of every module in
+        source_dir, so any change to the tool invalidates its entries.
+    """
+    digest = hashlib.sha256(tool.encode())
+    for filename in sorted(os.listdir(source_dir)):
+        if filename.endswith(".py"):
+            with open(os.path.join(source_dir, filename), 'rb') as source:
+                digest.update(filename.encode())
+                digest.update(source.read())
+    return digest.hexdigest()
+
+
+class BuildCache:
+    """
+    An on-disk, content-addressed cache of build outputs. Entries are keyed
+    by a hash of the tool version and the inputs of a build step, and the
+    least recently used entries are evicted once the cache is too large.
+
+    Lookups don't count as hits or misses by themselves, since a build step
+    may look up more than one output. The tool calls record() once for
+    every build step instead.
+    """
+
+    def __init__(self, tool: str, cache_dir: typing.Optional[str] = None,
+                 max_size: typing.Optional[int] = None,
+                 source_dir: typing.Optional[str] = None) -> None:
+        """Opens the cache, creating its directory if needed.
+
+        Args:
+            tool (str): the name of the tool using the cache.
+            cache_dir (str): the cache directory, by default $N2T_CACHE_DIR
+                or ~/.cache/nand2tetris.
+            max_size (int): size in bytes the cache is pruned down to, by
+                default $N2T_CACHE_SIZE or DEFAULT_MAX_SIZE.
+            source_dir (str): the directory of the tool's modules, which are
+                hashed into its version. by default, the directory of this
+                module, i.e the assembler's.
+        """
+        self.cache_dir = cache_dir or os.environ.get(CACHE_DIR_ENV,
+                                                     DEFAULT_CACHE_DIR)
+        if max_size is None:
+            max_size = int(os.environ.get(CACHE_SIZE_ENV, DEFAULT_MAX_SIZE))
+        self.max_size = max_size
+        self.version = tool_version(
+            tool, source_dir or os.path.dirname(os.path.abspath(__file__)))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, *parts: typing.Union[str, bytes]) -> str:
+        """
+        Args:
+            *parts (typing.Union[str, bytes]): everything the output of the
+                build step depends on, i.e the input contents and options.
+
+        Returns:
+            str: the key of the build step's output.
+        """
+        digest = hashlib.sha256(self.version.encode())
+        for part in parts:
+            if isinstance(part, str):
+                part = part.encode()
+            # the length keeps ("ab", "c") and ("a", "bc") apart
+            digest.update(len(part).to_bytes(8, "little"))
+            digest.update(part)
+        return digest.hexdigest()
+
+    @staticmethod
+    def hash_file(path: str) -> str:
+        """
+        Args:
+            path (str): path of an input file.
+
+        Returns:
+            str: a hash of the file's contents, read in bounded chunks.
+        """
+        digest = hashlib.sha256()
+        with open(path, 'rb') as input_file:
+            for chunk in iter(lambda: input_file.read(1 << 16), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key: str) -> typing.Optional[bytes]:
+        """
+        Args:
+            key (str): a key returned by key().
+
+        Returns:
+            typing.Optional[bytes]: the cached output, or None on a miss.
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'rb') as entry:
+                data = entry.read()
+        except OSError:
+            return None
+        self._touch(entry_path)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Stores an output in the cache.
+
+        Args:
+            key (str): a key returned by key().
+            data (bytes): the output of the build step.
+        """
+        entry_dir = os.path.dirname(self._entry_path(key))
+        os.makedirs(entry_dir, exist_ok=True)
+        # write to a temporary file first, so readers never see half an entry
+        fd, temp_path = tempfile.mkstemp(dir=entry_dir)
+        with os.fdopen(fd, 'wb') as entry:
+            entry.write(data)
+        os.replace(temp_path, self._entry_path(key))
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """Copies a cached output to output_path, if it is in the cache.
+
+        Args:
+            key (str): a key returned by key().
+            output_path (str): where to write the output.
+
+        Returns:
+            bool: True on a hit, False on a miss.
+        """
+        entry_path = self._entry_path(key)
+        try:
+            shutil.copyfile(entry_path, output_path)
+        except FileNotFoundError:
+            return False
+        self._touch(entry_path)
+        return True
+
+    def store(self, key: str, output_path: str) -> None:
+        """Stores the output file of a build step in the cache.
+
+        Args:
+            key (str): a key returned by key().
+            output_path (str): the output written by the build step.
+        """
+        entry_dir = os.path.dirname(self._entry_path(key))
+        os.makedirs(entry_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=entry_dir)
+        os.close(fd)
+        shutil.copyfile(output_path, temp_path)
+        os.replace(temp_path, self._entry_path(key))
+
+    def record(self, hit: bool) -> None:
+        """Counts a build step in the statistics of this run.
+
+        Args:
+            hit (bool): whether the outputs of the step came from the cache.
+        """
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def prune(self) -> None:
+        """Evicts least recently used entries until the cache fits in
+        max_size.
+        """
+        entries = []
+        total_size = 0
+        for entry_dir, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                entry_path = os.path.join(entry_dir, filename)
+                try:
+                    stat = os.stat(entry_path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry_path))
+                total_size += stat.st_size
+        entries.sort()
+        for _, size, entry_path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            self.evictions += 1
+
+    def summary(self) -> str:
+        """
+        Returns:
+            str: the hit, miss and eviction counts of this run.
+        """
+        return f"cache: {self.hits} hits, {self.misses} misses, " \
+               f"{self.evictions} evicted"
+
+    @staticmethod
+    def _touch(entry_path: str) -> None:
+        # entries are ordered by modification time for the LRU eviction
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
@@ -12,7 +12,7 @@ DEST_BINARY = {"": "000", "M": "001", "D": "010", "MD": "011", "A": "100",
 
 COMP_BINARY = {"0": "0101010", "1": "0111111", "-1": "0111010",
                "D": "0001100", "A": "0110000", "M": "1110000",
-               "!D": "0001100", "!A": "0110001", "!M": "1110001",
+               "!D": "0001101", "!A": "0110001", "!M": "1110001",
                "-D": "0001111", "-A": "0110011", '-M': "1110011",
                "D+1": "0011111", "A+1": "0110111", "M+1": "1110111",
                "D-1": "0001110", "A-1": "0110010", "M-1": "1110010",
@@ -20,6 +20,17 @@ COMP_BINARY = {"0": "0101010", "1": "0111111", "-1": "0111010",
                "D-M": "1010011", "A-D": "0000111", "M-D": "1000111",
                "D&A": "0000000", "D&M": "1000000", "D|A": "0010101",
                "D|M": "1010101"}
+# the commutative forms of the binary operations, i.e "M+D" for "D+M"
+COMP_BINARY.update({"A+D": COMP_BINARY["D+A"], "M+D": COMP_BINARY["D+M"],
+                    "A&D": COMP_BINARY["D&A"], "M&D": COMP_BINARY["D&M"],
+                    "A|D": COMP_BINARY["D|A"], "M|D": COMP_BINARY["D|M"]})
+
+# the shift extension of the CPU (see project05/CpuMul.hdl). These comp
+# mnemonics are encoded with SHIFT_CMD_PREFIX instead of C_CMD_PREFIX.
+C_CMD_PREFIX = "111"
+SHIFT_CMD_PREFIX = "101"
+SHIFT_COMP_BINARY = {"A<<": "0100000", "D<<": "0110000", "M<<": "1100000",
+                     "A>>": "0000000", "D>>": "0010000", "M>>": "1000000"}
 
 JUMP_BINARY = {"": "000", "JGT": "001", "JEQ": "010", "JGE": "011",
                "JLT": "100", "JNE": "101", "JLE": "110", "JMP": "111"}
@@ -4,79 +4,263 @@ https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
 and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
 Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import concurrent.futures
+import mmap
 import os
 import sys
+import time
 import typing
-from SymbolTable import SymbolTable
-from Parser import Parser
-from Code import Code
+from array import array
+from Assembler import Assembler, assemble_blocks, write_hack, \
+    write_source_map
+from BuildCache import BuildCache
 
-# the prefix A command or C command starts with
-A_CMD_PREFIX = "0"
-C_CMD_PREFIX = "111"
+# output formats: the textual .hack file, or a packed array of uint16 words.
+TEXT_FORMAT = "text"
+BINARY_FORMAT = "binary"
+OUTPUT_EXTENSIONS = {TEXT_FORMAT: ".hack", BINARY_FORMAT: ".rom"}
+# the source map of an output file is written next to it, with this suffix
+MAP_EXTENSION = ".map"
 
 
-def assemble_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+def write_rom(words: typing.Iterable[int], output_file: typing.BinaryIO,
+              byteorder: str = "little") -> None:
+    """Writes assembled words as a packed ROM image, 2 bytes per word.
+
+    Args:
+        words (typing.Iterable[int]): the assembled program.
+        output_file (typing.BinaryIO): writes all output to this file.
+        byteorder (str): "little" or "big".
+    """
+    rom = array('H', words)
+    if byteorder != sys.byteorder:
+        rom.byteswap()
+    rom.tofile(output_file)
+
+
+def read_rom(path: str, byteorder: str = "little") -> memoryview:
+    """Loads a ROM image written by write_rom. When the image's byte order is
+    the machine's own, the file is memory-mapped and no copy is made.
+
+    Args:
+        path (str): path of the ROM image.
+        byteorder (str): "little" or "big".
+
+    Returns:
+        memoryview: the words of the ROM, as unsigned 16-bit integers.
+    """
+    with open(path, 'rb') as rom_file:
+        size = os.fstat(rom_file.fileno()).st_size
+        if size % 2:
+            raise ValueError(f"{path}: a ROM image holds 16-bit words, but "
+                             f"its size is {size} bytes")
+        if size == 0:
+            # an empty file can't be mapped
+            return memoryview(array('H'))
+        # the mapping stays valid after the file is closed
+        rom_map = mmap.mmap(rom_file.fileno(), 0, access=mmap.ACCESS_READ)
+    if byteorder == sys.byteorder:
+        return memoryview(rom_map).cast('H')
+    rom = array('H')
+    rom.frombytes(rom_map)
+    rom_map.close()
+    rom.byteswap()
+    return memoryview(rom)
+
+
+def assemble_file(input_file: typing.TextIO,
+                  output_file: typing.Union[typing.TextIO, typing.BinaryIO],
+                  stream: bool = False, output_format: str = TEXT_FORMAT,
+                  byteorder: str = "little",
+                  map_file: typing.Optional[typing.TextIO] = None) -> None:
     """Assembles a single file.
 
     Args:
         input_file (typing.TextIO): the file to assemble.
-        output_file (typing.TextIO): writes all output to this file.
+        output_file (typing.Union[typing.TextIO, typing.BinaryIO]): writes
+            all output to this file, which should be opened in binary mode
+            for the binary format.
+        stream (bool): use the streaming mode, whose memory usage doesn't
+            depend on the size of the input.
+        output_format (str): TEXT_FORMAT or BINARY_FORMAT.
+        byteorder (str): byte order of the binary format, "little" or "big".
+        map_file (typing.Optional[typing.TextIO]): if given, the source map
+            of ROM addresses to input lines is written to this file. Can't
+            be used in the streaming mode.
+    """
+    if stream:
+        if map_file is not None:
+            raise ValueError("Source maps aren't kept in the streaming mode")
+        blocks = assemble_blocks(input_file)
+    else:
+        # each line is classified once, labels are resolved by fixups at the
+        # end. Parser, Code and SymbolTable are kept for direct users.
+        assembler = Assembler(map_file is not None)
+        assembler.feed(input_file)
+        blocks = [assembler.resolve()]
+        if map_file is not None:
+            write_source_map(assembler.lines, os.path.basename(
+                getattr(input_file, "name", "")), map_file)
+    for words in blocks:
+        if output_format == BINARY_FORMAT:
+            write_rom(words, output_file, byteorder)
+        else:
+            write_hack(words, output_file)
+
+
+def assemble_path(input_path: str, stream: bool = False,
+                  output_format: str = TEXT_FORMAT, byteorder: str = "little",
+                  cache: typing.Optional[BuildCache] = None,
+                  source_map: bool = False) -> typing.Tuple[float, bool]:
+    """Assembles the .asm file at input_path into the output file next to it,
+    with the extension matching output_format.
+
+    Args:
+        input_path (str): path of the file to assemble.
+        stream (bool): use the streaming mode.
+        output_format (str): TEXT_FORMAT or BINARY_FORMAT.
+        byteorder (str): byte order of the binary format.
+        cache (typing.Optional[BuildCache]): if given, unchanged inputs are
+            copied from the cache instead of being assembled again.
+        source_map (bool): also write the source map of the output, next to
+            it with MAP_EXTENSION added.
+
+    Returns:
+        typing.Tuple[float, bool]: the time it took to assemble the file, in
+        seconds, and whether the output was taken from the cache.
     """
-    symbols = SymbolTable()
-    parser = Parser(input_file)
-    address_count = 0
-    # first pass. comments are already deleted in Parser class init.
-    while parser.has_more_commands():
-        parser.advance()
-        # add each L command to SymbolTable
-        if parser.command_type() == Parser.L_CMD:
-            symbols.add_entry(parser.symbol(), address_count)
+    start = time.perf_counter()
+    output_path = os.path.splitext(input_path)[0] + \
+        OUTPUT_EXTENSIONS[output_format]
+    map_path = output_path + MAP_EXTENSION
+    if cache is not None:
+        key = cache.key(BuildCache.hash_file(input_path), output_format,
+                        byteorder)
+        # the map names the input file, so its name is a part of the key
+        map_key = cache.key(BuildCache.hash_file(input_path),
+                            os.path.basename(input_path), MAP_EXTENSION)
+        if cache.fetch(key, output_path) and \
+                (not source_map or cache.fetch(map_key, map_path)):
+            return time.perf_counter() - start, True
+    output_mode = 'wb' if output_format == BINARY_FORMAT else 'w'
+    with open(input_path, 'r') as input_file, \
+            open(output_path, output_mode) as output_file:
+        if source_map:
+            with open(map_path, 'w') as map_file:
+                assemble_file(input_file, output_file, stream, output_format,
+                              byteorder, map_file)
         else:
-            address_count += 1
-    # Second Pass.
-    parser.reset()
-    var_count = 0
-    while parser.has_more_commands():
-        parser.advance()
-        cmd_type = parser.command_type()
-        if cmd_type == Parser.A_CMD:
-            a_symbol = parser.symbol()
-            # A command is numeric or variable, writes binary cmd accordingly
-            if a_symbol.isnumeric():
-                a_binary = '{0:015b}'.format(int(a_symbol))
-            else:
-                if not symbols.contains(a_symbol):
-                    symbols.add_entry(a_symbol, var_count + SymbolTable.FIRST_USABLE_INDEX)
-                    var_count += 1
-                a_binary = '{0:015b}'.format(symbols.get_address(a_symbol))
-            print(A_CMD_PREFIX + a_binary, file=output_file)
-
-        elif cmd_type == Parser.C_CMD:
-            # builds C command using Code class and writes into output file
-            c_command = Code.comp(parser.comp())
-            c_command += Code.dest(parser.dest())
-            c_command += Code.jump(parser.jump())
-            print(C_CMD_PREFIX + c_command, file=output_file)
+            assemble_file(input_file, output_file, stream, output_format,
+                          byteorder)
+    if cache is not None:
+        cache.store(key, output_path)
+        if source_map:
+            cache.store(map_key, map_path)
+    return time.perf_counter() - start, False
+
+
+def assemble_parallel(input_paths: typing.List[str], jobs: int,
+                      stream: bool = False, output_format: str = TEXT_FORMAT,
+                      byteorder: str = "little",
+                      cache: typing.Optional[BuildCache] = None,
+                      source_map: bool = False) -> int:
+    """Assembles the given files in a pool of worker processes, printing each
+    file and its timing as it finishes. Every file is assembled on its own,
+    so the output files are identical to the serial ones.
+
+    Args:
+        input_paths (typing.List[str]): paths of the files to assemble.
+        jobs (int): number of worker processes.
+        stream (bool): use the streaming mode.
+        output_format (str): TEXT_FORMAT or BINARY_FORMAT.
+        byteorder (str): byte order of the binary format.
+        cache (typing.Optional[BuildCache]): the build cache, if any. A hit
+            or a miss is recorded in it for every file the workers
+            assemble.
+        source_map (bool): also write the source map of every output.
+
+    Returns:
+        int: the number of files that failed to assemble.
+    """
+    failures = 0
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(assemble_path, input_path, stream,
+                               output_format, byteorder, cache,
+                               source_map): input_path
+                   for input_path in input_paths}
+        for done, future in enumerate(
+                concurrent.futures.as_completed(futures), 1):
+            name = os.path.basename(futures[future])
+            try:
+                seconds, cached = future.result()
+                if cache is not None:
+                    cache.record(cached)
+                print(f"[{done}/{len(futures)}] {name} {seconds:.3f}s"
+                      f"{' (cached)' if cached else ''}", flush=True)
+            except Exception as error:
+                failures += 1
+                print(f"[{done}/{len(futures)}] {name} failed: {error}",
+                      file=sys.stderr, flush=True)
+    print(f"assembled {len(input_paths) - failures} of {len(input_paths)} "
+          f"files in {time.perf_counter() - start:.3f}s with {jobs} jobs")
+    return failures
 
 
 if "__main__" == __name__:
     # Parses the input path and calls assemble_file on each input file
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: Assembler <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    arg_parser = argparse.ArgumentParser(prog="Assembler")
+    arg_parser.add_argument("input_path")
+    arg_parser.add_argument(
+        "--stream", action="store_true",
+        help="assemble with bounded memory, for very large inputs")
+    arg_parser.add_argument(
+        "--format", choices=[TEXT_FORMAT, BINARY_FORMAT], default=TEXT_FORMAT,
+        help="write a textual .hack file or a packed binary .rom image")
+    arg_parser.add_argument(
+        "--byteorder", choices=["little", "big"], default="little",
+        help="byte order of the words in a binary .rom image")
+    arg_parser.add_argument(
+        "--jobs", type=int,
+        help="assemble in N worker processes, reporting per-file timings")
+    arg_parser.add_argument(
+        "--cache", nargs="?", const="", metavar="DIR",
+        help="skip unchanged files using a build cache, by default in "
+             "$N2T_CACHE_DIR or ~/.cache/nand2tetris")
+    arg_parser.add_argument(
+        "--source-map", action="store_true",
+        help="also write the input line of every ROM address to a .map file "
+             "next to the output")
+    args = arg_parser.parse_args()
+    if args.source_map and args.stream:
+        arg_parser.error("--source-map can't be used with --stream")
+    cache = None if args.cache is None else BuildCache(
+        "Assembler", args.cache or None,
+        source_dir=os.path.dirname(os.path.abspath(__file__)))
+    argument_path = os.path.abspath(args.input_path)
     if os.path.isdir(argument_path):
         files_to_assemble = [
             os.path.join(argument_path, filename)
             for filename in os.listdir(argument_path)]
     else:
         files_to_assemble = [argument_path]
-    for input_path in files_to_assemble:
-        filename, extension = os.path.splitext(input_path)
-        if extension.lower() != ".asm":
-            continue
-        output_path = filename + ".hack"
-        with open(input_path, 'r') as input_file, \
-                open(output_path, 'w') as output_file:
-            assemble_file(input_file, output_file)
+    files_to_assemble = sorted(
+        input_path for input_path in files_to_assemble
+        if os.path.splitext(input_path)[1].lower() == ".asm")
+    if args.jobs:
+        failures = assemble_parallel(files_to_assemble, args.jobs,
+                                     args.stream, args.format, args.byteorder,
+                                     cache, args.source_map)
+    else:
+        failures = 0
+        for input_path in files_to_assemble:
+            _, cached = assemble_path(input_path, args.stream, args.format,
+                                      args.byteorder, cache, args.source_map)
+            if cache is not None:
+                cache.record(cached)
+    if cache is not None:
+        cache.prune()
+        print(cache.summary())
+    if failures:
+        sys.exit(1)
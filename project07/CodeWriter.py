@@ -11,6 +11,8 @@ from Parser import Parser
 PUSH_CMD = "@SP\nA=M\nM=D\n@SP\nM=M+1\n"
 # common code for several pop types
 POP_CMD = "@R13\nM=D\n@SP\nM=M-1\nA=M\nD=M\n@R13\nA=M\nM=D\n"
+# output is buffered, and written to the stream in blocks of about this size
+FLUSH_SIZE = 1 << 16
 
 
 def write_pop_static(index: int, file_name: str) -> str:
@@ -90,17 +92,50 @@ def write_eq_gt_lt(cmd: str, label: str) -> str:
 class CodeWriter:
     """Translates VM commands into Hack assembly code."""
 
-    def __init__(self, output_stream: typing.TextIO) -> None:
+    def __init__(self, output_stream: typing.TextIO,
+                 comments: bool = True) -> None:
         """Initializes the CodeWriter.
 
         Args:
             output_stream (typing.TextIO): output stream.
+            comments (bool): write a comment with every VM command, and a
+                blank line after it. flush() must be called once the
+                translation is done either way.
         """
         self.output_stream = output_stream
+        self.comments = comments
+        # code that wasn't written to the stream yet, and its length
+        self.chunks = []
+        self.buffered = 0
         self.file_name = ""
         # will be used to create new labels for static args.
         self.nextLabel = 0
 
+    def write(self, asm_code: str) -> None:
+        """Buffers a fragment of assembly code, which is followed by a blank
+        line like print() would do, unless comments are off. The buffer is
+        flushed once it is large enough.
+
+        Args:
+            asm_code (str): the code to write.
+        """
+        if self.comments:
+            self.chunks.append(asm_code)
+            self.chunks.append("\n")
+            self.buffered += len(asm_code) + 1
+        else:
+            self.chunks.append(asm_code)
+            self.buffered += len(asm_code)
+        if self.buffered >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes all buffered code to the output stream."""
+        if self.chunks:
+            self.output_stream.write("".join(self.chunks))
+            self.chunks = []
+            self.buffered = 0
+
     def set_file_name(self, filename: str) -> None:
         """
         Informs the code writer that the translation of a new VM file is
@@ -119,7 +154,7 @@ class CodeWriter:
             command (str): an arithmetic command.
         """
         # begin by writing a comment with the exact command
-        asm_code = "// " + command + "\n"
+        asm_code = "// " + command + "\n" if self.comments else ""
         # call each writing function specific to a group of commands that uses similar code
         if command in ["add", "sub"]:
             asm_code += write_add_sub(command)
@@ -132,7 +167,7 @@ class CodeWriter:
             self.nextLabel += 1
             asm_code += write_eq_gt_lt(command, label)
         # write the final code into the output file
-        print(asm_code, file=self.output_stream)
+        self.write(asm_code)
 
     def write_push_pop(self, command: str, segment: str, index: int) -> None:
         """Writes the assembly code that is the translation of the given
@@ -144,7 +179,7 @@ class CodeWriter:
             index (int): the index in the memory segment.
         """
         # first write a comment with the command type
-        asm_code = f"// {command} {segment} {index}\n"
+        asm_code = f"// {command} {segment} {index}\n" if self.comments else ""
         # call each writing function specific to a group of commands that uses similar code
         # push command
         if command == Parser.C_PUSH:
@@ -163,4 +198,4 @@ class CodeWriter:
             elif segment in ["temp", "pointer"]:
                 asm_code += write_pop_temp_pointer(segment, index)
         # write the final code into the output file
-        print(asm_code, file=self.output_stream)
+        self.write(asm_code)
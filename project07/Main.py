@@ -12,15 +12,17 @@ from CodeWriter import CodeWriter
 
 
 def translate_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+        input_file: typing.TextIO, output_file: typing.TextIO,
+        comments: bool = True) -> None:
     """Translates a single file.
 
     Args:
         input_file (typing.TextIO): the file to translate.
         output_file (typing.TextIO): writes all output to this file.
+        comments (bool): write a comment with every VM command.
     """
     parser = Parser(input_file)
-    codewriter = CodeWriter(output_file)
+    codewriter = CodeWriter(output_file, comments)
     while parser.has_more_commands():
         parser.advance()
         cmd_type = parser.command_type()
@@ -28,6 +30,7 @@ def translate_file(
             codewriter.write_push_pop(cmd_type, parser.arg1(), parser.arg2())
         elif cmd_type == Parser.C_MATH:
             codewriter.write_arithmetic(parser.arg1())
+    codewriter.flush()
 
 
 if "__main__" == __name__:
@@ -0,0 +1,150 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import typing
+import CodeWriter
+from Main import translate_file
+
+COMMENT_PREFIX = "//"
+# translation options of every column in the report
+MODES = {"plain": {}, "optimized": {"optimize": True},
+         "compact": {"compact": True},
+         "both": {"optimize": True, "compact": True}}
+# output settings compared by the throughput benchmark: the flush size, where
+# 0 writes every fragment on its own like print() did, and the comments flag
+WRITER_MODES = {"per fragment": (0, True),
+                "buffered": (CodeWriter.FLUSH_SIZE, True),
+                "no comments": (CodeWriter.FLUSH_SIZE, False)}
+
+
+def count_instructions(asm_code: str) -> int:
+    """
+    Args:
+        asm_code (str): Hack assembly code.
+
+    Returns:
+        int: the number of instructions in the code, which is the number of
+        ROM words it assembles to. Comments, labels and blank lines are
+        not counted.
+    """
+    count = 0
+    for line in asm_code.splitlines():
+        line = line.strip()
+        if line and not line.startswith(COMMENT_PREFIX) and \
+                not line.startswith("("):
+            count += 1
+    return count
+
+
+def translate_text(vm_code: str, file_name: str, **options) -> str:
+    """
+    Returns:
+        str: the translation of a single file's VM code.
+    """
+    output_file = io.StringIO()
+    translate_file(io.StringIO(vm_code), output_file, file_name, **options)
+    return output_file.getvalue()
+
+
+def measure_throughput(vm_files: typing.Dict[str, str], copies: int,
+                       flush_size: int,
+                       comments: bool) -> typing.Tuple[float, int]:
+    """Translates a large program, made of copies of the given files under
+    different names, into a file on disk.
+
+    Args:
+        vm_files (typing.Dict[str, str]): file name -> VM code.
+        copies (int): number of copies of the files in the program.
+        flush_size (int): size of the CodeWriter's output blocks.
+        comments (bool): write a comment with every VM command.
+
+    Returns:
+        typing.Tuple[float, int]: the run time in seconds and the size of
+        the output in bytes.
+    """
+    default_flush_size = CodeWriter.FLUSH_SIZE
+    CodeWriter.FLUSH_SIZE = flush_size
+    try:
+        with tempfile.TemporaryFile('w+') as output_file:
+            start = time.perf_counter()
+            for copy in range(copies):
+                for name, vm_code in vm_files.items():
+                    translate_file(io.StringIO(vm_code), output_file,
+                                   f"{name}{copy}", comments=comments)
+            output_file.flush()
+            seconds = time.perf_counter() - start
+            return seconds, output_file.tell()
+    finally:
+        CodeWriter.FLUSH_SIZE = default_flush_size
+
+
+if "__main__" == __name__:
+    # Translates every .vm file in the given directories in each of the MODES,
+    # and reports the number of emitted instructions. Files are translated
+    # without the bootstrap, so the few hundred instructions of the compact
+    # mode's shared routines are not counted.
+    arg_parser = argparse.ArgumentParser(prog="Benchmark")
+    arg_parser.add_argument("input_paths", nargs="+",
+                            help="directories of .vm files, i.e project12")
+    arg_parser.add_argument(
+        "--throughput", type=int, metavar="COPIES",
+        help="instead, measure the output throughput on a program made of "
+             "this many copies of all the input files")
+    args = arg_parser.parse_args()
+    if args.throughput:
+        vm_files = {}
+        for input_path in args.input_paths:
+            for filename in sorted(os.listdir(input_path)):
+                name, extension = os.path.splitext(filename)
+                if extension.lower() == ".vm":
+                    with open(os.path.join(input_path, filename)) as vm_file:
+                        vm_files[name] = vm_file.read()
+        if not vm_files:
+            sys.exit("No .vm files in the input paths")
+        n_lines = args.throughput * sum(vm_code.count("\n") + 1
+                                        for vm_code in vm_files.values())
+        print(f"{n_lines} VM lines in {args.throughput * len(vm_files)} files")
+        print(f"{'mode':>14} {'seconds':>9} {'lines/s':>10} {'MiB out':>8}")
+        for mode, (flush_size, comments) in WRITER_MODES.items():
+            seconds, size = measure_throughput(vm_files, args.throughput,
+                                               flush_size, comments)
+            print(f"{mode:>14} {seconds:>9.3f} {n_lines / seconds:>10.0f} "
+                  f"{size / (1 << 20):>8.1f}")
+        sys.exit()
+    print(f"{'file':>24}" + "".join(f" {mode:>10}" for mode in MODES))
+    for input_path in args.input_paths:
+        totals = dict.fromkeys(MODES, 0)
+        seconds = dict.fromkeys(MODES, 0.0)
+        for filename in sorted(os.listdir(input_path)):
+            name, extension = os.path.splitext(filename)
+            if extension.lower() != ".vm":
+                continue
+            with open(os.path.join(input_path, filename)) as input_file:
+                vm_code = input_file.read()
+            counts = {}
+            for mode, options in MODES.items():
+                start = time.perf_counter()
+                counts[mode] = count_instructions(
+                    translate_text(vm_code, name, **options))
+                seconds[mode] += time.perf_counter() - start
+                totals[mode] += counts[mode]
+            print(f"{filename:>24}" +
+                  "".join(f" {count:>10}" for count in counts.values()))
+        if not totals["plain"]:
+            sys.exit(f"No .vm files in {input_path}")
+        print(f"{os.path.basename(os.path.abspath(input_path)):>24}" +
+              "".join(f" {total:>10}" for total in totals.values()))
+        print(f"{'saved':>24}" + "".join(
+            f" {1 - total / totals['plain']:>10.1%}"
+            for total in totals.values()))
+        print(f"{'translation seconds':>24}" +
+              "".join(f" {second:>10.3f}" for second in seconds.values()))
@@ -4,6 +4,7 @@ https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
 and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import re
 import typing
 from Parser import Parser
 
@@ -12,6 +13,11 @@ PUSH_CMD = "@SP\nA=M\nM=D\n@SP\nM=M+1\n"
 # common code for several pop types
 POP_CMD = "@R13\nM=D\n@SP\nM=M-1\nA=M\nD=M\n@R13\nA=M\nM=D\n"
 INIT_CMD = "@256\nD=A\n@SP\nM=D\n"
+# output is buffered, and written to the stream in blocks of about this size
+FLUSH_SIZE = 1 << 16
+# comment lines and the blank lines between commands, removed when the
+# CodeWriter is created without comments
+COMMENT_LINES = re.compile(r"^//.*\n?|^\n", re.MULTILINE)
 
 
 def write_pop_static(index: int, file_name: str) -> str:
@@ -88,20 +94,130 @@ def write_eq_gt_lt(cmd: str, label: str) -> str:
     return asm_code
 
 
+def write_return() -> str:
+    asm_code = "// put LCL (endframe) into @R14\n"
+    asm_code += "@LCL\nD=M\n@R14\nM=D\n"
+    asm_code += "// ret_address = *(endframe - 5) into @R15\n"
+    asm_code += "@5\nD=A\n@R14\nA=M-D\nD=M\n@R15\nM=D\n"
+    asm_code += "// SP = ARG + 1\n"
+    asm_code += "@SP\nM=M-1\nA=M\nD=M\n@ARG\nA=M\nM=D\n@ARG\nD=M+1\n@SP\nM=D\n"
+    asm_code += "// THAT,THIS,ARG,LCL = *(endframe - i)\n"
+    asm_code += "@R14\nAM=M-1\nD=M\n@THAT\nM=D\n"
+    asm_code += "@R14\nAM=M-1\nD=M\n@THIS\nM=D\n"
+    asm_code += "@R14\nAM=M-1\nD=M\n@ARG\nM=D\n"
+    asm_code += "@R14\nAM=M-1\nD=M\n@LCL\nM=D\n"
+    asm_code += "@R15\nA=M\n0;JMP\n"
+    return asm_code
+
+
+RETURN_CMD = write_return()
+RETURN_CMD_NO_COMMENTS = COMMENT_LINES.sub("", RETURN_CMD)
+# saves the frame of the caller, once the return address is in D
+CALL_CMD_NO_COMMENTS = "@SP\nA=M\nM=D\n@SP\nM=M+1\n" + \
+    "".join(f"@{pointer}\nD=M\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
+            for pointer in ["LCL", "ARG", "THIS", "THAT"])
+
+
+# labels of the routines shared by all call sites in compact mode
+SHARED_CALL = "$$call"
+SHARED_RETURN = "$$return"
+SHARED_COMPARE = {"eq": "$$eq", "gt": "$$gt", "lt": "$$lt"}
+HALT_LABEL = "$$halt"
+
+
+def write_shared_compare(cmd: str) -> str:
+    # the return address is passed in D, the result is the same as inline
+    asm_code = f"({SHARED_COMPARE[cmd]})\n@R15\nM=D\n"
+    asm_code += write_eq_gt_lt(cmd, SHARED_COMPARE[cmd])
+    return asm_code + "@R15\nA=M\n0;JMP\n"
+
+
+def write_shared_call() -> str:
+    # the return address is passed in D, the number of arguments in R13 and
+    # the address of the called function in R14
+    asm_code = f"({SHARED_CALL})\n"
+    asm_code += "@SP\nA=M\nM=D\n@SP\nM=M+1\n"
+    asm_code += "@LCL\nD=M\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
+    asm_code += "@ARG\nD=M\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
+    asm_code += "@THIS\nD=M\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
+    asm_code += "@THAT\nD=M\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
+    asm_code += "@SP\nD=M\n@5\nD=D-A\n@R13\nD=D-M\n@ARG\nM=D\n"
+    asm_code += "@SP\nD=M\n@LCL\nM=D\n"
+    return asm_code + "@R14\nA=M\n0;JMP\n"
+
+
 class CodeWriter:
     """Translates VM commands into Hack assembly code."""
 
-    def __init__(self, output_stream: typing.TextIO) -> None:
+    def __init__(self, output_stream: typing.TextIO,
+                 compact: bool = False, comments: bool = True,
+                 source_map: bool = False) -> None:
         """Initializes the CodeWriter.
 
         Args:
             output_stream (typing.TextIO): output stream.
+            compact (bool): instead of inlining the code of every eq, gt, lt,
+                call and return, jump to a single shared routine for each.
+                This makes the program much smaller and a bit slower. The
+                routines are written with the bootstrap code.
+            comments (bool): write a comment with every VM command, and a
+                blank line after it. flush() must be called once the
+                translation is done either way.
+            source_map (bool): keep the VM line of the code written, in
+                source_map. The VM line of the next commands is set in
+                source_line.
         """
         self.output_stream = output_stream
+        self.compact = compact
+        self.comments = comments
+        # code that wasn't written to the stream yet, and its length
+        self.chunks = []
+        self.buffered = 0
         self.file_name = ""
         # will be used to create new labels for static args.
         self.nextLabel = 0
         self.nextCallLabel = 0
+        # (output line, VM file, VM line) at the start of every run of code
+        # from the same VM command, if a source map is kept. line 0 of no
+        # file is the code which doesn't come from a command, like the
+        # bootstrap.
+        self.source_map = [] if source_map else None
+        self.source_line = 0
+        self.line_count = 0
+
+    def write(self, asm_code: str) -> None:
+        """Buffers a fragment of assembly code, which is followed by a blank
+        line like print() would do. Without comments, the blank line and any
+        comment lines in the fragment are left out. The buffer is flushed
+        once it is large enough.
+
+        Args:
+            asm_code (str): the code to write.
+        """
+        if self.comments:
+            self.chunks.append(asm_code)
+            self.chunks.append("\n")
+            self.buffered += len(asm_code) + 1
+        else:
+            # the common commands don't write comments at all in this mode
+            if "//" in asm_code or "\n\n" in asm_code:
+                asm_code = COMMENT_LINES.sub("", asm_code)
+            self.chunks.append(asm_code)
+            self.buffered += len(asm_code)
+        if self.source_map is not None:
+            source = (self.file_name, self.source_line)
+            if not self.source_map or self.source_map[-1][1:] != source:
+                self.source_map.append((self.line_count + 1, *source))
+            self.line_count += asm_code.count("\n") + self.comments
+        if self.buffered >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes all buffered code to the output stream."""
+        if self.chunks:
+            self.output_stream.write("".join(self.chunks))
+            self.chunks = []
+            self.buffered = 0
 
     def set_file_name(self, filename: str) -> None:
         """
@@ -121,7 +237,7 @@ class CodeWriter:
             command (str): an arithmetic command.
         """
         # begin by writing a comment with the exact command
-        asm_code = "// " + command + "\n"
+        asm_code = "// " + command + "\n" if self.comments else ""
         # call each writing function specific to a group of commands that uses similar code
         if command in ["add", "sub"]:
             asm_code += write_add_sub(command)
@@ -132,9 +248,13 @@ class CodeWriter:
         elif command in ["eq", "gt", "lt"]:
             label = "." + self.file_name + "." + str(self.nextLabel)
             self.nextLabel += 1
-            asm_code += write_eq_gt_lt(command, label)
+            if self.compact:
+                asm_code += f"@cmp{label}\nD=A\n@{SHARED_COMPARE[command]}\n" \
+                            f"0;JMP\n(cmp{label})\n"
+            else:
+                asm_code += write_eq_gt_lt(command, label)
         # write the final code into the output file
-        print(asm_code, file=self.output_stream)
+        self.write(asm_code)
 
     def write_push_pop(self, command: str, segment: str, index: int) -> None:
         """Writes the assembly code that is the translation of the given
@@ -146,7 +266,7 @@ class CodeWriter:
             index (int): the index in the memory segment.
         """
         # first write a comment with the command type
-        asm_code = f"// {command} {segment} {index}\n"
+        asm_code = f"// {command} {segment} {index}\n" if self.comments else ""
         # call each writing function specific to a group of commands that uses similar code
         # push command
         if command == Parser.C_PUSH:
@@ -165,11 +285,12 @@ class CodeWriter:
             elif segment in ["temp", "pointer"]:
                 asm_code += write_pop_temp_pointer(segment, index)
         # write the final code into the output file
-        print(asm_code, file=self.output_stream)
+        self.write(asm_code)
 
     def writeBranching(self, command: str, label: str):
         # write a comment with command information.
-        print(f"// {command} {label}", file=self.output_stream)
+        if self.comments:
+            self.write(f"// {command} {label}")
         label = self.file_name + "." + label
         if command == Parser.C_LABEL:
             self.writeLabel(label)
@@ -179,50 +300,82 @@ class CodeWriter:
             self.writeGoto(label)
 
     def writeInit(self) -> None:
-        print(INIT_CMD, file=self.output_stream)
+        self.write(INIT_CMD)
         self.writeCall("Sys.init", 0)
+        if self.compact:
+            self.writeSharedRoutines()
+
+    def writeSharedRoutines(self) -> None:
+        # stop here if Sys.init returns, instead of running into the routines
+        asm_code = "// shared routines for compact mode\n"
+        asm_code += f"({HALT_LABEL})\n@{HALT_LABEL}\n0;JMP\n"
+        for command in SHARED_COMPARE:
+            asm_code += write_shared_compare(command)
+        asm_code += write_shared_call()
+        asm_code += f"({SHARED_RETURN})\n" + write_return()
+        self.write(asm_code)
 
     def writeLabel(self, label: str) -> None:
-        print(f"({label})\n", file=self.output_stream)
+        self.write(f"({label})\n")
 
     def writeGoto(self, label: str) -> None:
-        print(f"@{label}\n0;JMP\n", file=self.output_stream)
+        self.write(f"@{label}\n0;JMP\n")
 
     def writeIf(self, label: str) -> None:
-        print(f"@SP\nM=M-1\nA=M\nD=M\n@{label}\nD;JNE\n", file=self.output_stream)
+        self.write(f"@SP\nM=M-1\nA=M\nD=M\n@{label}\nD;JNE\n")
 
     def writeFunction(self, name: str, var: int) -> None:
-        print(f"// {name} function initialize {var} arguments", file=self.output_stream)
         endLabel = name + "$Start"
         initLabel = name + "$Args"
-        self.writeLabel(name)
-        print("// put num of arguemnts into @R13", file=self.output_stream)
-        print(f"@{var}\nD=A\n", file=self.output_stream)
-        print(f"@{endLabel}\nD;JEQ\n", file=self.output_stream)
-        self.writeLabel(initLabel)
-        print("@SP\nA=M\nM=0\n@SP\nM=M+1\n", file=self.output_stream)
-        print(f"D=D-1\n@{initLabel}\nD;JGT\n", file=self.output_stream)
-        self.writeLabel(endLabel)
+        if self.comments:
+            asm_code = f"// {name} function initialize {var} arguments\n"
+            asm_code += f"({name})\n\n"
+            asm_code += "// put num of arguemnts into @R13\n"
+            asm_code += f"@{var}\nD=A\n\n"
+            asm_code += f"@{endLabel}\nD;JEQ\n\n"
+            asm_code += f"({initLabel})\n\n"
+            asm_code += "@SP\nA=M\nM=0\n@SP\nM=M+1\n\n"
+            asm_code += f"D=D-1\n@{initLabel}\nD;JGT\n\n"
+        else:
+            asm_code = f"({name})\n@{var}\nD=A\n@{endLabel}\nD;JEQ\n"
+            asm_code += f"({initLabel})\n@SP\nA=M\nM=0\n@SP\nM=M+1\n"
+            asm_code += f"D=D-1\n@{initLabel}\nD;JGT\n"
+        asm_code += f"({endLabel})\n"
+        self.write(asm_code)
 
     def writeReturn(self) -> None:
-        asm_code = "// Return\n"
-        asm_code += "// put LCL (endframe) into @R14\n"
-        asm_code += "@LCL\nD=M\n@R14\nM=D\n"
-        asm_code += "// ret_address = *(endframe - 5) into @R15\n"
-        asm_code += "@5\nD=A\n@R14\nA=M-D\nD=M\n@R15\nM=D\n"
-        asm_code += "// SP = ARG + 1\n"
-        asm_code += "@SP\nM=M-1\nA=M\nD=M\n@ARG\nA=M\nM=D\n@ARG\nD=M+1\n@SP\nM=D\n"
-        asm_code += "// THAT,THIS,ARG,LCL = *(endframe - i)\n"
-        asm_code += "@R14\nAM=M-1\nD=M\n@THAT\nM=D\n"
-        asm_code += "@R14\nAM=M-1\nD=M\n@THIS\nM=D\n"
-        asm_code += "@R14\nAM=M-1\nD=M\n@ARG\nM=D\n"
-        asm_code += "@R14\nAM=M-1\nD=M\n@LCL\nM=D\n"
-        asm_code += "@R15\nA=M\n0;JMP\n"
-        print(asm_code, file=self.output_stream)
+        if self.compact:
+            self.write(f"// Return\n@{SHARED_RETURN}\n0;JMP\n")
+            return
+        if self.comments:
+            self.write("// Return\n" + RETURN_CMD)
+        else:
+            self.write(RETURN_CMD_NO_COMMENTS)
 
     def writeCall(self, name: str, num: int) -> None:
+        # the counter is kept per file, so its labels are scoped by the file
+        # name. files can be translated by separate CodeWriters that way.
         returnLabel = name + "$ret." + str(self.nextCallLabel)
+        if self.file_name:
+            returnLabel = name + "$ret." + self.file_name + "." + \
+                str(self.nextCallLabel)
         self.nextCallLabel += 1
+        if self.compact:
+            asm_code = f"// CALL {name} {num}\n"
+            asm_code += f"@{num}\nD=A\n@R13\nM=D\n@{name}\nD=A\n@R14\nM=D\n"
+            asm_code += f"@{returnLabel}\nD=A\n@{SHARED_CALL}\n0;JMP\n"
+            self.write(asm_code)
+            self.writeLabel(returnLabel)
+            return
+        self.writeInlineCall(name, num, returnLabel)
+
+    def writeInlineCall(self, name: str, num: int, returnLabel: str) -> None:
+        if not self.comments:
+            self.write(f"@{returnLabel}\nD=A\n{CALL_CMD_NO_COMMENTS}"
+                       f"@SP\nD=M\n@5\nD=D-A\n@{num}\nD=D-A\n@ARG\nM=D\n"
+                       f"@SP\nD=M\n@LCL\nM=D\n@{name}\n0;JMP\n"
+                       f"({returnLabel})\n")
+            return
         asm_code = f"// CALL {name} {num}\n"
         asm_code += "// return address to SP\n"
         asm_code += f"@{returnLabel}\nD=A\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
@@ -237,5 +390,5 @@ class CodeWriter:
         asm_code += "@SP\nD=M\n@LCL\nM=D\n"
         asm_code += f"// GOTO {name}\n"
         asm_code += f"@{name}\n0;JMP\n"
-        print(asm_code, file=self.output_stream)
+        self.write(asm_code)
         self.writeLabel(returnLabel)
@@ -4,11 +4,27 @@ https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
 and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
 Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import concurrent.futures
+import io
 import os
 import sys
+import time
 import typing
 from Parser import Parser
 from CodeWriter import CodeWriter
+from Optimizer import PeepholeOptimizer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the build cache is shared with the assembler in project06. the path is
+# appended, so our own modules come first where the names clash.
+sys.path.append(os.path.join(ROOT, "project06"))
+from BuildCache import BuildCache  # noqa: E402
+
+# the source map of the output file is written next to it, with this suffix
+MAP_EXTENSION = ".map"
+# a source map entry: (first output line, VM file name, VM line)
+MapEntry = typing.Tuple[int, str, int]
 
 
 def get_filename(filepath: str) -> str:
@@ -20,27 +36,225 @@ def get_filename(filepath: str) -> str:
         return filepath.split("\\")[-1]
 
 
-def translate_file(input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+def translate_file(input_file: typing.TextIO, output_file: typing.TextIO,
+                   file_name: str = "", bootstrap: bool = False,
+                   optimize: bool = False, compact: bool = False,
+                   comments: bool = True, source_map: bool = False
+                   ) -> typing.Optional[typing.List[MapEntry]]:
+    """Translates a single file.
+
+    Args:
+        input_file (typing.TextIO): the file to translate.
+        output_file (typing.TextIO): writes all output to this file.
+        file_name (str): name of the file, without extension, used for its
+            static variables and labels.
+        bootstrap (bool): write the bootstrap code before the file's code.
+        optimize (bool): pass the commands through the peephole optimizer.
+        compact (bool): jump to shared routines for comparisons, calls and
+            returns instead of inlining them. Every file of the program must
+            be translated in the same mode, and the routines are written with
+            the bootstrap code.
+        comments (bool): write a comment with every VM command.
+        source_map (bool): keep the VM line every part of the code came
+            from.
+
+    Returns:
+        typing.Optional[typing.List[MapEntry]]: the source map of the code,
+        with lines counted from its start, if source_map.
+    """
     parser = Parser(input_file)
-    codewriter = CodeWriter(output_file)
+    codewriter = CodeWriter(output_file, compact, comments, source_map)
     if bootstrap:
         codewriter.writeInit()
-    codewriter.set_file_name(get_filename(filename))
-    while parser.has_more_commands():
-        parser.advance()
-        cmd_type = parser.command_type()
+    codewriter.set_file_name(file_name)
+    if optimize:
+        optimizer = PeepholeOptimizer(codewriter)
+        for line, command in zip(parser.lines, parser):
+            codewriter.source_line = line
+            optimizer.write(*command)
+        optimizer.flush()
+        codewriter.flush()
+        return codewriter.source_map
+    for line, (cmd_type, arg1, arg2) in zip(parser.lines, parser):
+        codewriter.source_line = line
         if cmd_type in Parser.MEMORY_CMDS:
-            codewriter.write_push_pop(cmd_type, parser.arg1(), parser.arg2())
+            codewriter.write_push_pop(cmd_type, arg1, arg2)
         elif cmd_type == Parser.C_MATH:
-            codewriter.write_arithmetic(parser.arg1())
+            codewriter.write_arithmetic(arg1)
         elif cmd_type in Parser.BRANCHING_CMDS:
-            codewriter.writeBranching(cmd_type, parser.arg1())
+            codewriter.writeBranching(cmd_type, arg1)
         elif cmd_type == Parser.C_FUNCTION:
-            codewriter.writeFunction(parser.arg1(), parser.arg2())
+            codewriter.writeFunction(arg1, arg2)
         elif cmd_type == Parser.C_RETURN:
             codewriter.writeReturn()
         elif cmd_type == Parser.C_CALL:
-            codewriter.writeCall(parser.arg1(), parser.arg2())
+            codewriter.writeCall(arg1, arg2)
+    codewriter.flush()
+    return codewriter.source_map
+
+
+def format_source_map(source_map: typing.List[MapEntry]) -> str:
+    """
+    Args:
+        source_map (typing.List[MapEntry]): entries of a source map.
+
+    Returns:
+        str: the map in the side-car format, one "line file.vm line" entry
+        per line, where "- 0" is code without a VM source. An entry maps the
+        output lines from its own to the next entry.
+    """
+    return "".join(f"{line} {file_name + '.vm' if file_name else '-'} "
+                   f"{source_line}\n"
+                   for line, file_name, source_line in source_map)
+
+
+def parse_source_map(text: str) -> typing.List[MapEntry]:
+    """
+    Args:
+        text (str): a source map written by format_source_map().
+
+    Returns:
+        typing.List[MapEntry]: its entries.
+    """
+    source_map = []
+    for entry in text.splitlines():
+        line, file_name, source_line = entry.split()
+        file_name = "" if file_name == "-" else os.path.splitext(file_name)[0]
+        source_map.append((int(line), file_name, int(source_line)))
+    return source_map
+
+
+def join_source_maps(fragments: typing.List[str],
+                     source_maps: typing.List[typing.List[MapEntry]]
+                     ) -> typing.List[MapEntry]:
+    """
+    Args:
+        fragments (typing.List[str]): the code of every file, in order.
+        source_maps (typing.List[typing.List[MapEntry]]): the source map of
+            every file, with lines counted from the start of its code.
+
+    Returns:
+        typing.List[MapEntry]: the source map of the joined code.
+    """
+    joined = []
+    offset = 0
+    for fragment, source_map in zip(fragments, source_maps):
+        for line, file_name, source_line in source_map:
+            if not joined or joined[-1][1:] != (file_name, source_line):
+                joined.append((line + offset, file_name, source_line))
+        offset += fragment.count("\n")
+    return joined
+
+
+def translate_path(input_path: str, bootstrap: bool = False,
+                   optimize: bool = False, compact: bool = False,
+                   comments: bool = True,
+                   cache: typing.Optional[BuildCache] = None,
+                   source_map: bool = False
+                   ) -> typing.Tuple[str, float, bool,
+                                     typing.Optional[typing.List[MapEntry]]]:
+    """Translates a single file on its own, so the result only depends on
+    the file and the options. This runs in worker processes in parallel mode.
+
+    Args:
+        input_path (str): path of the .vm file.
+        bootstrap (bool): write the bootstrap code before the file's code.
+        optimize (bool): pass the commands through the peephole optimizer.
+        compact (bool): jump to shared routines for comparisons, calls and
+            returns instead of inlining them.
+        comments (bool): write a comment with every VM command.
+        cache (typing.Optional[BuildCache]): the build cache, if any.
+        source_map (bool): keep the VM line every part of the code came
+            from.
+
+    Returns:
+        typing.Tuple[str, float, bool,
+        typing.Optional[typing.List[MapEntry]]]: the assembly code, the
+        time it took in seconds, whether it came from the cache, and its
+        source map if source_map.
+    """
+    start = time.perf_counter()
+    file_name = get_filename(os.path.splitext(input_path)[0])
+    key = map_key = None
+    if cache is not None:
+        key = cache.key(BuildCache.hash_file(input_path), file_name,
+                        str(bootstrap), str(optimize), str(compact),
+                        str(comments))
+        map_key = cache.key(key, MAP_EXTENSION)
+        asm_code = cache.get(key)
+        map_text = cache.get(map_key) if source_map and asm_code else b""
+        if asm_code is not None and map_text is not None:
+            return asm_code.decode(), time.perf_counter() - start, True, \
+                parse_source_map(map_text.decode()) if source_map else None
+    fragment = io.StringIO()
+    with open(input_path, 'r') as input_file:
+        fragment_map = translate_file(input_file, fragment, file_name,
+                                      bootstrap, optimize, compact, comments,
+                                      source_map)
+    asm_code = fragment.getvalue()
+    if cache is not None:
+        cache.put(key, asm_code.encode())
+        if source_map:
+            cache.put(map_key, format_source_map(fragment_map).encode())
+    return asm_code, time.perf_counter() - start, False, fragment_map
+
+
+def translate_parallel(input_paths: typing.List[str], jobs: int,
+                       optimize: bool = False, compact: bool = False,
+                       comments: bool = True,
+                       cache: typing.Optional[BuildCache] = None,
+                       source_map: bool = False
+                       ) -> typing.Optional[typing.Tuple[
+                           typing.List[str],
+                           typing.List[typing.List[MapEntry]]]]:
+    """Translates the given files in a pool of worker processes, printing
+    each file and its timing as it finishes. The first file gets the
+    bootstrap code, like in a serial translation.
+
+    Args:
+        input_paths (typing.List[str]): paths of the files to translate.
+        jobs (int): number of worker processes.
+        optimize (bool): pass the commands through the peephole optimizer.
+        compact (bool): use the compact code generation mode.
+        comments (bool): write a comment with every VM command.
+        cache (typing.Optional[BuildCache]): the build cache, if any. A hit
+            or a miss is recorded in it for every file the workers
+            translate.
+        source_map (bool): keep the source map of every file.
+
+    Returns:
+        typing.Optional[typing.Tuple[typing.List[str],
+        typing.List[typing.List[MapEntry]]]]: the assembly code and the
+        source map of every file, in the order of input_paths, or None if
+        any file failed.
+    """
+    fragments = [None] * len(input_paths)
+    source_maps = [None] * len(input_paths)
+    failed = False
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(translate_path, input_path, index == 0,
+                               optimize, compact, comments, cache,
+                               source_map): index
+                   for index, input_path in enumerate(input_paths)}
+        for done, future in enumerate(
+                concurrent.futures.as_completed(futures), 1):
+            index = futures[future]
+            name = os.path.basename(input_paths[index])
+            try:
+                fragments[index], seconds, cached, source_maps[index] = \
+                    future.result()
+                if cache is not None:
+                    cache.record(cached)
+                print(f"[{done}/{len(futures)}] {name} {seconds:.3f}s"
+                      f"{' (cached)' if cached else ''}", flush=True)
+            except Exception as error:
+                failed = True
+                print(f"[{done}/{len(futures)}] {name} failed: {error}",
+                      file=sys.stderr, flush=True)
+    print(f"translated {len(input_paths)} files in "
+          f"{time.perf_counter() - start:.3f}s with {jobs} jobs")
+    return None if failed else (fragments, source_maps)
 
 
 if "__main__" == __name__:
@@ -49,9 +263,35 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: VMtranslator <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    arg_parser = argparse.ArgumentParser(prog="VMtranslator")
+    arg_parser.add_argument("input_path")
+    arg_parser.add_argument(
+        "--cache", nargs="?", const="", metavar="DIR",
+        help="skip unchanged files using a build cache, by default in "
+             "$N2T_CACHE_DIR or ~/.cache/nand2tetris")
+    arg_parser.add_argument(
+        "--optimize", action="store_true",
+        help="fuse common command sequences into shorter assembly")
+    arg_parser.add_argument(
+        "--compact", action="store_true",
+        help="share a single copy of the comparison, call and return code, "
+             "for a smaller but slower program")
+    arg_parser.add_argument(
+        "--no-comments", dest="comments", action="store_false",
+        help="don't write a comment with every VM command")
+    arg_parser.add_argument(
+        "--jobs", type=int,
+        help="translate the files in N worker processes, reporting per-file "
+             "timings")
+    arg_parser.add_argument(
+        "--source-map", action="store_true",
+        help="also write the VM file and line of every part of the output to "
+             "a .map file next to it")
+    args = arg_parser.parse_args()
+    cache = None if args.cache is None else BuildCache(
+        "VMtranslator", args.cache or None,
+        source_dir=os.path.dirname(os.path.abspath(__file__)))
+    argument_path = os.path.abspath(args.input_path)
     if os.path.isdir(argument_path):
         files_to_translate = [
             os.path.join(argument_path, filename)
@@ -62,12 +302,44 @@ if "__main__" == __name__:
         files_to_translate = [argument_path]
         output_path, extension = os.path.splitext(argument_path)
     output_path += ".asm"
-    bootstrap = True
-    with open(output_path, 'w') as output_file:
-        for input_path in files_to_translate:
-            filename, extension = os.path.splitext(input_path)
-            if extension.lower() != ".vm":
-                continue
-            with open(input_path, 'r') as input_file:
-                translate_file(input_file, output_file)
-            bootstrap = False
+    # a stable order makes the output the same on every run and every machine
+    files_to_translate = sorted(
+        input_path for input_path in files_to_translate
+        if os.path.splitext(input_path)[1].lower() == ".vm")
+    if args.jobs:
+        result = translate_parallel(files_to_translate, args.jobs,
+                                    args.optimize, args.compact,
+                                    args.comments, cache, args.source_map)
+        if result is None:
+            sys.exit(1)
+        fragments, source_maps = result
+        with open(output_path, 'w') as output_file:
+            output_file.writelines(fragments)
+    else:
+        fragments, source_maps = [], []
+        with open(output_path, 'w') as output_file:
+            for index, input_path in enumerate(files_to_translate):
+                if cache is None and not args.source_map:
+                    with open(input_path, 'r') as input_file:
+                        translate_file(
+                            input_file, output_file,
+                            get_filename(os.path.splitext(input_path)[0]),
+                            index == 0, args.optimize, args.compact,
+                            args.comments)
+                else:
+                    asm_code, _, cached, source_map = translate_path(
+                        input_path, index == 0, args.optimize, args.compact,
+                        args.comments, cache, args.source_map)
+                    if cache is not None:
+                        cache.record(cached)
+                    output_file.write(asm_code)
+                    if args.source_map:
+                        fragments.append(asm_code)
+                        source_maps.append(source_map)
+    if args.source_map:
+        with open(output_path + MAP_EXTENSION, 'w') as map_file:
+            map_file.write(format_source_map(
+                join_source_maps(fragments, source_maps)))
+    if cache is not None:
+        cache.prune()
+        print(cache.summary())
@@ -0,0 +1,185 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from VMInterpreter import VMInterpreter, WORD_MASK, SIGN_BIT, TEMP_BASE
+
+# the screen memory map
+SCREEN_BASE = 16384
+SCREEN_WIDTH = 512
+SCREEN_HEIGHT = 256
+
+# Python implementations of the hottest functions of the project12 OS, for
+# VMInterpreter. Each one has the same effect on the RAM as the VM code the
+# project11 compiler makes of the OS, outside the stack: the temp segment
+# and the shifts included. An implementation returns None for arguments it
+# doesn't handle, like a division by zero, and the VM code runs instead.
+# The OS is assumed to be initialized by Sys.init.
+
+
+def signed(word: int) -> int:
+    """
+    Args:
+        word (int): a 16-bit word.
+
+    Returns:
+        int: the word as a two's complement number.
+    """
+    return word - (1 << 16) if word & SIGN_BIT else word
+
+
+def math_multiply(interpreter: VMInterpreter,
+                  args: typing.List[int]) -> typing.Optional[int]:
+    x, y = args
+    return x * y
+
+
+def math_divide(interpreter: VMInterpreter,
+                args: typing.List[int]) -> typing.Optional[int]:
+    x, y = signed(args[0]), signed(args[1])
+    if y == 0 or x == -SIGN_BIT or y == -SIGN_BIT:
+        return None
+    # Math.divide divides by 2 * y recursively while y <= x, and 2 * y
+    # overflows from 16384 up
+    divisor = abs(y)
+    while divisor <= abs(x):
+        if divisor >= SIGN_BIT // 2:
+            return None
+        divisor += divisor
+    quotient = abs(x) // abs(y)
+    return quotient if (x < 0) == (y < 0) else -quotient
+
+
+def math_sqrt(interpreter: VMInterpreter,
+              args: typing.List[int]) -> typing.Optional[int]:
+    x = signed(args[0])
+    result = 0
+    for j in range(7, -1, -1):
+        approx = result + (1 << j)
+        square = signed(approx * approx & WORD_MASK)
+        if not square > x and square > 0:
+            result = approx
+    return result
+
+
+def memory_alloc(interpreter: VMInterpreter,
+                 args: typing.List[int]) -> typing.Optional[int]:
+    ram = interpreter.ram
+    size = args[0]
+    # the static variables freeList and heap of Memory
+    free_list = interpreter.statics.get("Memory.1")
+    heap_pointer = interpreter.statics.get("Memory.2")
+    if free_list is None or heap_pointer is None:
+        return None
+    heap = ram[free_list]
+    current_size = ram[heap + 1]
+    while heap and signed(current_size) < signed((size + 2) & WORD_MASK):
+        heap = ram[heap]
+        current_size = ram[heap + 1]
+    if not heap:
+        # the VM code calls Sys.error
+        return None
+    ram[heap + 1] = (current_size - size - 2) & WORD_MASK
+    block = (heap + current_size + 2 - size) & WORD_MASK
+    heap = (block - 2) & WORD_MASK
+    ram[heap] = 0
+    ram[heap + 1] = size
+    ram[heap_pointer] = heap
+    # the last array assignment leaves its value in temp 0
+    ram[TEMP_BASE] = size
+    return block
+
+
+def string_append_char(interpreter: VMInterpreter,
+                       args: typing.List[int]) -> typing.Optional[int]:
+    ram = interpreter.ram
+    this, c = args
+    # the fields arr, lenOfStr and arrLength of the string
+    length = ram[this + 1]
+    if signed(length) < signed(ram[this + 2]):
+        ram[(ram[this] + length) & WORD_MASK] = c
+        ram[this + 1] = (length + 1) & WORD_MASK
+        ram[TEMP_BASE] = c
+    return this
+
+
+def draw_pixel(ram: typing.List[int], x: int, y: int, color: int) -> None:
+    """Screen.drawPixel as the VM code runs it, where the Jack operator ^
+    shifts right and # shifts left.
+
+    Args:
+        ram (typing.List[int]): the RAM.
+        x (int): the column.
+        y (int): the row.
+        color (int): the color static variable of Screen.
+    """
+    pixel = x & 15
+    bitmask = 1
+    if pixel > 0:
+        bitmask = 2 >> (pixel - 1)
+    address = SCREEN_BASE + ((x << 4) & WORD_MASK) + (y >> 5)
+    if color:
+        ram[address] |= bitmask
+    else:
+        ram[address] &= ~bitmask & WORD_MASK
+
+
+def screen_draw_line(interpreter: VMInterpreter,
+                     args: typing.List[int]) -> typing.Optional[int]:
+    ram = interpreter.ram
+    color = interpreter.statics.get("Screen.0")
+    if color is None:
+        return None
+    x1, y1, x2, y2 = args
+    if max(x1, x2) >= SCREEN_WIDTH or max(y1, y2) >= SCREEN_HEIGHT:
+        return None
+    color = ram[color]
+    if x1 > x2:
+        x1, y1, x2, y2 = x2, y2, x1, y1
+    if x1 == x2 and y1 > y2:
+        y1, y2 = y2, y1
+    if x1 == x2:
+        for y in range(y1, y2 + 1):
+            draw_pixel(ram, x1, y, color)
+    elif y1 == y2:
+        for x in range(x1, x2 + 1):
+            draw_pixel(ram, x, y1, color)
+    else:
+        dx, dy = x2 - x1, y2 - y1
+        a = b = diff = 0
+        draw_pixel(ram, x1, y1, color)
+        if dy > 0:
+            while a < dx and b < dy:
+                if diff < 0:
+                    a += 1
+                    diff += dy
+                else:
+                    b += 1
+                    diff -= dx
+                draw_pixel(ram, x1 + a, y1 + b, color)
+        else:
+            while a < dx and b > dy:
+                if diff > 0:
+                    a += 1
+                    diff += dy
+                else:
+                    b -= 1
+                    diff += dx
+                draw_pixel(ram, x1 + a, y1 + b, color)
+    # the return values of the calls are popped into temp 0
+    ram[TEMP_BASE] = 0
+    return 0
+
+
+# the native implementations by VM function name, for VMInterpreter
+NATIVES = {
+    "Math.multiply": math_multiply,
+    "Math.divide": math_divide,
+    "Math.sqrt": math_sqrt,
+    "Memory.alloc": memory_alloc,
+    "String.appendChar": string_append_char,
+    "Screen.drawLine": screen_draw_line,
+}
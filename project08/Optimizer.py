@@ -0,0 +1,225 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from Parser import Parser
+from CodeWriter import CodeWriter
+
+# segments addressed through a base pointer, and the pointer's symbol
+POINTER_SEGMENTS = {"local": "LCL", "argument": "ARG", "this": "THIS",
+                    "that": "THAT"}
+# binary commands applied in place on the top of the stack, with y in D
+BINARY_COMP = {"add": "D+M", "sub": "M-D", "and": "D&M", "or": "D|M"}
+# unary commands applied to a value in D
+UNARY_COMP = {"neg": "-D", "not": "!D", "shiftleft": "D<<",
+              "shiftright": "D>>"}
+# push D onto the stack, and pop the top of the stack into D
+PUSH_D = "@SP\nM=M+1\nA=M-1\nM=D\n"
+POP_D = "@SP\nAM=M-1\nD=M\n"
+
+
+def direct_address(segment: str, index: int, file_name: str) -> str:
+    """
+    Returns:
+        str: the symbol or address of a static, temp or pointer variable,
+        or "" if the segment is not one of them.
+    """
+    if segment == "static":
+        return f"{file_name}.{index}"
+    elif segment == "temp":
+        return str(5 + index)
+    elif segment == "pointer":
+        return str(3 + index)
+    return ""
+
+
+def load_d(segment: str, index: int, file_name: str) -> str:
+    """
+    Returns:
+        str: assembly code that puts the value of "push segment index" in D,
+        without touching the stack.
+    """
+    if segment == "constant":
+        if index in (0, 1):
+            return f"D={index}\n"
+        return f"@{index}\nD=A\n"
+    address = direct_address(segment, index, file_name)
+    if address:
+        return f"@{address}\nD=M\n"
+    base = POINTER_SEGMENTS[segment]
+    if index == 0:
+        return f"@{base}\nA=M\nD=M\n"
+    elif index == 1:
+        return f"@{base}\nA=M+1\nD=M\n"
+    return f"@{index}\nD=A\n@{base}\nA=D+M\nD=M\n"
+
+
+def store_d(segment: str, index: int,
+            file_name: str) -> typing.Tuple[str, str]:
+    """
+    Returns:
+        typing.Tuple[str, str]: assembly code that prepares the target of
+        "pop segment index", which must run before the value is put in D,
+        and assembly code that then stores D in the target.
+    """
+    address = direct_address(segment, index, file_name)
+    if address:
+        return "", f"@{address}\nM=D\n"
+    base = POINTER_SEGMENTS[segment]
+    if index == 0:
+        return "", f"@{base}\nA=M\nM=D\n"
+    elif index == 1:
+        return "", f"@{base}\nA=M+1\nM=D\n"
+    # the target address is computed first and kept in R13
+    return f"@{index}\nD=A\n@{base}\nD=D+M\n@R13\nM=D\n", "@R13\nA=M\nM=D\n"
+
+
+class PeepholeOptimizer:
+    """
+    Sits between the parser and a CodeWriter. Buffers a small window of VM
+    commands and translates common sequences into shorter Hack code, keeping
+    values in D instead of pushing them to the stack and popping them back.
+    Commands that don't start or finish such a sequence are handed to the
+    CodeWriter unchanged, except for push and pop which use shorter forms.
+    """
+
+    def __init__(self, codewriter: CodeWriter) -> None:
+        """
+        Args:
+            codewriter (CodeWriter): writes the commands that aren't fused.
+        """
+        self.codewriter = codewriter
+        # the buffered command, that may start a fused sequence, or None,
+        # and its VM line for the source map
+        self.pending = None
+        self.pending_line = 0
+
+    def write(self, cmd_type: str, arg1: typing.Optional[str] = None,
+              arg2: typing.Optional[int] = None) -> None:
+        """Translates a VM command, possibly fusing it with the commands
+        around it.
+
+        Args:
+            cmd_type (str): the Parser command type.
+            arg1 (str): the first argument, as returned by Parser.arg1().
+            arg2 (int): the second argument, as returned by Parser.arg2().
+        """
+        command = (cmd_type, arg1, arg2)
+        line = self.codewriter.source_line
+        if self.pending is not None:
+            # fused code is mapped to the line of the buffered command
+            self.codewriter.source_line = self.pending_line
+            asm_code = self.fuse(self.pending, command)
+            self.pending = None
+            if asm_code:
+                self.emit(asm_code)
+                self.codewriter.source_line = line
+                return
+            self.codewriter.source_line = line
+        if cmd_type == Parser.C_PUSH or \
+                (cmd_type == Parser.C_MATH and arg1 in ("not", "eq")):
+            self.pending = command
+            self.pending_line = line
+        else:
+            self.write_single(command)
+
+    def flush(self) -> None:
+        """Writes the buffered command, if any. Must be called at the end of
+        every file.
+        """
+        if self.pending is not None:
+            self.codewriter.source_line = self.pending_line
+            self.write_single(self.pending)
+            self.pending = None
+
+    def fuse(self, first: tuple, second: tuple) -> str:
+        """
+        Args:
+            first (tuple): the buffered command.
+            second (tuple): the command following it.
+
+        Returns:
+            str: the fused translation of the two commands, or "" if they
+            can't be fused, in which case the buffered command is written.
+        """
+        file_name = self.codewriter.file_name
+        first_type, first_arg1, first_arg2 = first
+        second_type, second_arg1, second_arg2 = second
+        comment = f"// {self.describe(first)}; {self.describe(second)}\n" \
+            if self.codewriter.comments else ""
+        if first_type == Parser.C_PUSH:
+            if second_type == Parser.C_POP:
+                prepare, store = store_d(second_arg1, second_arg2, file_name)
+                return comment + prepare + \
+                    load_d(first_arg1, first_arg2, file_name) + store
+            if second_type == Parser.C_MATH and second_arg1 in BINARY_COMP:
+                if first_arg1 == "constant" and first_arg2 == 1 and \
+                        second_arg1 in ("add", "sub"):
+                    op = "+" if second_arg1 == "add" else "-"
+                    return comment + f"@SP\nA=M-1\nM=M{op}1\n"
+                return comment + load_d(first_arg1, first_arg2, file_name) + \
+                    f"@SP\nA=M-1\nM={BINARY_COMP[second_arg1]}\n"
+            if second_type == Parser.C_MATH and second_arg1 in UNARY_COMP:
+                if first_arg1 == "constant" and first_arg2 == 0 and \
+                        second_arg1 in ("neg", "not"):
+                    # "true" is compiled to push constant 0; not
+                    value = "0" if second_arg1 == "neg" else "-1"
+                    return comment + f"@SP\nM=M+1\nA=M-1\nM={value}\n"
+                return comment + load_d(first_arg1, first_arg2, file_name) + \
+                    f"@SP\nM=M+1\nA=M-1\nM={UNARY_COMP[second_arg1]}\n"
+            if second_type == Parser.C_IFGOTO:
+                return comment + load_d(first_arg1, first_arg2, file_name) + \
+                    f"@{file_name}.{second_arg1}\nD;JNE\n"
+        elif second_type == Parser.C_IFGOTO:
+            label = f"{file_name}.{second_arg1}"
+            if first_arg1 == "not":
+                return comment + POP_D + f"D=!D\n@{label}\nD;JNE\n"
+            if first_arg1 == "eq":
+                return comment + POP_D + "@SP\nAM=M-1\nD=M-D\n" + \
+                    f"@{label}\nD;JEQ\n"
+        self.write_single(first)
+        return ""
+
+    def write_single(self, command: tuple) -> None:
+        """Writes a command which is not part of a fused sequence."""
+        cmd_type, arg1, arg2 = command
+        file_name = self.codewriter.file_name
+        comment = f"// {self.describe(command)}\n" \
+            if self.codewriter.comments else ""
+        if cmd_type == Parser.C_PUSH:
+            self.emit(comment + load_d(arg1, arg2, file_name) + PUSH_D)
+        elif cmd_type == Parser.C_POP:
+            prepare, store = store_d(arg1, arg2, file_name)
+            self.emit(comment + prepare + POP_D + store)
+        elif cmd_type == Parser.C_MATH:
+            self.codewriter.write_arithmetic(arg1)
+        elif cmd_type in Parser.BRANCHING_CMDS:
+            self.codewriter.writeBranching(cmd_type, arg1)
+        elif cmd_type == Parser.C_FUNCTION:
+            self.codewriter.writeFunction(arg1, arg2)
+        elif cmd_type == Parser.C_RETURN:
+            self.codewriter.writeReturn()
+        elif cmd_type == Parser.C_CALL:
+            self.codewriter.writeCall(arg1, arg2)
+
+    def emit(self, asm_code: str) -> None:
+        self.codewriter.write(asm_code)
+
+    @staticmethod
+    def describe(command: tuple) -> str:
+        """
+        Returns:
+            str: the VM source of a command, for comments.
+        """
+        cmd_type, arg1, arg2 = command
+        if cmd_type == Parser.C_MATH:
+            return arg1
+        if cmd_type == Parser.C_RETURN:
+            return "return"
+        words = [cmd_type[2:].lower(), arg1]
+        if arg2 is not None:
+            words.append(str(arg2))
+        return " ".join(words)
@@ -7,12 +7,25 @@ Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
 import typing
 
 
+class VMCommand(typing.NamedTuple):
+    """A parsed VM command."""
+    # one of the Parser command types, i.e Parser.C_PUSH
+    cmd_type: str
+    # the first argument, or the command itself for arithmetic commands
+    arg1: typing.Optional[str] = None
+    # the second argument of push, pop, function and call
+    arg2: typing.Optional[int] = None
+
+
 class Parser:
     """
     Handles the parsing of a single .vm file, and encapsulates access to the
     input code. It reads VM commands, parses them, and provides convenient
     access to their components.
     In addition, it removes all white space and comments.
+
+    Every line is parsed once into a VMCommand. The commands can be iterated
+    over directly, or read one by one with advance() and the accessors.
     """
     # C command types
     C_MATH = "C_ARITHMETIC"
@@ -28,6 +41,14 @@ class Parser:
     MEMORY_CMDS = [C_PUSH, C_POP]
     BRANCHING_CMDS = [C_LABEL, C_GOTO, C_IFGOTO]
     FUNC_CMDS = [C_FUNCTION, C_CALL]
+    # the type of every command keyword, any other keyword is arithmetic.
+    COMMAND_TYPES = {"push": C_PUSH, "pop": C_POP, "label": C_LABEL,
+                     "goto": C_GOTO, "if-goto": C_IFGOTO,
+                     "function": C_FUNCTION, "return": C_RETURN,
+                     "call": C_CALL}
+    # number of words in each type of command.
+    COMMAND_LENGTHS = {C_MATH: 1, C_PUSH: 3, C_POP: 3, C_LABEL: 2, C_GOTO: 2,
+                       C_IFGOTO: 2, C_FUNCTION: 3, C_RETURN: 1, C_CALL: 3}
     # delete comments that starts with this prefix.
     COMMENT_PREFIX = "//"
 
@@ -37,14 +58,46 @@ class Parser:
         Args:
             input_file (typing.TextIO): input file.
         """
-        self.input_lines = input_file.read().splitlines()
-        self.curr_cmd = -1  # -1 means uninitialized.
-        self.currLine = []
-        # delete every comment in the text
-        for i in range(len(self.input_lines)):
-            comment_index = self.input_lines[i].find(Parser.COMMENT_PREFIX)
+        self.commands = []
+        # the line number of every command in the file, for source maps
+        self.lines = []
+        for number, line in enumerate(input_file, 1):
+            comment_index = line.find(Parser.COMMENT_PREFIX)
             if comment_index != -1:
-                self.input_lines[i] = self.input_lines[i][:comment_index]
+                line = line[:comment_index]
+            words = line.split()
+            if words:
+                self.commands.append(self.parse_words(words))
+                self.lines.append(number)
+        self.curr_cmd = -1  # -1 means uninitialized.
+        self.current = None
+
+    @staticmethod
+    def parse_words(words: typing.List[str]) -> VMCommand:
+        """
+        Args:
+            words (typing.List[str]): the words of a single command.
+
+        Returns:
+            VMCommand: the parsed command.
+        """
+        cmd_type = Parser.COMMAND_TYPES.get(words[0], Parser.C_MATH)
+        if len(words) != Parser.COMMAND_LENGTHS[cmd_type]:
+            raise ValueError(f"Invalid VM command: {' '.join(words)}")
+        if cmd_type == Parser.C_MATH:
+            return VMCommand(cmd_type, words[0])
+        elif cmd_type == Parser.C_RETURN:
+            return VMCommand(cmd_type)
+        elif len(words) == 2:
+            return VMCommand(cmd_type, words[1])
+        return VMCommand(cmd_type, words[1], int(words[2]))
+
+    def __iter__(self) -> typing.Iterator[VMCommand]:
+        """
+        Returns:
+            typing.Iterator[VMCommand]: the commands of the file, in order.
+        """
+        return iter(self.commands)
 
     def has_more_commands(self) -> bool:
         """Are there more commands in the input?
@@ -52,18 +105,15 @@ class Parser:
         Returns:
             bool: True if there are more commands, False otherwise.
         """
-        return self.curr_cmd < len(self.input_lines) - 1
+        return self.curr_cmd < len(self.commands) - 1
 
     def advance(self) -> None:
         """Reads the next command from the input and makes it the current
         command. Should be called only if has_more_commands() is true. Initially
         there is no current command.
         """
-        if self.has_more_commands():
-            self.curr_cmd += 1
-        self.currLine = self.input_lines[self.curr_cmd].split()
-        if len(self.currLine) == 0:
-            self.advance()
+        self.curr_cmd += 1
+        self.current = self.commands[self.curr_cmd]
 
     def command_type(self) -> str:
         """
@@ -74,25 +124,7 @@ class Parser:
             "C_PUSH", "C_POP", "C_LABEL", "C_GOTO", "C_IFGOTO", "C_FUNCTION",
             "C_RETURN", "C_CALL".
         """
-        # go over each possibility.
-        if self.C_POP[2:].lower() == self.currLine[0]:
-            return self.C_POP
-        elif self.C_PUSH[2:].lower() == self.currLine[0]:
-            return self.C_PUSH
-        elif self.C_LABEL[2:].lower() == self.currLine[0]:
-            return self.C_LABEL
-        elif self.C_IFGOTO[2:].lower() == self.currLine[0]:
-            return self.C_IFGOTO
-        elif self.C_GOTO[2:].lower() == self.currLine[0]:
-            return self.C_GOTO
-        elif self.C_FUNCTION[2:].lower() == self.currLine[0]:
-            return self.C_FUNCTION
-        elif self.C_CALL[2:].lower() == self.currLine[0]:
-            return self.C_CALL
-        elif self.C_RETURN[2:].lower() == self.currLine[0]:
-            return self.C_RETURN
-        else:
-            return self.C_MATH
+        return self.current.cmd_type
 
     def arg1(self) -> str:
         """
@@ -101,13 +133,7 @@ class Parser:
             "C_ARITHMETIC", the command itself (add, sub, etc.) is returned.
             Should not be called if the current command is "C_RETURN".
         """
-        if self.command_type() != self.C_RETURN:
-            # base case, arithmetic command, return the only parameter in line
-            if self.command_type() == self.C_MATH:
-                return self.currLine[0]
-            # case 2, return the second parameter in line
-            else:
-                return self.currLine[1]
+        return self.current.arg1
 
     def arg2(self) -> int:
         """
@@ -116,5 +142,4 @@ class Parser:
             called only if the current command is "C_PUSH", "C_POP",
             "C_FUNCTION" or "C_CALL".
         """
-        if self.command_type() in self.MEMORY_CMDS or self.command_type() in self.FUNC_CMDS:
-            return int(self.currLine[2])
+        return self.current.arg2
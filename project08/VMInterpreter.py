@@ -0,0 +1,574 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+import typing
+from Parser import Parser, VMCommand
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the RAM arguments are parsed like the CPU emulator's, its modules don't
+# clash with ours.
+sys.path.append(os.path.join(ROOT, "emulator"))
+from HackEmulator import parse_assignment, parse_range  # noqa: E402
+
+# number of words in the data memory
+RAM_SIZE = 1 << 15
+WORD_MASK = 0xFFFF
+SIGN_BIT = 0x8000
+TRUE = 0xFFFF
+# addresses of the pointers, the temp segment and the static variables,
+# the same as in the Hack translation
+SP, LCL, ARG, THIS, THAT = range(5)
+TEMP_BASE = 5
+POINTER_BASE = 3
+STATIC_BASE = 16
+STACK_BASE = 256
+# the stack ends where the heap of the OS begins
+HEAP_BASE = 2048
+# number of words a call pushes: return address, LCL, ARG, THIS, THAT
+FRAME_SIZE = 5
+
+# the operations the interpreter runs. every VM command but label becomes
+# one operation, with the segment of push and pop folded into it.
+(PUSH_CONSTANT, PUSH_LOCAL, PUSH_ARGUMENT, PUSH_THIS, PUSH_THAT, PUSH_RAM,
+ POP_LOCAL, POP_ARGUMENT, POP_THIS, POP_THAT, POP_RAM, ADD, SUB, NEG, NOT,
+ AND, OR, EQ, GT, LT, SHIFT_LEFT, SHIFT_RIGHT, GOTO, IF_GOTO, FUNCTION, CALL,
+ NATIVE, RETURN, HALT) = range(29)
+# the operations of push and pop by segment. static, temp and pointer are
+# fixed RAM addresses once the program is loaded.
+PUSH_OPS = {"constant": PUSH_CONSTANT, "local": PUSH_LOCAL,
+            "argument": PUSH_ARGUMENT, "this": PUSH_THIS, "that": PUSH_THAT,
+            "static": PUSH_RAM, "temp": PUSH_RAM, "pointer": PUSH_RAM}
+POP_OPS = {"local": POP_LOCAL, "argument": POP_ARGUMENT, "this": POP_THIS,
+           "that": POP_THAT, "static": POP_RAM, "temp": POP_RAM,
+           "pointer": POP_RAM}
+ARITHMETIC_OPS = {"add": ADD, "sub": SUB, "neg": NEG, "not": NOT, "and": AND,
+                  "or": OR, "eq": EQ, "gt": GT, "lt": LT,
+                  "shiftleft": SHIFT_LEFT, "shiftright": SHIFT_RIGHT}
+
+# a Python implementation of a VM function. it gets the interpreter, whose
+# RAM and pointers are up to date, and the arguments of the call. it returns
+# the return value, or None if it doesn't handle these arguments, and then
+# the VM code of the function runs instead.
+Native = typing.Callable[["VMInterpreter", typing.List[int]],
+                         typing.Optional[int]]
+
+
+def undefined(name: str) -> Native:
+    """
+    Args:
+        name (str): name of a function that isn't defined.
+
+    Returns:
+        Native: a native function that fails with a ValueError.
+    """
+    def call(interpreter: "VMInterpreter", args: typing.List[int]) -> int:
+        raise ValueError(f"Call to an unknown function: {name}")
+    return call
+
+
+def verified(name: str, native: Native) -> Native:
+    """
+    Args:
+        name (str): name of a VM function.
+        native (Native): its native implementation.
+
+    Returns:
+        Native: a native function that runs both the native implementation
+        and the VM code, and compares them with
+        VMInterpreter.verify_native().
+    """
+    def call(interpreter: "VMInterpreter", args: typing.List[int]) -> int:
+        return interpreter.verify_native(name, native, args)
+    return call
+
+
+def load_path(input_path: str) -> typing.Dict[str, Parser]:
+    """Parses a .vm file, or every .vm file in a directory, in the same
+    order as the translator.
+
+    Args:
+        input_path (str): a .vm file or a directory.
+
+    Returns:
+        typing.Dict[str, Parser]: file name without extension -> its parser.
+    """
+    if os.path.isdir(input_path):
+        paths = sorted(os.path.join(input_path, filename)
+                       for filename in os.listdir(input_path)
+                       if os.path.splitext(filename)[1].lower() == ".vm")
+    else:
+        paths = [input_path]
+    files = {}
+    for path in paths:
+        with open(path, 'r') as input_file:
+            files[os.path.splitext(os.path.basename(path))[0]] = \
+                Parser(input_file)
+    return files
+
+
+class VMInterpreter:
+    """Runs VM code directly, without translating it to Hack.
+
+    When the program is loaded, every command is turned into an operation
+    and an integer argument: labels and functions become indices into the
+    list of operations, and static variables become RAM addresses, given
+    in order of first appearance like the assembler does. The RAM is laid
+    out like in the Hack translation, so a program sees the same memory,
+    only the return addresses saved in the frames differ.
+
+    Calls to functions that have a native Python implementation run it
+    instead of the VM code, if there is any. In verify mode both run, and
+    every difference in the return value or in the RAM outside the stack
+    is listed in mismatches.
+
+    The stack pointer is kept in a local variable while running, and
+    RAM[0] is updated when run() returns or a native function is called.
+    """
+
+    def __init__(self, files: typing.Dict[str, typing.Iterable[VMCommand]],
+                 natives: typing.Optional[typing.Dict[str, Native]] = None,
+                 bootstrap: bool = True, verify: bool = False) -> None:
+        """Loads a program and resets the machine.
+
+        Args:
+            files (typing.Dict[str, typing.Iterable[VMCommand]]): file name
+                without extension -> its commands, in the order of the
+                translation.
+            natives (typing.Optional[typing.Dict[str, Native]]): native
+                implementations of VM functions, by function name.
+            bootstrap (bool): start by calling Sys.init with SP = 256, like
+                the bootstrap code of the translator. Otherwise the program
+                starts at its first command, and the RAM is set by the
+                caller.
+            verify (bool): check every call of a native function against
+                the VM code of the function.
+        """
+        self.natives = dict(natives or {})
+        # descriptions of the calls where a native function and the VM code
+        # didn't agree, in verify mode
+        self.mismatches = []
+        # the operations, and the VM function each one belongs to
+        self.code = []
+        self.functions = []
+        # function name -> index of its first operation
+        self.entries = {}
+        # static variable name -> RAM address
+        self.statics = {}
+        # unresolved arguments of goto, if-goto and call: (index, target)
+        labels = {}
+        fixups = []
+        if bootstrap:
+            fixups.append((len(self.code), "Sys.init"))
+            self.add(CALL, None, "")
+            self.add(HALT, None, "")
+        for file_name, commands in files.items():
+            function = ""
+            for cmd_type, arg1, arg2 in commands:
+                if cmd_type == Parser.C_PUSH or cmd_type == Parser.C_POP:
+                    ops = PUSH_OPS if cmd_type == Parser.C_PUSH else POP_OPS
+                    if arg1 not in ops:
+                        raise ValueError(f"Invalid segment for {cmd_type}: "
+                                         f"{arg1}")
+                    self.add(ops[arg1], self.segment_address(
+                        file_name, arg1, arg2), function)
+                elif cmd_type == Parser.C_MATH:
+                    if arg1 not in ARITHMETIC_OPS:
+                        raise ValueError(f"Invalid VM command: {arg1}")
+                    self.add(ARITHMETIC_OPS[arg1], None, function)
+                elif cmd_type == Parser.C_LABEL:
+                    labels[f"{file_name}.{arg1}"] = len(self.code)
+                elif cmd_type == Parser.C_GOTO or cmd_type == Parser.C_IFGOTO:
+                    fixups.append((len(self.code), f"{file_name}.{arg1}"))
+                    self.add(GOTO if cmd_type == Parser.C_GOTO else IF_GOTO,
+                             None, function)
+                elif cmd_type == Parser.C_FUNCTION:
+                    function = arg1
+                    self.entries[function] = len(self.code)
+                    self.add(FUNCTION, arg2, function)
+                elif cmd_type == Parser.C_CALL:
+                    fixups.append((len(self.code), arg1))
+                    self.add(CALL, arg2, function)
+                elif cmd_type == Parser.C_RETURN:
+                    self.add(RETURN, None, function)
+        # running past the last command halts
+        self.add(HALT, None, "")
+        for index, target in fixups:
+            op, arg = self.code[index]
+            if op != CALL:
+                if target not in labels:
+                    raise ValueError(f"Unknown label: {target}")
+                self.code[index] = op, labels[target]
+            elif target in self.natives:
+                native = self.natives[target]
+                if verify and target in self.entries:
+                    native = verified(target, native)
+                self.code[index] = NATIVE, (native, arg or 0, target)
+            elif target in self.entries:
+                self.code[index] = CALL, (self.entries[target], arg or 0)
+            else:
+                # like the Hack translation, an unknown function is only an
+                # error once it is called
+                self.code[index] = NATIVE, (undefined(target), arg or 0,
+                                            target)
+        self.reset()
+
+    def add(self, op: int, arg: typing.Any, function: str) -> None:
+        """Appends an operation to the program.
+
+        Args:
+            op (int): the operation.
+            arg (typing.Any): its argument.
+            function (str): the VM function it belongs to.
+        """
+        self.code.append((op, arg))
+        self.functions.append(function)
+
+    def segment_address(self, file_name: str, segment: str,
+                        index: int) -> int:
+        """
+        Args:
+            file_name (str): the file of the command.
+            segment (str): the segment of a push or a pop.
+            index (int): the index in the segment.
+
+        Returns:
+            int: the argument of the operation: the RAM address of static,
+            temp and pointer, and the index itself otherwise.
+        """
+        if segment == "static":
+            name = f"{file_name}.{index}"
+            if name not in self.statics:
+                self.statics[name] = STATIC_BASE + len(self.statics)
+            return self.statics[name]
+        if segment == "temp":
+            return TEMP_BASE + index
+        if segment == "pointer":
+            return POINTER_BASE + index
+        return index
+
+    def reset(self) -> None:
+        """Clears the RAM, and gets ready to run from the first command."""
+        self.ram = [0] * RAM_SIZE
+        self.ram[SP] = STACK_BASE
+        self.pc = 0
+        self.steps = 0
+        self.halted = False
+
+    def add_halt(self, function: str) -> None:
+        """Makes the interpreter halt when the given function is called,
+        like the Hack emulator halts at the function's label.
+
+        Args:
+            function (str): a VM function, i.e "Sys.halt".
+        """
+        if function not in self.entries:
+            raise ValueError(f"Unknown function: {function}")
+        self.code[self.entries[function]] = HALT, None
+
+    def call_vm(self, name: str, n_args: int, return_pc: int) -> int:
+        """Calls the VM code of a function, like the call operation does,
+        once its arguments are on the stack.
+
+        Args:
+            name (str): name of the function.
+            n_args (int): number of arguments.
+            return_pc (int): index of the operation to return to.
+
+        Returns:
+            int: index of the first operation of the function.
+        """
+        if name not in self.entries:
+            raise ValueError(f"Call to an unknown function: {name}")
+        ram = self.ram
+        sp = ram[SP]
+        if sp + FRAME_SIZE > RAM_SIZE:
+            raise self.ram_error(self.pc - 1, sp + FRAME_SIZE)
+        ram[sp:sp + FRAME_SIZE] = [return_pc, ram[LCL], ram[ARG], ram[THIS],
+                                   ram[THAT]]
+        sp += FRAME_SIZE
+        ram[SP], ram[LCL], ram[ARG] = sp, sp, sp - FRAME_SIZE - n_args
+        return self.entries[name]
+
+    def ram_error(self, index: int, sp: int) -> ValueError:
+        """
+        Args:
+            index (int): the operation that went outside of the RAM.
+            sp (int): the stack pointer it needed.
+
+        Returns:
+            ValueError: an error that names the VM function of the
+            operation.
+        """
+        function = self.functions[index] or "bootstrap"
+        if sp >= RAM_SIZE:
+            return ValueError(f"Stack overflow in {function}: SP = {sp}")
+        return ValueError(f"RAM address out of range in {function}")
+
+    def verify_native(self, name: str, native: Native,
+                      args: typing.List[int]) -> int:
+        """Runs a native function, and then the VM code of the function from
+        the same state, and compares them. The VM code's results are kept.
+
+        Args:
+            name (str): name of the function.
+            native (Native): its native implementation.
+            args (typing.List[int]): the arguments, still on the stack.
+
+        Returns:
+            int: the return value of the VM code.
+        """
+        ram = self.ram
+        sp, pc = ram[SP], self.pc
+        base = sp - len(args)
+        before = ram[:]
+        result = native(self, args)
+        after = ram[:]
+        ram[:] = before
+        # the function returns to the last operation, which halts
+        end = len(self.code) - 1
+        self.pc = self.call_vm(name, len(args), end)
+        self.run()
+        if self.pc != end:
+            raise ValueError(f"{name} halted while it was verified")
+        self.halted = False
+        expected = ram[base]
+        # the stack above the arguments holds frames and locals of the VM
+        # code, anything else should be the same
+        if result is not None and (
+                result & WORD_MASK != expected or
+                ram[THIS:base] != after[THIS:base] or
+                ram[HEAP_BASE:] != after[HEAP_BASE:]):
+            differences = [
+                address for address in itertools.chain(
+                    range(THIS, base), range(HEAP_BASE, RAM_SIZE))
+                if ram[address] != after[address]]
+            self.mismatches.append(
+                f"{name}{tuple(args)}: returned {result & WORD_MASK}, "
+                f"expected {expected}, RAM differs at {differences[:8]}")
+        ram[SP] = sp
+        self.pc = pc
+        return expected
+
+    def run(self, max_steps: int = 1 << 62) -> int:
+        """Runs the program until it halts, or executes max_steps
+        operations.
+
+        Args:
+            max_steps (int): the maximal number of operations to execute,
+            not counting the VM code of verified native calls.
+
+        Returns:
+            int: the number of operations executed, which is the number of
+            VM commands that ran, labels excluded. In verify mode this
+            includes the VM code that ran to verify native calls.
+        """
+        # verify_native runs the VM code of a call with a nested run(),
+        # which adds its operations to self.steps
+        nested_start = self.steps
+        code = self.code
+        ram = self.ram
+        pc = self.pc
+        sp, lcl, arg = ram[SP], ram[LCL], ram[ARG]
+        step = 0
+        try:
+            for step in range(max_steps):
+                op, x = code[pc]
+                pc += 1
+                if op == PUSH_CONSTANT:
+                    ram[sp] = x
+                    sp += 1
+                elif op == PUSH_LOCAL:
+                    ram[sp] = ram[lcl + x]
+                    sp += 1
+                elif op == PUSH_ARGUMENT:
+                    ram[sp] = ram[arg + x]
+                    sp += 1
+                elif op == POP_LOCAL:
+                    sp -= 1
+                    ram[lcl + x] = ram[sp]
+                elif op == PUSH_THAT:
+                    ram[sp] = ram[ram[THAT] + x]
+                    sp += 1
+                elif op == PUSH_RAM:
+                    ram[sp] = ram[x]
+                    sp += 1
+                elif op == POP_RAM:
+                    sp -= 1
+                    ram[x] = ram[sp]
+                elif op == ADD:
+                    sp -= 1
+                    ram[sp - 1] = (ram[sp - 1] + ram[sp]) & WORD_MASK
+                elif op == IF_GOTO:
+                    sp -= 1
+                    if ram[sp]:
+                        pc = x
+                elif op == GOTO:
+                    pc = x
+                elif op == LT:
+                    sp -= 1
+                    ram[sp - 1] = TRUE if ram[sp - 1] ^ SIGN_BIT < \
+                        ram[sp] ^ SIGN_BIT else 0
+                elif op == GT:
+                    sp -= 1
+                    ram[sp - 1] = TRUE if ram[sp - 1] ^ SIGN_BIT > \
+                        ram[sp] ^ SIGN_BIT else 0
+                elif op == EQ:
+                    sp -= 1
+                    ram[sp - 1] = TRUE if ram[sp - 1] == ram[sp] else 0
+                elif op == NOT:
+                    ram[sp - 1] ^= WORD_MASK
+                elif op == PUSH_THIS:
+                    ram[sp] = ram[ram[THIS] + x]
+                    sp += 1
+                elif op == POP_THIS:
+                    sp -= 1
+                    ram[ram[THIS] + x] = ram[sp]
+                elif op == POP_THAT:
+                    sp -= 1
+                    ram[ram[THAT] + x] = ram[sp]
+                elif op == POP_ARGUMENT:
+                    sp -= 1
+                    ram[arg + x] = ram[sp]
+                elif op == SUB:
+                    sp -= 1
+                    ram[sp - 1] = (ram[sp - 1] - ram[sp]) & WORD_MASK
+                elif op == CALL:
+                    entry, n_args = x
+                    ram[sp] = pc
+                    ram[sp + 1] = lcl
+                    ram[sp + 2] = arg
+                    ram[sp + 3] = ram[THIS]
+                    ram[sp + 4] = ram[THAT]
+                    sp += FRAME_SIZE
+                    arg = sp - FRAME_SIZE - n_args
+                    lcl = sp
+                    ram[LCL], ram[ARG] = lcl, arg
+                    pc = entry
+                elif op == FUNCTION:
+                    if x:
+                        if sp + x > RAM_SIZE:
+                            raise self.ram_error(pc - 1, sp + x)
+                        ram[sp:sp + x] = [0] * x
+                        sp += x
+                elif op == RETURN:
+                    frame = lcl
+                    pc = ram[frame - 5]
+                    ram[arg] = ram[sp - 1]
+                    sp = arg + 1
+                    ram[THAT] = ram[frame - 1]
+                    ram[THIS] = ram[frame - 2]
+                    arg = ram[frame - 3]
+                    lcl = ram[frame - 4]
+                    ram[LCL], ram[ARG] = lcl, arg
+                elif op == NATIVE:
+                    function, n_args, name = x
+                    ram[SP] = sp
+                    self.pc = pc
+                    result = function(self, ram[sp - n_args:sp])
+                    if result is None:
+                        pc = self.call_vm(name, n_args, pc)
+                        sp, lcl, arg = ram[SP], ram[LCL], ram[ARG]
+                    else:
+                        sp -= n_args
+                        ram[sp] = result & WORD_MASK
+                        sp += 1
+                elif op == NEG:
+                    ram[sp - 1] = -ram[sp - 1] & WORD_MASK
+                elif op == AND:
+                    sp -= 1
+                    ram[sp - 1] &= ram[sp]
+                elif op == OR:
+                    sp -= 1
+                    ram[sp - 1] |= ram[sp]
+                elif op == SHIFT_LEFT:
+                    ram[sp - 1] = (ram[sp - 1] << 1) & WORD_MASK
+                elif op == SHIFT_RIGHT:
+                    ram[sp - 1] = (ram[sp - 1] >> 1) | (ram[sp - 1] & SIGN_BIT)
+                else:
+                    pc -= 1
+                    self.halted = True
+                    break
+            else:
+                step = max_steps
+        except IndexError:
+            # the stack, or a pointer, went past the end of the RAM
+            raise self.ram_error(pc - 1, sp) from None
+        ram[SP], ram[LCL], ram[ARG] = sp, lcl, arg
+        self.pc = pc
+        nested = self.steps - nested_start
+        self.steps += step
+        return step + nested
+
+
+if "__main__" == __name__:
+    # Runs a VM program until it halts, and prints the requested RAM words
+    # as signed numbers.
+    arg_parser = argparse.ArgumentParser(prog="VMInterpreter")
+    arg_parser.add_argument("input_path", help="a .vm file or a directory")
+    arg_parser.add_argument(
+        "--no-bootstrap", dest="bootstrap", action="store_false",
+        help="start at the first command instead of calling Sys.init")
+    arg_parser.add_argument(
+        "--halt", action="append", metavar="FUNCTION",
+        help="halt when this function is called, Sys.halt by default")
+    arg_parser.add_argument(
+        "--native", action="store_true",
+        help="run the OS functions of NativeOS in Python")
+    arg_parser.add_argument(
+        "--verify", action="store_true",
+        help="with --native, also run the VM code of every native call and "
+             "report where they differ")
+    arg_parser.add_argument(
+        "--steps", type=int, default=1 << 62,
+        help="stop after this many commands")
+    arg_parser.add_argument(
+        "--set", type=parse_assignment, action="append", default=[],
+        metavar="ADDRESS=VALUE", help="initialize a RAM word")
+    arg_parser.add_argument(
+        "--dump", type=parse_range, action="append", default=[],
+        metavar="FIRST[:LAST]", help="print RAM words after the run")
+    args = arg_parser.parse_args()
+    natives = None
+    if args.native:
+        from NativeOS import NATIVES
+        natives = NATIVES
+    try:
+        interpreter = VMInterpreter(load_path(args.input_path), natives,
+                                    args.bootstrap, args.verify)
+        for function in args.halt or []:
+            interpreter.add_halt(function)
+    except (OSError, ValueError) as error:
+        sys.exit(f"Can't load {args.input_path}: {error}")
+    if args.halt is None and "Sys.halt" in interpreter.entries:
+        interpreter.add_halt("Sys.halt")
+    for address, value in args.set:
+        interpreter.ram[address] = value
+    start = time.perf_counter()
+    try:
+        steps = interpreter.run(args.steps)
+    except ValueError as error:
+        sys.exit(f"Error: {error}")
+    seconds = time.perf_counter() - start
+    print(f"{'halted' if interpreter.halted else 'stopped'} in "
+          f"{interpreter.functions[interpreter.pc] or 'bootstrap'} after "
+          f"{steps} commands, {seconds:.3f}s "
+          f"({steps / max(seconds, 1e-9) / 1e6:.2f} million commands/s)")
+    if args.verify:
+        print(f"{len(interpreter.mismatches)} native calls differ from the VM "
+              f"code")
+        for mismatch in interpreter.mismatches[:20]:
+            print(mismatch)
+    for addresses in args.dump:
+        for address in addresses:
+            value = interpreter.ram[address]
+            if value & SIGN_BIT:
+                value -= 1 << 16
+            print(f"RAM[{address}] = {value}")
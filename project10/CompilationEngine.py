@@ -4,13 +4,19 @@ https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
 and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
 Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
-from JackTokenizer import JackTokenizer
+from JackTokenizer import JackTokenizer, KEYWORD, SYMBOL, IDENTIFIER, \
+    INT_CONST, STRING_CONST
 
 INDENT = "  "
-OP = ["+", "-", "*", "/", "&", "|", "<", ">", "="]
-UANRY_OP = ["~", "-", "^", "#"]
-CLASS_VAR_DEC = ["static", "field"]
-CLASS_SUBROUTINE = ["function", "method", "constructor"]
+OP = frozenset(["+", "-", "*", "/", "&", "|", "<", ">", "="])
+UANRY_OP = frozenset(["~", "-", "^", "#"])
+CLASS_VAR_DEC = frozenset(["static", "field"])
+CLASS_SUBROUTINE = frozenset(["function", "method", "constructor"])
+# the XML tag of every token type
+TOKEN_TAGS = {KEYWORD: "keyword", SYMBOL: "symbol", IDENTIFIER: "identifier",
+              INT_CONST: "integerConstant", STRING_CONST: "stringConstant"}
+# tokens that have to be escaped in XML
+ESCAPES = {">": "&gt;", "<": "&lt;", "\"": "&quot;", "&": "&amp;"}
 
 
 def write_open(tag):
@@ -38,25 +44,19 @@ class CompilationEngine:
         self.depth = 0
         self.counter = 0
         self.compiled_text = ""
+        # the routine that compiles every kind of statement
+        self.statements = {"if": self.compile_if, "let": self.compile_let,
+                           "do": self.compile_do,
+                           "while": self.compile_while,
+                           "return": self.compile_return}
 
     def write_indent(self):
         return "    " * self.depth
 
     def writeCurrToken(self):
         tokenName = self.tokenizer.get_name()
-        tokenType = self.tokenizer.token_type().lower()
-        if tokenType == "string_const":
-            tokenType = "stringConstant"
-        elif tokenType == "int_const":
-            tokenType = "integerConstant"
-        if tokenName == ">":
-            tokenName = "&gt;"
-        if tokenName == "<":
-            tokenName = "&lt;"
-        if tokenName == "\"":
-            tokenName = "&quot;"
-        if tokenName == "&":
-            tokenName = "&amp;"
+        tokenType = TOKEN_TAGS[self.tokenizer.token_type()]
+        tokenName = ESCAPES.get(tokenName, tokenName)
         self.compiled_text += self.write_indent() + write_tag(tokenType, tokenName)
 
     def compile_class(self) -> None:
@@ -162,16 +162,11 @@ class CompilationEngine:
         self.depth += 1
         while self.tokenizer.get_name() != "}":
             name = self.tokenizer.get_name()
-            if name == "if":
-                self.compile_if()
-            elif name == "let":
-                self.compile_let()
-            elif name == "do":
-                self.compile_do()
-            elif name == "while":
-                self.compile_while()
-            elif name == "return":
-                self.compile_return()
+            compile_statement = self.statements.get(name)
+            if compile_statement is None:
+                raise ValueError(f"Line {self.tokenizer.line()}: expected a "
+                                 f"statement, got {name!r}")
+            compile_statement()
         self.depth -= 1
         self.compiled_text += self.write_indent() + write_close("statements")
 
@@ -307,7 +302,8 @@ class CompilationEngine:
         """
         self.compiled_text += self.write_indent() + write_open("term")
         self.depth += 1
-        nextToken = self.tokenizer.tokens[self.tokenizer.currToken + 1]
+        following = self.tokenizer.peek()
+        nextToken = following.value if following is not None else None
         # array var: x[5]
         if nextToken == "[":
             for i in range(2):
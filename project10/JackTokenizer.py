@@ -1,85 +1,175 @@
 """This file is part of nand2tetris, as taught in The Hebrew University,
-and was written by Aviv Yaish according to the specifications given in  
+and was written by Aviv Yaish according to the specifications given in
 https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
-and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import collections
+import re
+import sys
 import typing
 
+# the token types, interned so that comparing two of them compares pointers
+KEYWORD = sys.intern("KEYWORD")
+SYMBOL = sys.intern("SYMBOL")
+IDENTIFIER = sys.intern("IDENTIFIER")
+INT_CONST = sys.intern("INT_CONST")
+STRING_CONST = sys.intern("STRING_CONST")
+
+
+class Token(typing.NamedTuple):
+    """A token of Jack code, classified once when the input is read."""
+    # KEYWORD, SYMBOL, IDENTIFIER, INT_CONST or STRING_CONST
+    type: str
+    # the keyword, symbol or identifier itself, the value of an integer
+    # constant, or a string constant without its double quotes
+    value: typing.Union[str, int]
+    # position of the token in the input, both counted from 1
+    line: int
+    column: int
+
 
 class JackTokenizer:
     COMMENT_PREFIX = "//"
     OPEN_COMMENT_PREFIX = "/*"
     CLOSE_COMMENT_PREFIX = "*/"
-    SYMBOLS = ['{', '}', '(', ')', '[', ']', '.', ',', ';', '+',
-               '-', '*', '/', '&', '|', '<', '>', '=', '~', '^', '#']
-    KEYWORDS = ['class', 'constructor', 'function', 'method', 'field',
-                'static', 'var', 'int', 'char', 'boolean', 'void', 'true', 'false',
-                'null', 'this', 'let', 'do', 'if', 'else', 'while', 'return']
+    SYMBOLS = frozenset(['{', '}', '(', ')', '[', ']', '.', ',', ';', '+',
+                         '-', '*', '/', '&', '|', '<', '>', '=', '~', '^',
+                         '#'])
+    KEYWORDS = frozenset(['class', 'constructor', 'function', 'method',
+                          'field', 'static', 'var', 'int', 'char', 'boolean',
+                          'void', 'true', 'false', 'null', 'this', 'let',
+                          'do', 'if', 'else', 'while', 'return'])
     STRING_PREFIX = "\""
+    # a single pass over every line: each match is either whitespace and
+    # comments to skip, or a token whose group names its type. a comment
+    # that goes on to the next lines is matched by "comment", a string that
+    # isn't closed by "unterminated", and any other character by "invalid".
+    TOKEN_PATTERN = re.compile(r"""
+        (?P<skip>(?:\s+|//.*|/\*.*?\*/)+)
+        |(?P<word>[A-Za-z_]\w*)
+        |(?P<INT_CONST>\d+)
+        |"(?P<STRING_CONST>[^"\n]*)"
+        |(?P<comment>/\*)
+        |(?P<unterminated>")
+        |(?P<SYMBOL>[{}()\[\].,;+\-*/&|<>=~^#])
+        |(?P<invalid>.)
+        """, re.VERBOSE)
+    # the type of every word that isn't an identifier
+    WORD_TYPES = dict.fromkeys(KEYWORDS, KEYWORD)
+    # the default number of tokens that can be looked at past the current one
+    LOOKAHEAD = 1
 
-    def __init__(self, input_stream: typing.TextIO) -> None:
-        """Opens the input stream and gets ready to tokenize it.
+    def __init__(self, input_stream: typing.TextIO,
+                 lookahead: int = LOOKAHEAD) -> None:
+        """Opens the input stream and gets ready to tokenize it. The input is
+        read a line at a time, as tokens are needed.
 
         Args:
             input_stream (typing.TextIO): input stream.
+            lookahead (int): the number of tokens past the current one that
+                peek() can return.
+        """
+        self.stream = self.tokenize(input_stream)
+        self.max_lookahead = lookahead
+        # the tokens read from the stream after the current one
+        self.lookahead = collections.deque()
+        self.current = None  # None means uninitialized.
+
+    @staticmethod
+    def tokenize(lines: typing.Iterable[str]) -> typing.Iterator[Token]:
+        """
+        Args:
+            lines (typing.Iterable[str]): lines of Jack code, like an open
+                file.
+
+        Returns:
+            typing.Iterator[Token]: the tokens of the code, in order, made as
+            the lines are read.
         """
-        input_lines = input_stream.read().splitlines()
-        self.isString = False
-        self.tokens = []
-        self.currToken = -1  # -1 means uninitialized.
-        comment = False
-        # delete every comment and whitespaces in the text, split each word and symbol.
-        for i in range(len(input_lines)):
-            # find "/*" and "*/" if exists in line
-            long_comment_open = input_lines[i].find(JackTokenizer.OPEN_COMMENT_PREFIX)
-            long_comment_close = input_lines[i].find(JackTokenizer.CLOSE_COMMENT_PREFIX)
-            # find "//" if exists in line
-            comment_index = input_lines[i].find(JackTokenizer.COMMENT_PREFIX)
-            # if there is a comment in line, delete it
-            if comment:
-                if long_comment_close != -1:
-                    comment = False
-                input_lines[i] = ""
-            if comment_index != -1:
-                input_lines[i] = input_lines[i][:comment_index]
-            if long_comment_open != -1:
-                if long_comment_close == -1:
-                    comment = True
-                input_lines[i] = ""
-            # first index that haven't been split yet
-            start_idx = 0
-            for j in range(len(input_lines[i])):
-                if input_lines[i][j] in JackTokenizer.SYMBOLS:
-                    self.tokens += input_lines[i][start_idx:j].split()
-                    self.tokens += input_lines[i][j]
-                    start_idx = j + 1
-        i = 0
-        while i < len(self.tokens):
-            if self.tokens[i][0] == JackTokenizer.STRING_PREFIX and self.tokens[i][-1] != JackTokenizer.STRING_PREFIX:
-                k = i + 1
-                while self.tokens[k][-1] != JackTokenizer.STRING_PREFIX:
-                    self.tokens[i] += " " + self.tokens[k]
-                    self.tokens.pop(k)
-                self.tokens[i] += " " + self.tokens[k]
-                self.tokens.pop(k)
-            i += 1
+        word_types = JackTokenizer.WORD_TYPES
+        # where the comment that is still open started, if any
+        comment_start = None
+        for line, text in enumerate(lines, 1):
+            position = 0
+            if comment_start is not None:
+                position = text.find(JackTokenizer.CLOSE_COMMENT_PREFIX)
+                if position == -1:
+                    continue
+                position += len(JackTokenizer.CLOSE_COMMENT_PREFIX)
+                comment_start = None
+            for match in JackTokenizer.TOKEN_PATTERN.finditer(text, position):
+                kind = match.lastgroup
+                if kind == "skip":
+                    continue
+                column = match.start() + 1
+                if kind == "word":
+                    word = match.group()
+                    yield Token(word_types.get(word, IDENTIFIER), word, line,
+                                column)
+                elif kind == "SYMBOL":
+                    yield Token(SYMBOL, match.group(kind), line, column)
+                elif kind == "INT_CONST":
+                    yield Token(INT_CONST, int(match.group()), line, column)
+                elif kind == "STRING_CONST":
+                    yield Token(STRING_CONST, match.group(kind), line, column)
+                elif kind == "comment":
+                    comment_start = (line, column)
+                    break
+                elif kind == "unterminated":
+                    raise ValueError(f"Line {line}, column {column}: "
+                                     f"unterminated string constant")
+                elif kind == "invalid":
+                    raise ValueError(f"Line {line}, column {column}: invalid "
+                                     f"character {match.group()!r}")
+        if comment_start is not None:
+            raise ValueError("Line {}, column {}: unterminated comment".format(
+                *comment_start))
 
+    def peek(self, k: int = 1) -> typing.Optional[Token]:
+        """
+        Args:
+            k (int): how far to look past the current token, up to the
+                lookahead given to the constructor.
+
+        Returns:
+            typing.Optional[Token]: the k-th token after the current one, or
+            None if the input ends before it.
+        """
+        if not 0 < k <= self.max_lookahead:
+            raise ValueError(f"Can't look {k} tokens ahead, the lookahead is "
+                             f"{self.max_lookahead}")
+        lookahead = self.lookahead
+        while len(lookahead) < k:
+            token = next(self.stream, None)
+            if token is None:
+                return None
+            lookahead.append(token)
+        return lookahead[k - 1]
 
     def has_more_tokens(self) -> bool:
         """Do we have more tokens in the input?
         Returns:
             bool: True if there are more tokens, False otherwise.
         """
-        return self.currToken < len(self.tokens) - 1
+        return self.peek() is not None
 
     def advance(self) -> None:
-        """Gets the next token from the input and makes it the current token. 
-        This method should be called if has_more_tokens() is true. 
+        """Gets the next token from the input and makes it the current token.
+        This method should be called if has_more_tokens() is true.
         Initially there is no current token.
         """
-        if self.has_more_tokens():
-            self.currToken += 1
+        if self.lookahead:
+            self.current = self.lookahead.popleft()
+        else:
+            self.current = next(self.stream, self.current)
+
+    def line(self) -> int:
+        """
+        Returns:
+            int: the line of the current token in the input.
+        """
+        return self.current.line
 
     def token_type(self) -> str:
         """
@@ -87,48 +177,28 @@ class JackTokenizer:
             str: the type of the current token, can be
             "KEYWORD", "SYMBOL", "IDENTIFIER", "INT_CONST", "STRING_CONST"
         """
-        token = self.tokens[self.currToken]
-        if token[0] == JackTokenizer.STRING_PREFIX:
-            if token[-1] != JackTokenizer.STRING_PREFIX:
-                self.isString = True
-            return "STRING_CONST"
-        elif token[-1] == JackTokenizer.STRING_PREFIX:
-            self.isString = False
-            return "STRING_CONST"
-        elif self.isString:
-            return "STRING_CONST"
-        elif token in JackTokenizer.KEYWORDS:
-            return "KEYWORD"
-        elif token in JackTokenizer.SYMBOLS:
-            return "SYMBOL"
-        elif token.isdigit():
-            return "INT_CONST"
-        else:
-            return "IDENTIFIER"
+        return self.current.type
 
     def get_name(self):
-        if self.token_type() == "KEYWORD":
-            return self.keyword().lower()
-        elif self.token_type() == "SYMBOL":
-            return self.symbol()
-        elif self.token_type() == "IDENTIFIER":
-            return self.identifier()
-        elif self.token_type() == "INT_CONST":
-            return self.int_val()
-        elif self.token_type() == "STRING_CONST":
-            return self.string_val()
+        """
+        Returns:
+            the value of the current token, whatever its type: a keyword in
+            lower case, a symbol, an identifier, an int or a string.
+        """
+        return self.current.value
 
     def keyword(self) -> str:
         """
         Returns:
             str: the keyword which is the current token.
             Should be called only when token_type() is "KEYWORD".
-            Can return "CLASS", "METHOD", "FUNCTION", "CONSTRUCTOR", "INT", 
-            "BOOLEAN", "CHAR", "VOID", "VAR", "STATIC", "FIELD", "LET", "DO", 
+            Can return "CLASS", "METHOD", "FUNCTION", "CONSTRUCTOR", "INT",
+            "BOOLEAN", "CHAR", "VOID", "VAR", "STATIC", "FIELD", "LET", "DO",
             "IF", "ELSE", "WHILE", "RETURN", "TRUE", "FALSE", "NULL", "THIS"
         """
-        if self.token_type() == "KEYWORD":
-            return self.tokens[self.currToken].upper()
+        token = self.current
+        if token.type is KEYWORD:
+            return token.value.upper()
 
     def symbol(self) -> str:
         """
@@ -136,8 +206,9 @@ class JackTokenizer:
             str: the character which is the current token.
             Should be called only when token_type() is "SYMBOL".
         """
-        if self.token_type() == "SYMBOL":
-            return self.tokens[self.currToken]
+        token = self.current
+        if token.type is SYMBOL:
+            return token.value
 
     def identifier(self) -> str:
         """
@@ -145,8 +216,9 @@ class JackTokenizer:
             str: the identifier which is the current token.
             Should be called only when token_type() is "IDENTIFIER".
         """
-        if self.token_type() == "IDENTIFIER":
-            return self.tokens[self.currToken]
+        token = self.current
+        if token.type is IDENTIFIER:
+            return token.value
 
     def int_val(self) -> int:
         """
@@ -154,14 +226,16 @@ class JackTokenizer:
             str: the integer value of the current token.
             Should be called only when token_type() is "INT_CONST".
         """
-        if self.token_type() == "INT_CONST":
-            return int(self.tokens[self.currToken])
+        token = self.current
+        if token.type is INT_CONST:
+            return token.value
 
     def string_val(self) -> str:
         """
         Returns:
-            str: the string value of the current token, without the double 
+            str: the string value of the current token, without the double
             quotes. Should be called only when token_type() is "STRING_CONST".
         """
-        if self.token_type() == "STRING_CONST":
-            return self.tokens[self.currToken][1:-1]
+        token = self.current
+        if token.type is STRING_CONST:
+            return token.value
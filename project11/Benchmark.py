@@ -0,0 +1,305 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import typing
+from JackTokenizer import JackTokenizer
+from JackCompiler import compile_file
+from CompilationEngine import OP, UANRY_OP, CLASS_VAR_DEC, CLASS_SUBROUTINE
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# every input is tokenized this many times, and the best time is reported
+REPEATS = 5
+# the lists that the tokenizer and the engine used to scan, for the baselines
+LEGACY_SYMBOLS = ['{', '}', '(', ')', '[', ']', '.', ',', ';', '+',
+                  '-', '*', '/', '&', '|', '<', '>', '=', '~', '^', '#']
+LEGACY_KEYWORDS = ['class', 'constructor', 'function', 'method', 'field',
+                   'static', 'var', 'int', 'char', 'boolean', 'void', 'true',
+                   'false', 'null', 'this', 'let', 'do', 'if', 'else',
+                   'while', 'return']
+LEGACY_OP = ["+", "-", "*", "/", "&", "|", "<", ">", "="]
+LEGACY_UNARY_OP = ["~", "-", "^", "#"]
+LEGACY_CLASS_VAR_DEC = ["static", "field"]
+LEGACY_CLASS_SUBROUTINE = ["function", "method", "constructor"]
+
+
+def parse_line(line: str) -> typing.List[str]:
+    res = []
+    line = line.split()
+    for i in range(len(line)):
+        start_idx = 0
+        for j in range(len(line[i])):
+            if line[i][j] in LEGACY_SYMBOLS:
+                if line[i][start_idx:j] != "":
+                    res.append(line[i][start_idx:j])
+                res.append(line[i][j])
+                start_idx = j + 1
+        if start_idx < len(line[i]):
+            res.append(line[i][start_idx:])
+    return res
+
+
+class LegacyTokenizer:
+    """The line by line tokenizer that JackTokenizer replaced, kept as the
+    baseline of the benchmark. Comments are removed with find() on every
+    line, the lines are split by scanning their characters, and every token
+    is classified again each time its type is asked for.
+    """
+
+    def __init__(self, text: str) -> None:
+        input_lines = text.splitlines()
+        self.isString = False
+        self.tokens = []
+        self.currToken = -1
+        comment = False
+        pre_tokens = []
+        for i in range(len(input_lines)):
+            long_comment_open = input_lines[i].find(
+                JackTokenizer.OPEN_COMMENT_PREFIX)
+            long_comment_close = input_lines[i].find(
+                JackTokenizer.CLOSE_COMMENT_PREFIX)
+            comment_index = input_lines[i].find(JackTokenizer.COMMENT_PREFIX)
+            if comment:
+                if long_comment_close != -1:
+                    comment = False
+                input_lines[i] = ""
+            if comment_index != -1:
+                input_lines[i] = input_lines[i][:comment_index]
+            if long_comment_open != -1:
+                if long_comment_close == -1:
+                    comment = True
+                input_lines[i] = ""
+            if input_lines[i] != "":
+                pre_tokens.append(input_lines[i].lstrip())
+        for line in pre_tokens:
+            start_idx = line.find(JackTokenizer.STRING_PREFIX)
+            while start_idx != -1:
+                for i in range(start_idx + 1, len(line)):
+                    if line[i] == JackTokenizer.STRING_PREFIX:
+                        end_idx = i
+                        break
+                self.tokens += parse_line(line[:start_idx])
+                self.tokens.append(line[start_idx:end_idx + 1])
+                line = line[end_idx + 1:]
+                start_idx = line.find(JackTokenizer.STRING_PREFIX)
+            self.tokens += parse_line(line)
+
+    def token_type(self) -> str:
+        token = self.tokens[self.currToken]
+        if token[0] == JackTokenizer.STRING_PREFIX:
+            if token[-1] != JackTokenizer.STRING_PREFIX:
+                self.isString = True
+            return "STRING_CONST"
+        elif token[-1] == JackTokenizer.STRING_PREFIX:
+            self.isString = False
+            return "STRING_CONST"
+        elif self.isString:
+            return "STRING_CONST"
+        elif token in LEGACY_KEYWORDS:
+            return "KEYWORD"
+        elif token in LEGACY_SYMBOLS:
+            return "SYMBOL"
+        elif token.isdigit():
+            return "INT_CONST"
+        else:
+            return "IDENTIFIER"
+
+    def get_name(self):
+        # the type is found again for every comparison, as it used to be
+        token = self.tokens[self.currToken]
+        if self.token_type() == "KEYWORD":
+            return token
+        elif self.token_type() == "SYMBOL":
+            return token
+        elif self.token_type() == "IDENTIFIER":
+            return token
+        elif self.token_type() == "INT_CONST":
+            return int(token)
+        elif self.token_type() == "STRING_CONST":
+            return token[1:-1]
+
+
+def legacy_tokens(text: str) -> typing.List[typing.Tuple[str, typing.Any]]:
+    """
+    Returns:
+        typing.List[typing.Tuple[str, typing.Any]]: the type and the value
+        of every token of the text, by LegacyTokenizer.
+    """
+    tokenizer = LegacyTokenizer(text)
+    result = []
+    for index in range(len(tokenizer.tokens)):
+        tokenizer.currToken = index
+        result.append((tokenizer.token_type(), tokenizer.get_name()))
+    return result
+
+
+def regex_tokens(text: str) -> typing.List[typing.Tuple[str, typing.Any]]:
+    """
+    Returns:
+        typing.List[typing.Tuple[str, typing.Any]]: the type and the value
+        of every token of the text, by JackTokenizer.
+    """
+    tokenizer = JackTokenizer(io.StringIO(text))
+    result = []
+    while tokenizer.has_more_tokens():
+        tokenizer.advance()
+        result.append((tokenizer.token_type(), tokenizer.get_name()))
+    return result
+
+
+def classify_lists(words: typing.List[str]) -> int:
+    """Classifies every word the way the tokenizer and the engine used to,
+    by scanning lists: its type, then whether it is an operator or starts a
+    declaration.
+
+    Returns:
+        int: the number of tests that matched, so that the work is used.
+    """
+    matches = 0
+    for word in words:
+        if word in LEGACY_KEYWORDS:
+            matches += 1
+        elif word in LEGACY_SYMBOLS:
+            matches += 1
+        matches += (word in LEGACY_OP) + (word in LEGACY_UNARY_OP) + \
+            (word in LEGACY_CLASS_VAR_DEC) + (word in LEGACY_CLASS_SUBROUTINE)
+    return matches
+
+
+def classify_tables(words: typing.List[str]) -> int:
+    """Classifies every word like classify_lists, by the frozen tables of
+    JackTokenizer and CompilationEngine.
+
+    Returns:
+        int: the number of tests that matched, so that the work is used.
+    """
+    word_types = JackTokenizer.WORD_TYPES
+    symbols = JackTokenizer.SYMBOLS
+    matches = 0
+    for word in words:
+        if word in word_types:
+            matches += 1
+        elif word in symbols:
+            matches += 1
+        matches += (word in OP) + (word in UANRY_OP) + \
+            (word in CLASS_VAR_DEC) + (word in CLASS_SUBROUTINE)
+    return matches
+
+
+def generate_jack(n_functions: int) -> str:
+    """
+    Args:
+        n_functions (int): number of functions in the class.
+
+    Returns:
+        str: a synthetic Jack class, made of copies of a function with
+        comments, strings, arrays, loops, branches and calls.
+    """
+    parts = ["/** A generated class for the tokenizer benchmark. */\n",
+             "class Generated {\n    static int count;\n\n"]
+    for i in range(n_functions):
+        parts.append(f"""    /* function number {i},
+     * with a block comment over several lines */
+    function int f{i}(int x, Array a) {{
+        var int i, sum;
+        var String s;
+        let s = "value of f{i}: ";  // a string and a comment
+        let i = 0;
+        while (i < {i % 100 + 10}) {{
+            if ((a[i] > x) & ~(i = {i % 7})) {{
+                let sum = sum + (a[i] * 3) - (x / 2);
+            }} else {{
+                let a[i] = -sum | {i};
+            }}
+            let i = i + 1;
+        }}
+        do Output.printString(s);
+        let count = count + 1;
+        return sum;
+    }}
+
+""")
+    parts.append("}\n")
+    return "".join(parts)
+
+
+def measure(function: typing.Callable, *args) -> typing.Tuple[float, typing.Any]:
+    """
+    Returns:
+        typing.Tuple[float, typing.Any]: the best run time of the function
+        in seconds, out of REPEATS runs, and its result.
+    """
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = function(*args)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def compile_text(text: str) -> str:
+    """
+    Returns:
+        str: the VM code of a Jack class.
+    """
+    output_file = io.StringIO()
+    compile_file(io.StringIO(text), output_file)
+    return output_file.getvalue()
+
+
+if "__main__" == __name__:
+    # Tokenizes every input with both tokenizers, checks that they agree,
+    # and reports their times and the time of compiling the input.
+    arg_parser = argparse.ArgumentParser(prog="Benchmark")
+    arg_parser.add_argument(
+        "--functions", type=int, nargs="+", default=[100, 1000],
+        help="sizes of the generated classes, in functions")
+    args = arg_parser.parse_args()
+    inputs = {}
+    os_dir = os.path.join(ROOT, "project12")
+    os_classes = sorted(filename for filename in os.listdir(os_dir)
+                        if filename.endswith(".jack"))
+    for filename in os_classes:
+        with open(os.path.join(os_dir, filename)) as input_file:
+            inputs[filename] = input_file.read()
+    for n_functions in args.functions:
+        inputs[f"{n_functions} functions"] = generate_jack(n_functions)
+    print(f"{'input':>16} {'tokens':>8} {'legacy s':>9} {'regex s':>9} "
+          f"{'speedup':>8} {'compile s':>10} {'lists ns':>9} "
+          f"{'tables ns':>9}")
+    totals = [0, 0.0, 0.0, 0.0]
+    for name, text in inputs.items():
+        legacy_seconds, expected = measure(legacy_tokens, text)
+        regex_seconds, tokens = measure(regex_tokens, text)
+        if tokens != expected:
+            sys.exit(f"{name}: the tokenizers disagree")
+        compile_seconds, _ = measure(compile_text, text)
+        # the cost of classifying a single token, in nanoseconds
+        words = [str(value) for _, value in tokens]
+        lists_seconds, expected = measure(classify_lists, words)
+        tables_seconds, matches = measure(classify_tables, words)
+        if matches != expected:
+            sys.exit(f"{name}: the classifications disagree")
+        print(f"{name:>16} {len(tokens):>8} {legacy_seconds:>9.4f} "
+              f"{regex_seconds:>9.4f} {legacy_seconds / regex_seconds:>7.1f}x "
+              f"{compile_seconds:>10.4f} "
+              f"{lists_seconds * 1e9 / len(words):>9.1f} "
+              f"{tables_seconds * 1e9 / len(words):>9.1f}")
+        if name in os_classes:
+            totals[0] += len(tokens)
+            totals[1] += legacy_seconds
+            totals[2] += regex_seconds
+            totals[3] += compile_seconds
+    if totals[0]:
+        tokens, legacy_seconds, regex_seconds, compile_seconds = totals
+        print(f"{'project12':>16} {tokens:>8} {legacy_seconds:>9.4f} "
+              f"{regex_seconds:>9.4f} {legacy_seconds / regex_seconds:>7.1f}x "
+              f"{compile_seconds:>10.4f}")
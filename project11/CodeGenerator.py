@@ -0,0 +1,235 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+import JackAST
+from SymbolTable import SymbolTable
+from VMWriter import VMWriter
+from CompilationEngine import OP_CALLS, OP_COMMANDS, UNARY_OP_COMMANDS, \
+    KIND_SEGMENTS
+
+
+class CodeGenerator:
+    """Writes the VM code of the syntax tree of a class. The code, and the
+    source map, are the same as CompilationEngine writes for the class.
+    """
+
+    def __init__(self, writer: VMWriter) -> None:
+        """
+        Args:
+            writer (VMWriter): writes the VM commands.
+        """
+        self.writer = writer
+        self.table = SymbolTable()
+        self.className = ""
+        self.while_index_counter = -1
+        self.if_index_counter = -1
+        self.string_index_counter = -1
+        # the routine that generates every kind of statement and expression
+        self.generators = {
+            JackAST.Let: self.generate_let, JackAST.If: self.generate_if,
+            JackAST.While: self.generate_while, JackAST.Do: self.generate_do,
+            JackAST.Return: self.generate_return,
+            JackAST.IntConst: self.generate_int,
+            JackAST.StringConst: self.generate_string,
+            JackAST.PooledString: self.generate_pooled_string,
+            JackAST.KeywordConst: self.generate_keyword,
+            JackAST.Var: self.generate_var,
+            JackAST.ArrayRef: self.generate_array_ref,
+            JackAST.Call: self.generate_call,
+            JackAST.Unary: self.generate_unary,
+            JackAST.Binary: self.generate_binary}
+
+    def segment_of(self, name: str) -> str:
+        """
+        Args:
+            name (str): name of a variable.
+
+        Returns:
+            str: the segment that holds the variable, by its kind.
+        """
+        kind = self.table.kind_of(name)
+        if kind is None:
+            raise ValueError(f"Line {self.writer.source_line}: undefined "
+                             f"variable {name!r}")
+        return KIND_SEGMENTS[kind]
+
+    def generate(self, node: JackAST.Node) -> None:
+        """Writes the code of a statement or an expression.
+
+        Args:
+            node (JackAST.Node): the statement or expression.
+        """
+        self.generators[type(node)](node)
+
+    def generate_class(self, node: JackAST.Class) -> None:
+        """Writes the code of a whole class.
+
+        Args:
+            node (JackAST.Class): the class.
+        """
+        self.className = node.name
+        for declaration in node.variables:
+            for name in declaration.names:
+                self.table.define(name, declaration.type, declaration.kind)
+        for subroutine in node.subroutines:
+            self.generate_subroutine(subroutine)
+        self.writer.write()
+
+    def generate_subroutine(self, node: JackAST.Subroutine) -> None:
+        self.table.start_subroutine()
+        if node.kind == "method":
+            self.table.define("this", self.className, "ARG")
+        for declaration in node.parameters + node.locals:
+            for name in declaration.names:
+                self.table.define(name, declaration.type, declaration.kind)
+        self.writer.source_line = node.line
+        self.writer.write_function(f"{self.className}.{node.name}",
+                                   self.table.var_count('VAR'))
+        if node.kind == "constructor":
+            self.writer.write_push('CONST', self.table.var_count('FIELD'))
+            self.writer.write_call('Memory.alloc', 1)
+            self.writer.write_pop('POINTER', 0)
+        elif node.kind == "method":
+            self.writer.write_push('ARG', 0)
+            self.writer.write_pop('POINTER', 0)
+        self.generate_statements(node.body)
+        self.writer.flush()
+
+    def generate_statements(self, statements: typing.List[JackAST.Node]) \
+            -> None:
+        for statement in statements:
+            self.writer.source_line = statement.line
+            self.generators[type(statement)](statement)
+
+    def generate_let(self, node: JackAST.Let) -> None:
+        segment = self.segment_of(node.name)
+        index = self.table.index_of(node.name)
+        if node.index is not None:
+            self.generate(node.index)
+            self.writer.write_push(segment, index)
+            self.writer.write_arithmetic('ADD')
+            self.generate(node.value)
+            self.writer.write_pop('TEMP', 0)
+            self.writer.write_pop('POINTER', 1)
+            self.writer.write_push('TEMP', 0)
+            self.writer.write_pop('THAT', 0)
+        else:
+            self.generate(node.value)
+            self.writer.write_pop(segment, index)
+
+    def generate_if(self, node: JackAST.If) -> None:
+        self.if_index_counter += 1
+        idx = self.if_index_counter
+        self.generate(node.condition)
+        self.writer.write_if(f"IF_TRUE{idx}")
+        self.writer.write_goto(f"IF_FALSE{idx}")
+        self.writer.write_label(f"IF_TRUE{idx}")
+        self.generate_statements(node.then)
+        self.writer.source_line = node.line
+        self.writer.write_goto(f"IF_END{idx}")
+        self.writer.write_label(f"IF_FALSE{idx}")
+        if node.otherwise is not None:
+            self.generate_statements(node.otherwise)
+            self.writer.source_line = node.line
+        self.writer.write_label(f"IF_END{idx}")
+
+    def generate_while(self, node: JackAST.While) -> None:
+        self.while_index_counter += 1
+        idx = self.while_index_counter
+        self.writer.write_label(f"WHILE_EXP{idx}")
+        self.generate(node.condition)
+        self.writer.write_arithmetic('NOT')
+        self.writer.write_if(f"WHILE_END{idx}")
+        self.generate_statements(node.body)
+        self.writer.source_line = node.line
+        self.writer.write_goto(f"WHILE_EXP{idx}")
+        self.writer.write_label(f"WHILE_END{idx}")
+
+    def generate_do(self, node: JackAST.Do) -> None:
+        self.generate_call(node.call)
+        self.writer.write_pop('TEMP', 0)
+
+    def generate_return(self, node: JackAST.Return) -> None:
+        if node.value is not None:
+            self.generate(node.value)
+        else:
+            self.writer.write_push('CONST', 0)
+        self.writer.write_return()
+
+    def generate_int(self, node: JackAST.IntConst) -> None:
+        self.writer.write_push('CONST', node.value)
+
+    def generate_string(self, node: JackAST.StringConst) -> None:
+        self.writer.write_push('CONST', len(node.value))
+        self.writer.write_call('String.new', 1)
+        for char in node.value:
+            self.writer.write_push('CONST', ord(char))
+            self.writer.write_call('String.appendChar', 2)
+
+    def generate_pooled_string(self, node: JackAST.PooledString) -> None:
+        # the static variable is 0 until the string is built, and a string
+        # is never at address 0
+        self.string_index_counter += 1
+        idx = self.string_index_counter
+        segment = self.segment_of(node.name)
+        index = self.table.index_of(node.name)
+        self.writer.write_push(segment, index)
+        self.writer.write_if(f"STRING_READY{idx}")
+        self.generate_string(node)
+        self.writer.write_pop(segment, index)
+        self.writer.write_label(f"STRING_READY{idx}")
+        self.writer.write_push(segment, index)
+
+    def generate_keyword(self, node: JackAST.KeywordConst) -> None:
+        if node.value == 'this':
+            self.writer.write_push('POINTER', 0)
+        else:
+            self.writer.write_push('CONST', 0)
+            if node.value == 'true':
+                self.writer.write_arithmetic('NOT')
+
+    def generate_var(self, node: JackAST.Var) -> None:
+        self.writer.write_push(self.segment_of(node.name),
+                               self.table.index_of(node.name))
+
+    def generate_array_ref(self, node: JackAST.ArrayRef) -> None:
+        self.generate(node.index)
+        self.writer.write_push(self.segment_of(node.name),
+                               self.table.index_of(node.name))
+        self.writer.write_arithmetic('ADD')
+        self.writer.write_pop('POINTER', 1)
+        self.writer.write_push('THAT', 0)
+
+    def generate_call(self, node: JackAST.Call) -> None:
+        # a method of an object gets the object as its first argument, and
+        # a call without a target is a method of this object
+        n_args = 1
+        if node.target is None:
+            name = f"{self.className}.{node.name}"
+            self.writer.write_push('POINTER', 0)
+        elif self.table.type_of(node.target):
+            name = f"{self.table.type_of(node.target)}.{node.name}"
+            self.writer.write_push(self.segment_of(node.target),
+                                   self.table.index_of(node.target))
+        else:
+            name = f"{node.target}.{node.name}"
+            n_args = 0
+        for arg in node.args:
+            self.generate(arg)
+        self.writer.write_call(name, n_args + len(node.args))
+
+    def generate_unary(self, node: JackAST.Unary) -> None:
+        self.generate(node.operand)
+        self.writer.write_arithmetic(UNARY_OP_COMMANDS[node.op])
+
+    def generate_binary(self, node: JackAST.Binary) -> None:
+        self.generate(node.left)
+        self.generate(node.right)
+        if node.op in OP_CALLS:
+            self.writer.write_call(OP_CALLS[node.op], 2)
+        else:
+            self.writer.write_arithmetic(OP_COMMANDS[node.op])
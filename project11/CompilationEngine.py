@@ -4,33 +4,70 @@ https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
 and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
 Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
-from JackTokenizer import JackTokenizer
+import typing
+from JackTokenizer import JackTokenizer, INT_CONST, KEYWORD, STRING_CONST
 from SymbolTable import SymbolTable
 from VMWriter import VMWriter
 
 INDENT = "  "
-OP = ["+", "-", "*", "/", "&", "|", "<", ">", "="]
-UANRY_OP = ["~", "-", "^", "#"]
-CLASS_VAR_DEC = ["static", "field"]
-CLASS_SUBROUTINE = ["function", "method", "constructor"]
+# the VM command of every binary operator, or the OS function it calls
+OP_COMMANDS = {"+": "ADD", "-": "SUB", "&": "AND", "|": "OR", "<": "LT",
+               ">": "GT", "=": "EQ"}
+OP_CALLS = {"*": "Math.multiply", "/": "Math.divide"}
+OP = frozenset(OP_COMMANDS).union(OP_CALLS)
+# the VM command of every unary operator
+UNARY_OP_COMMANDS = {"~": "NOT", "-": "NEG", "^": "shiftright",
+                     "#": "shiftleft"}
+UANRY_OP = frozenset(UNARY_OP_COMMANDS)
+CLASS_VAR_DEC = frozenset(["static", "field"])
+CLASS_SUBROUTINE = frozenset(["function", "method", "constructor"])
+# the segment of every kind of variable in the symbol table
+KIND_SEGMENTS = {"STATIC": "STATIC", "FIELD": "THIS", "ARG": "ARG",
+                 "VAR": "LOCAL"}
 
 
 class CompilationEngine:
-    def __init__(self, input_stream, output_stream) -> None:
+    def __init__(self, input_stream, output_stream,
+                 source_map: bool = False,
+                 writer: typing.Optional[VMWriter] = None) -> None:
         """
         Creates a new compilation engine with the given input and output. The
         next routine called must be compileClass()
         :param input_stream: The input stream.
         :param output_stream: The output stream.
+        :param source_map: Keep the Jack line of every VM command in the
+        writer, by the statement it belongs to.
+        :param writer: Writes the VM commands instead of a VMWriter of the
+        output stream, i.e a VMCommandWriter.
         """
         self.table = SymbolTable()
-        self.writer = VMWriter(output_stream)
+        if writer is None:
+            writer = VMWriter(output_stream, source_map)
+        self.writer = writer
         self.tokenizer = JackTokenizer(input_stream)
         self.counter = 0
         self.className = ""
-        self.compiled_text = ""
         self.while_index_counter = -1
         self.if_index_counter = -1
+        # the routine that compiles every kind of statement
+        self.statements = {"if": self.compile_if, "let": self.compile_let,
+                           "do": self.compile_do,
+                           "while": self.compile_while,
+                           "return": self.compile_return}
+
+    def segment_of(self, name: str) -> str:
+        """
+        Args:
+            name (str): name of a variable.
+
+        Returns:
+            str: the segment that holds the variable, by its kind.
+        """
+        kind = self.table.kind_of(name)
+        if kind is None:
+            raise ValueError(f"Line {self.tokenizer.line()}: undefined "
+                             f"variable {name!r}")
+        return KIND_SEGMENTS[kind]
 
     def compile_class(self) -> None:
         """Compiles a complete class."""
@@ -75,6 +112,7 @@ class CompilationEngine:
         """Compiles a complete method, function, or constructor."""
         # get "{func_type} {return_type} {func_name}("
         self.table.start_subroutine()
+        line = self.tokenizer.line()
         kind = self.tokenizer.get_name()
         self.tokenizer.advance()
         self.tokenizer.advance()  # advance over return type
@@ -92,6 +130,7 @@ class CompilationEngine:
         while self.tokenizer.get_name() == "var":
             self.compile_var_dec()
         numLocals = self.table.var_count('VAR')
+        self.writer.source_line = line
         self.writer.write_function(functionName, numLocals)
         if kind == "constructor":
             numOfFields = self.table.var_count('FIELD')
@@ -106,6 +145,7 @@ class CompilationEngine:
 
         # compile "}" and close tags
         self.tokenizer.advance()
+        self.writer.flush()
 
     def compile_parameter_list(self) -> None:
         """Compiles a (possibly empty) parameter list, not including the 
@@ -151,16 +191,12 @@ class CompilationEngine:
 
         while self.tokenizer.get_name() != "}":
             name = self.tokenizer.get_name()
-            if name == "if":
-                self.compile_if()
-            elif name == "let":
-                self.compile_let()
-            elif name == "do":
-                self.compile_do()
-            elif name == "while":
-                self.compile_while()
-            elif name == "return":
-                self.compile_return()
+            self.writer.source_line = self.tokenizer.line()
+            compile_statement = self.statements.get(name)
+            if compile_statement is None:
+                raise ValueError(f"Line {self.tokenizer.line()}: expected a "
+                                 f"statement, got {name!r}")
+            compile_statement()
 
     def compile_do(self) -> None:
         """Compiles a do statement."""
@@ -188,13 +224,17 @@ class CompilationEngine:
             subRoutineName += self.tokenizer.get_name()
             self.tokenizer.advance()
         self.tokenizer.advance()
-        # if was called from an object, add object to the expression list.
+        # if was called from an object, push the object as the first argument.
+        n_args = 0
         if isObject:
-            self.tokenizer.tokens.insert(self.tokenizer.currToken, objName)
+            kind = self.segment_of(objName)
+            self.writer.write_push(kind, self.table.index_of(objName))
+            n_args = 1
         elif not isDot:
             subRoutineName = self.className + "." + subRoutineName
-            self.tokenizer.tokens.insert(self.tokenizer.currToken, "this")
-        n_args = self.compile_expression_list()
+            self.writer.write_push('POINTER', 0)
+            n_args = 1
+        n_args += self.compile_expression_list()
         self.tokenizer.advance()  # jump over ")"
         self.writer.write_call(subRoutineName, n_args)
 
@@ -204,11 +244,7 @@ class CompilationEngine:
         self.tokenizer.advance()  # let
         varName = self.tokenizer.get_name()
         self.tokenizer.advance()
-        kind = self.table.kind_of(varName)  # need to review this in the end
-        if kind == 'VAR':
-            kind = 'LOCAL'
-        elif kind == 'FIELD':
-            kind = 'THIS'
+        kind = self.segment_of(varName)
         index = self.table.index_of(varName)
         if self.tokenizer.get_name() == "[":
             self.tokenizer.advance()  # advance past "["
@@ -237,6 +273,7 @@ class CompilationEngine:
         """Compiles a while statement."""
         self.while_index_counter += 1
         idx = self.while_index_counter
+        line = self.writer.source_line
         self.writer.write_label(f"WHILE_EXP{idx}")
         for i in range(2):
             self.tokenizer.advance()  # advance past 'while' and '('
@@ -246,6 +283,7 @@ class CompilationEngine:
             self.tokenizer.advance()  # advance past ')' and '{'
         self.writer.write_if(f"WHILE_END{idx}")
         self.compile_statements()
+        self.writer.source_line = line
         self.writer.write_goto(f"WHILE_EXP{idx}")
         self.writer.write_label(f"WHILE_END{idx}")
         self.tokenizer.advance()  # advance past '}'
@@ -254,7 +292,7 @@ class CompilationEngine:
         """Compiles a return statement."""
 
         self.tokenizer.advance()
-        if self.tokenizer.get_name() != ";":
+        if self.tokenizer.symbol() != ";":
             self.compile_expression()
         else:
             self.writer.write_push('CONST', 0)
@@ -266,6 +304,7 @@ class CompilationEngine:
         """Compiles a if statement, possibly with a trailing else clause."""
         self.if_index_counter += 1
         idx = self.if_index_counter
+        line = self.writer.source_line
         for i in range(2):
             self.tokenizer.advance()
         self.compile_expression()
@@ -276,6 +315,7 @@ class CompilationEngine:
         self.writer.write_goto(f"IF_FALSE{idx}")
         self.writer.write_label(f"IF_TRUE{idx}")
         self.compile_statements()
+        self.writer.source_line = line
         self.writer.write_goto(f"IF_END{idx}")
         self.tokenizer.advance()  # advance past '{'
         self.writer.write_label(f"IF_FALSE{idx}")
@@ -284,6 +324,7 @@ class CompilationEngine:
                 self.tokenizer.advance()
             self.compile_statements()
             self.tokenizer.advance()
+            self.writer.source_line = line
         self.writer.write_label(f"IF_END{idx}")
 
     def compile_expression(self) -> None:
@@ -293,52 +334,34 @@ class CompilationEngine:
             op = self.tokenizer.get_name()
             self.tokenizer.advance()
             self.compile_term()
-            if op == '*':
-                self.writer.write_call('Math.multiply', 2)
-            elif op == '/':
-                self.writer.write_call('Math.divide', 2)
-            elif op == '+':
-                self.writer.write_arithmetic('ADD')
-            elif op == '-':
-                self.writer.write_arithmetic('SUB')
-            elif op == '&':
-                self.writer.write_arithmetic('AND')
-            elif op == '|':
-                self.writer.write_arithmetic('OR')
-            elif op == '<':
-                self.writer.write_arithmetic('LT')
-            elif op == '>':
-                self.writer.write_arithmetic('GT')
-            elif op == '=':
-                self.writer.write_arithmetic('EQ')
+            if op in OP_CALLS:
+                self.writer.write_call(OP_CALLS[op], 2)
+            else:
+                self.writer.write_arithmetic(OP_COMMANDS[op])
 
     def compile_term(self) -> None:
-        nextToken = self.tokenizer.tokens[self.tokenizer.currToken + 1]
+        following = self.tokenizer.peek()
+        nextToken = following.value if following is not None else None
+        # a symbol is checked by its type, as a string can be "(" as well
+        symbol = self.tokenizer.symbol()
         # array var: x[5]
-        if self.tokenizer.get_name() == "(":
+        if symbol == "(":
             # write "("
             self.tokenizer.advance()
             # write expression inside brackets
             self.compile_expression()
             # write ")"
             self.tokenizer.advance()
-        elif self.tokenizer.get_name() in UANRY_OP:
-            unary_op = self.tokenizer.get_name()
+        elif symbol in UANRY_OP:
+            unary_op = symbol
             self.tokenizer.advance()
             self.compile_term()
-            if unary_op == '~':
-                self.writer.write_arithmetic('NOT')
-            elif unary_op == '-':
-                self.writer.write_arithmetic('NEG')
-            elif unary_op == '^':
-                self.writer.write_arithmetic('shiftright')
-            elif unary_op == '#':
-                self.writer.write_arithmetic('shiftleft')
-        elif self.tokenizer.token_type() == 'INT_CONST':
+            self.writer.write_arithmetic(UNARY_OP_COMMANDS[unary_op])
+        elif self.tokenizer.token_type() is INT_CONST:
             name = self.tokenizer.get_name()
             self.tokenizer.advance()
             self.writer.write_push('CONST', name)
-        elif self.tokenizer.token_type() == 'STRING_CONST':
+        elif self.tokenizer.token_type() is STRING_CONST:
             string = self.tokenizer.get_name()
             self.tokenizer.advance()
             self.writer.write_push('CONST', len(string))
@@ -346,7 +369,7 @@ class CompilationEngine:
             for char in string:
                 self.writer.write_push('CONST', ord(char))
                 self.writer.write_call('String.appendChar', 2)
-        elif self.tokenizer.token_type() == 'KEYWORD':
+        elif self.tokenizer.token_type() is KEYWORD:
             keyword = self.tokenizer.get_name()
             self.tokenizer.advance()
             if keyword == 'this':
@@ -365,11 +388,7 @@ class CompilationEngine:
                 self.compile_expression()  # expression
                 self.tokenizer.advance()  # ']'
                 array_index = self.table.index_of(array_var)
-                kind = self.table.kind_of(array_var)
-                if kind == 'VAR':
-                    kind = 'LOCAL'
-                elif kind == 'FIELD':
-                    kind = 'THIS'
+                kind = self.segment_of(array_var)
                 self.writer.write_push(kind, array_index)
                 self.writer.write_arithmetic('ADD')
                 self.writer.write_pop('POINTER', 1)
@@ -377,19 +396,14 @@ class CompilationEngine:
             else:
                 var = self.tokenizer.get_name()
                 self.tokenizer.advance()
-                kind = self.table.kind_of(var)
-                if kind == 'VAR':
-                    kind = 'LOCAL'
-                elif kind == 'FIELD':
-                    kind = 'THIS'
-                var_kind = kind
+                var_kind = self.segment_of(var)
                 index = self.table.index_of(var)
                 self.writer.write_push(var_kind, index)
 
     def compile_expression_list(self) -> int:
         """Compiles a (possibly empty) comma-separated list of expressions."""
         count = 0
-        while self.tokenizer.get_name() != ")":
+        while self.tokenizer.symbol() != ")":
             self.compile_expression()
             count += 1
             if self.tokenizer.get_name() == ",":
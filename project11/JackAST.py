@@ -0,0 +1,281 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+
+class Node:
+    """A node of the syntax tree of a Jack class. Every kind of node lists
+    the attributes that hold its children in fields, in the order they are
+    compiled, and keeps no per-instance dict.
+    """
+    __slots__ = ()
+    # the attributes that hold nodes or lists of nodes
+    fields = ()
+
+    def __eq__(self, other: typing.Any) -> bool:
+        return type(self) is type(other) and all(
+            getattr(self, slot) == getattr(other, slot)
+            for slot in self.__slots__)
+
+    # the passes change nodes in place, and many hold lists, so a hash of
+    # their values wouldn't last. nodes are compared by value, and can't be
+    # kept in sets or used as keys.
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{slot}={getattr(self, slot)!r}"
+                           for slot in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+# expressions
+
+
+class IntConst(Node):
+    __slots__ = ("value",)
+
+    def __init__(self, value: int) -> None:
+        self.value = value
+
+
+class StringConst(Node):
+    __slots__ = ("value",)
+
+    def __init__(self, value: str) -> None:
+        self.value = value
+
+
+class PooledString(Node):
+    """A string constant that is built once, the first time it is used,
+    into the static variable name, which all its uses share afterwards.
+    """
+    __slots__ = ("value", "name")
+
+    def __init__(self, value: str, name: str) -> None:
+        self.value = value
+        self.name = name
+
+
+class KeywordConst(Node):
+    """true, false, null or this."""
+    __slots__ = ("value",)
+
+    def __init__(self, value: str) -> None:
+        self.value = value
+
+
+class Var(Node):
+    __slots__ = ("name",)
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+
+class ArrayRef(Node):
+    """name[index]"""
+    __slots__ = ("name", "index")
+    fields = ("index",)
+
+    def __init__(self, name: str, index: Node) -> None:
+        self.name = name
+        self.index = index
+
+
+class Call(Node):
+    """A subroutine call: name(args), or target.name(args), where target is
+    a variable or a class name.
+    """
+    __slots__ = ("target", "name", "args")
+    fields = ("args",)
+
+    def __init__(self, target: typing.Optional[str], name: str,
+                 args: typing.List[Node]) -> None:
+        self.target = target
+        self.name = name
+        self.args = args
+
+
+class Unary(Node):
+    __slots__ = ("op", "operand")
+    fields = ("operand",)
+
+    def __init__(self, op: str, operand: Node) -> None:
+        self.op = op
+        self.operand = operand
+
+
+class Binary(Node):
+    """Jack has no operator precedence, so a op b op c is (a op b) op c."""
+    __slots__ = ("op", "left", "right")
+    fields = ("left", "right")
+
+    def __init__(self, op: str, left: Node, right: Node) -> None:
+        self.op = op
+        self.left = left
+        self.right = right
+
+
+# statements, with the line of their first token for source maps
+
+
+class Let(Node):
+    """let name = value, or let name[index] = value."""
+    __slots__ = ("name", "index", "value", "line")
+    fields = ("index", "value")
+
+    def __init__(self, name: str, index: typing.Optional[Node], value: Node,
+                 line: int) -> None:
+        self.name = name
+        self.index = index
+        self.value = value
+        self.line = line
+
+
+class If(Node):
+    __slots__ = ("condition", "then", "otherwise", "line")
+    fields = ("condition", "then", "otherwise")
+
+    def __init__(self, condition: Node, then: typing.List[Node],
+                 otherwise: typing.Optional[typing.List[Node]],
+                 line: int) -> None:
+        self.condition = condition
+        self.then = then
+        # the statements of the else clause, or None if there is none
+        self.otherwise = otherwise
+        self.line = line
+
+
+class While(Node):
+    __slots__ = ("condition", "body", "line")
+    fields = ("condition", "body")
+
+    def __init__(self, condition: Node, body: typing.List[Node],
+                 line: int) -> None:
+        self.condition = condition
+        self.body = body
+        self.line = line
+
+
+class Do(Node):
+    __slots__ = ("call", "line")
+    fields = ("call",)
+
+    def __init__(self, call: Call, line: int) -> None:
+        self.call = call
+        self.line = line
+
+
+class Return(Node):
+    __slots__ = ("value", "line")
+    fields = ("value",)
+
+    def __init__(self, value: typing.Optional[Node], line: int) -> None:
+        self.value = value
+        self.line = line
+
+
+# declarations
+
+
+class VarDec(Node):
+    """A declaration of one or more variables of the same kind and type."""
+    __slots__ = ("kind", "type", "names")
+
+    def __init__(self, kind: str, type: str,
+                 names: typing.List[str]) -> None:
+        # "STATIC", "FIELD", "ARG" or "VAR", like in the symbol table
+        self.kind = kind
+        self.type = type
+        self.names = names
+
+
+class Subroutine(Node):
+    __slots__ = ("kind", "return_type", "name", "parameters", "locals",
+                 "body", "line")
+    fields = ("body",)
+
+    def __init__(self, kind: str, return_type: str, name: str,
+                 parameters: typing.List[VarDec], locals: typing.List[VarDec],
+                 body: typing.List[Node], line: int) -> None:
+        # "constructor", "function" or "method"
+        self.kind = kind
+        self.return_type = return_type
+        self.name = name
+        self.parameters = parameters
+        self.locals = locals
+        self.body = body
+        self.line = line
+
+
+class Class(Node):
+    __slots__ = ("name", "variables", "subroutines")
+    fields = ("subroutines",)
+
+    def __init__(self, name: str, variables: typing.List[VarDec],
+                 subroutines: typing.List[Subroutine]) -> None:
+        self.name = name
+        self.variables = variables
+        self.subroutines = subroutines
+
+
+class Transformer:
+    """Walks a syntax tree and replaces its nodes, like ast.NodeTransformer.
+
+    visit() calls the method named visit_ and the name of the node's class,
+    or generic_visit() if there is none. generic_visit() visits the children
+    of the node, in the order they are compiled, and replaces each with the
+    result. In a list of statements, a visit may return a list of nodes to
+    put in place of the node, or None to remove it.
+    """
+
+    def visit(self, node: Node) -> typing.Any:
+        """
+        Args:
+            node (Node): a node of the tree.
+
+        Returns:
+            typing.Any: the node to put in its place.
+        """
+        method = getattr(self, "visit_" + type(node).__name__, None)
+        if method is None:
+            return self.generic_visit(node)
+        return method(node)
+
+    def generic_visit(self, node: Node) -> Node:
+        """Visits the children of the node in place.
+
+        Args:
+            node (Node): a node of the tree.
+
+        Returns:
+            Node: the node itself.
+        """
+        for field in node.fields:
+            child = getattr(node, field)
+            if isinstance(child, list):
+                setattr(node, field, self.visit_list(child))
+            elif child is not None:
+                setattr(node, field, self.visit(child))
+        return node
+
+    def visit_list(self, nodes: typing.List[Node]) -> typing.List[Node]:
+        """
+        Args:
+            nodes (typing.List[Node]): a list of statements, subroutines or
+                arguments.
+
+        Returns:
+            typing.List[Node]: the list, with every node visited.
+        """
+        result = []
+        for node in nodes:
+            new = self.visit(node)
+            if isinstance(new, list):
+                result.extend(new)
+            elif new is not None:
+                result.append(new)
+        return result
@@ -4,21 +4,248 @@ https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
 and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
 Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import concurrent.futures
 import os
 import sys
+import time
 import typing
 from CompilationEngine import CompilationEngine
+from CodeGenerator import CodeGenerator
+from JackParser import JackParser
+import JackAST
+from Optimizer import PASSES, DEFAULT_PASSES, DEFAULT_POOL_SIZE, plan_pools, \
+    run_passes
+from VMWriter import VMCommand, VMCommandWriter, VMWriter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the build cache is shared with the assembler in project06. the path is
+# appended, so our own modules come first where the names clash.
+sys.path.append(os.path.join(ROOT, "project06"))
+from BuildCache import BuildCache  # noqa: E402
+
+# the source map of an output file is written next to it, with this suffix
+MAP_EXTENSION = ".map"
+# outputs are written to a temporary file with this suffix, until the class
+# compiles
+TEMP_EXTENSION = ".tmp"
+
+
+def compile_class(input_file: typing.TextIO, writer: VMWriter,
+                  passes: typing.Optional[typing.List[str]] = None,
+                  pool_size: int = DEFAULT_POOL_SIZE) -> None:
+    """Compiles a single class with the given writer.
+
+    Args:
+        input_file (typing.TextIO): the file to compile.
+        writer (VMWriter): writes the VM commands.
+        passes (typing.Optional[typing.List[str]]): if given, the class is
+            parsed into a syntax tree, these passes run over it, and the
+            code is generated from the tree. Otherwise it is compiled in a
+            single pass while it is parsed.
+        pool_size (int): the most static variables the strings pass may
+            add to the class, see plan_string_pools.
+    """
+    if passes is None:
+        CompilationEngine(input_file, None, writer=writer).compile_class()
+    else:
+        tree = run_passes(JackParser(input_file).parse_class(), passes,
+                          pool_size)
+        CodeGenerator(writer).generate_class(tree)
+
 
 def compile_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+        input_file: typing.TextIO, output_file: typing.TextIO,
+        map_file: typing.Optional[typing.TextIO] = None,
+        passes: typing.Optional[typing.List[str]] = None,
+        pool_size: int = DEFAULT_POOL_SIZE) -> None:
     """Compiles a single file.
 
     Args:
         input_file (typing.TextIO): the file to compile.
         output_file (typing.TextIO): writes all output to this file.
+        map_file (typing.Optional[typing.TextIO]): if given, the source map
+            of VM lines to Jack lines is written to this file.
+        passes (typing.Optional[typing.List[str]]): optimization passes,
+            see compile_class.
+        pool_size (int): the size of the string pool, see compile_class.
+    """
+    writer = VMWriter(output_file, map_file is not None)
+    compile_class(input_file, writer, passes, pool_size)
+    if map_file is not None:
+        writer.write_source_map(
+            os.path.basename(getattr(input_file, "name", "")), map_file)
+
+
+def compile_commands(
+        input_file: typing.TextIO,
+        passes: typing.Optional[typing.List[str]] = None,
+        pool_size: int = DEFAULT_POOL_SIZE) -> typing.List[VMCommand]:
+    """Compiles a single file into VM commands, without writing them as
+    text.
+
+    Args:
+        input_file (typing.TextIO): the file to compile.
+        passes (typing.Optional[typing.List[str]]): optimization passes,
+            see compile_class.
+        pool_size (int): the size of the string pool, see compile_class.
+
+    Returns:
+        typing.List[VMCommand]: the commands of the class, in order, in the
+        form the VM translator parses them.
+    """
+    writer = VMCommandWriter()
+    compile_class(input_file, writer, passes, pool_size)
+    return writer.commands
+
+
+def compile_path(input_path: str,
+                 cache: typing.Optional[BuildCache] = None,
+                 source_map: bool = False,
+                 passes: typing.Optional[typing.List[str]] = None,
+                 pool_size: int = DEFAULT_POOL_SIZE) \
+        -> typing.Tuple[float, bool]:
+    """Compiles a single .jack file into a .vm file next to it. This runs in
+    worker processes in parallel mode.
+
+    Args:
+        input_path (str): path of the .jack file.
+        cache (typing.Optional[BuildCache]): if given, unchanged inputs are
+            copied from the cache instead of being compiled again.
+        source_map (bool): also write the source map of the output, next to
+            it with MAP_EXTENSION added.
+        passes (typing.Optional[typing.List[str]]): optimization passes,
+            see compile_class.
+        pool_size (int): the size of the string pool, see compile_class.
+
+    Returns:
+        typing.Tuple[float, bool]: the time it took to compile the file, in
+        seconds, and whether the output was taken from the cache.
     """
-    engine = CompilationEngine(input_file, output_file)
-    engine.compile_class()
+    start = time.perf_counter()
+    output_path = os.path.splitext(input_path)[0] + ".vm"
+    map_path = output_path + MAP_EXTENSION
+    if cache is not None:
+        # a class is compiled on its own, so its code depends only on
+        # the contents of its file and the options. the map names the file
+        # as well.
+        options = [] if passes is None else \
+            ["passes"] + passes + [str(pool_size)]
+        key = cache.key(BuildCache.hash_file(input_path), *options)
+        map_key = cache.key(BuildCache.hash_file(input_path), *options,
+                            os.path.basename(input_path), MAP_EXTENSION)
+        if cache.fetch(key, output_path) and \
+                (not source_map or cache.fetch(map_key, map_path)):
+            return time.perf_counter() - start, True
+    # the code is written per subroutine, so a class that fails midway would
+    # leave code that looks valid. the outputs are written to temporary
+    # files next to them instead, which replace them only if the whole
+    # class compiles, and a failure removes the outputs altogether.
+    outputs = [output_path] + ([map_path] if source_map else [])
+    temp_paths = [f"{path}.{os.getpid()}{TEMP_EXTENSION}" for path in outputs]
+    try:
+        with open(input_path, 'r') as input_file, \
+                open(temp_paths[0], 'w') as output_file:
+            if source_map:
+                with open(temp_paths[1], 'w') as map_file:
+                    compile_file(input_file, output_file, map_file, passes,
+                                 pool_size)
+            else:
+                compile_file(input_file, output_file, passes=passes,
+                             pool_size=pool_size)
+    except BaseException:
+        for path in temp_paths + outputs:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    for temp_path, path in zip(temp_paths, outputs):
+        os.replace(temp_path, path)
+    if cache is not None:
+        cache.store(key, output_path)
+        if source_map:
+            cache.store(map_key, map_path)
+    return time.perf_counter() - start, False
+
+
+def plan_string_pools(
+        input_paths: typing.List[str],
+        passes: typing.Optional[typing.List[str]] = None) -> typing.List[int]:
+    """Splits the static variables the strings pass may add between the
+    given files, which are compiled into one program, so their string pools
+    fit in RAM together. Every file is parsed for this first, if the pass
+    runs at all.
+
+    Args:
+        input_paths (typing.List[str]): paths of all the files to compile.
+        passes (typing.Optional[typing.List[str]]): optimization passes,
+            see compile_class.
+
+    Returns:
+        typing.List[int]: the size of the string pool of every file, in
+        order.
+    """
+    if passes is None or "strings" not in passes:
+        return [DEFAULT_POOL_SIZE] * len(input_paths)
+    trees = []
+    for input_path in input_paths:
+        try:
+            with open(input_path, 'r') as input_file:
+                trees.append(JackParser(input_file).parse_class())
+        except Exception:
+            # the file fails again when it is compiled, and is reported then
+            trees.append(JackAST.Class("", [], []))
+    return plan_pools(trees)
+
+
+def compile_parallel(input_paths: typing.List[str], jobs: int,
+                     cache: typing.Optional[BuildCache] = None,
+                     source_map: bool = False,
+                     passes: typing.Optional[typing.List[str]] = None,
+                     pool_sizes: typing.Optional[typing.List[int]] = None) \
+        -> int:
+    """Compiles the given files in a pool of worker processes, printing each
+    file and its timing as it finishes. Every class is compiled on its own,
+    so the output files are identical to the serial ones, and a file that
+    fails doesn't stop the others.
+
+    Args:
+        input_paths (typing.List[str]): paths of the files to compile.
+        jobs (int): number of worker processes.
+        cache (typing.Optional[BuildCache]): the build cache, if any. A hit
+            or a miss is recorded in it for every file the workers compile.
+        source_map (bool): also write the source map of every output.
+        passes (typing.Optional[typing.List[str]]): optimization passes,
+            see compile_class.
+        pool_sizes (typing.Optional[typing.List[int]]): the size of the
+            string pool of every file, see plan_string_pools.
+
+    Returns:
+        int: the number of files that failed to compile.
+    """
+    if pool_sizes is None:
+        pool_sizes = [DEFAULT_POOL_SIZE] * len(input_paths)
+    failures = 0
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(compile_path, input_path, cache, source_map,
+                               passes, pool_size): input_path
+                   for input_path, pool_size in zip(input_paths, pool_sizes)}
+        for done, future in enumerate(
+                concurrent.futures.as_completed(futures), 1):
+            name = os.path.basename(futures[future])
+            try:
+                seconds, cached = future.result()
+                if cache is not None:
+                    cache.record(cached)
+                print(f"[{done}/{len(futures)}] {name} {seconds:.3f}s"
+                      f"{' (cached)' if cached else ''}", flush=True)
+            except Exception as error:
+                failures += 1
+                print(f"[{done}/{len(futures)}] {name} failed: {error}",
+                      file=sys.stderr, flush=True)
+    print(f"compiled {len(input_paths) - failures} of {len(input_paths)} "
+          f"files in {time.perf_counter() - start:.3f}s with {jobs} jobs")
+    return failures
 
 
 if "__main__" == __name__:
@@ -27,20 +254,58 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: JackCompiler <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    arg_parser = argparse.ArgumentParser(prog="JackCompiler")
+    arg_parser.add_argument("input_path")
+    arg_parser.add_argument(
+        "--cache", nargs="?", const="", metavar="DIR",
+        help="skip unchanged files using a build cache, by default in "
+             "$N2T_CACHE_DIR or ~/.cache/nand2tetris")
+    arg_parser.add_argument(
+        "--source-map", action="store_true",
+        help="also write the Jack line of every VM command to a .map file "
+             "next to the output")
+    arg_parser.add_argument(
+        "--optimize", action="store_true",
+        help="compile through a syntax tree, and run the default "
+             "optimization passes over it")
+    arg_parser.add_argument(
+        "--passes", nargs="*", choices=list(PASSES), metavar="PASS",
+        help="compile through a syntax tree, and run these passes over it, "
+             f"in order. can be: {', '.join(PASSES)}")
+    arg_parser.add_argument(
+        "--jobs", type=int,
+        help="compile the files in N worker processes, reporting per-file "
+             "timings")
+    args = arg_parser.parse_args()
+    passes = args.passes
+    if args.optimize:
+        passes = DEFAULT_PASSES if passes is None else passes
+    cache = None if args.cache is None else BuildCache(
+        "JackCompiler", args.cache or None,
+        source_dir=os.path.dirname(os.path.abspath(__file__)))
+    argument_path = os.path.abspath(args.input_path)
     if os.path.isdir(argument_path):
         files_to_assemble = [
             os.path.join(argument_path, filename)
             for filename in os.listdir(argument_path)]
     else:
         files_to_assemble = [argument_path]
-    for input_path in files_to_assemble:
-        filename, extension = os.path.splitext(input_path)
-        if extension.lower() != ".jack":
-            continue
-        output_path = filename + ".vm"
-        with open(input_path, 'r') as input_file, \
-                open(output_path, 'w') as output_file:
-            compile_file(input_file, output_file)
+    files_to_assemble = sorted(
+        input_path for input_path in files_to_assemble
+        if os.path.splitext(input_path)[1].lower() == ".jack")
+    pool_sizes = plan_string_pools(files_to_assemble, passes)
+    if args.jobs:
+        failures = compile_parallel(files_to_assemble, args.jobs, cache,
+                                    args.source_map, passes, pool_sizes)
+    else:
+        failures = 0
+        for input_path, pool_size in zip(files_to_assemble, pool_sizes):
+            _, cached = compile_path(input_path, cache, args.source_map,
+                                     passes, pool_size)
+            if cache is not None:
+                cache.record(cached)
+    if cache is not None:
+        cache.prune()
+        print(cache.summary())
+    if failures:
+        sys.exit(1)
@@ -0,0 +1,246 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+import JackAST
+from JackTokenizer import JackTokenizer, INT_CONST, KEYWORD, STRING_CONST, \
+    SYMBOL
+from CompilationEngine import OP, UANRY_OP, CLASS_VAR_DEC, CLASS_SUBROUTINE
+
+
+class JackParser:
+    """Parses a Jack class into a syntax tree, by the same grammar as
+    CompilationEngine, which compiles while it parses instead.
+    """
+
+    def __init__(self, input_stream: typing.TextIO) -> None:
+        """
+        Args:
+            input_stream (typing.TextIO): the Jack code of a single class.
+        """
+        self.tokenizer = JackTokenizer(input_stream)
+        # the routine that parses every kind of statement
+        self.statements = {"if": self.parse_if, "let": self.parse_let,
+                           "do": self.parse_do, "while": self.parse_while,
+                           "return": self.parse_return}
+
+    def take(self) -> typing.Any:
+        """
+        Returns:
+            typing.Any: the value of the current token, after advancing
+            past it.
+        """
+        value = self.tokenizer.get_name()
+        self.tokenizer.advance()
+        return value
+
+    def expect(self, symbol: str) -> None:
+        """Advances past the current token, which has to be the given one.
+
+        Args:
+            symbol (str): the expected keyword or symbol.
+        """
+        if self.tokenizer.get_name() != symbol:
+            raise ValueError(f"Line {self.tokenizer.line()}: expected "
+                             f"{symbol!r}, got {self.tokenizer.get_name()!r}")
+        self.tokenizer.advance()
+
+    def parse_class(self) -> JackAST.Class:
+        """
+        Returns:
+            JackAST.Class: the whole class.
+        """
+        self.tokenizer.advance()
+        self.expect("class")
+        name = self.take()
+        self.expect("{")
+        variables = []
+        while self.tokenizer.get_name() in CLASS_VAR_DEC:
+            kind = self.take().upper()
+            variables.append(self.parse_var_names(kind))
+        subroutines = []
+        while self.tokenizer.get_name() in CLASS_SUBROUTINE:
+            subroutines.append(self.parse_subroutine())
+        if self.tokenizer.get_name() != "}":
+            raise ValueError(f"Line {self.tokenizer.line()}: expected '}}', "
+                             f"got {self.tokenizer.get_name()!r}")
+        return JackAST.Class(name, variables, subroutines)
+
+    def parse_var_names(self, kind: str) -> JackAST.VarDec:
+        """Parses "type name, name, ... ;" after the keyword of a
+        declaration.
+
+        Args:
+            kind (str): the kind of the variables, i.e "VAR".
+
+        Returns:
+            JackAST.VarDec: the declaration.
+        """
+        var_type = self.take()
+        names = [self.take()]
+        while self.tokenizer.get_name() == ",":
+            self.tokenizer.advance()
+            names.append(self.take())
+        self.expect(";")
+        return JackAST.VarDec(kind, var_type, names)
+
+    def parse_subroutine(self) -> JackAST.Subroutine:
+        """
+        Returns:
+            JackAST.Subroutine: a complete method, function, or constructor.
+        """
+        line = self.tokenizer.line()
+        kind = self.take()
+        return_type = self.take()
+        name = self.take()
+        self.expect("(")
+        parameters = []
+        while self.tokenizer.get_name() != ")":
+            var_type = self.take()
+            parameters.append(JackAST.VarDec("ARG", var_type, [self.take()]))
+            if self.tokenizer.get_name() == ",":
+                self.tokenizer.advance()
+        self.tokenizer.advance()  # advance over ")"
+        self.expect("{")
+        local_vars = []
+        while self.tokenizer.get_name() == "var":
+            self.tokenizer.advance()
+            local_vars.append(self.parse_var_names("VAR"))
+        body = self.parse_statements()
+        self.tokenizer.advance()  # advance over "}"
+        return JackAST.Subroutine(kind, return_type, name, parameters,
+                                  local_vars, body, line)
+
+    def parse_statements(self) -> typing.List[JackAST.Node]:
+        """
+        Returns:
+            typing.List[JackAST.Node]: the statements up to the closing "}",
+            which is the current token afterwards.
+        """
+        statements = []
+        while self.tokenizer.get_name() != "}":
+            name = self.tokenizer.get_name()
+            parse_statement = self.statements.get(name)
+            if parse_statement is None:
+                raise ValueError(f"Line {self.tokenizer.line()}: expected a "
+                                 f"statement, got {name!r}")
+            statements.append(parse_statement(self.tokenizer.line()))
+        return statements
+
+    def parse_block(self) -> typing.List[JackAST.Node]:
+        """
+        Returns:
+            typing.List[JackAST.Node]: the statements of "{ statements }".
+        """
+        self.expect("{")
+        statements = self.parse_statements()
+        self.tokenizer.advance()  # advance past "}"
+        return statements
+
+    def parse_let(self, line: int) -> JackAST.Let:
+        self.tokenizer.advance()  # let
+        name = self.take()
+        index = None
+        if self.tokenizer.get_name() == "[":
+            self.tokenizer.advance()
+            index = self.parse_expression()
+            self.expect("]")
+        self.expect("=")
+        value = self.parse_expression()
+        self.expect(";")
+        return JackAST.Let(name, index, value, line)
+
+    def parse_if(self, line: int) -> JackAST.If:
+        self.tokenizer.advance()  # if
+        self.expect("(")
+        condition = self.parse_expression()
+        self.expect(")")
+        then = self.parse_block()
+        otherwise = None
+        if self.tokenizer.get_name() == "else":
+            self.tokenizer.advance()
+            otherwise = self.parse_block()
+        return JackAST.If(condition, then, otherwise, line)
+
+    def parse_while(self, line: int) -> JackAST.While:
+        self.tokenizer.advance()  # while
+        self.expect("(")
+        condition = self.parse_expression()
+        self.expect(")")
+        return JackAST.While(condition, self.parse_block(), line)
+
+    def parse_do(self, line: int) -> JackAST.Do:
+        self.tokenizer.advance()  # do
+        call = self.parse_call()
+        self.expect(";")
+        return JackAST.Do(call, line)
+
+    def parse_return(self, line: int) -> JackAST.Return:
+        self.tokenizer.advance()  # return
+        value = None
+        if self.tokenizer.symbol() != ";":
+            value = self.parse_expression()
+        self.expect(";")
+        return JackAST.Return(value, line)
+
+    def parse_call(self) -> JackAST.Call:
+        """
+        Returns:
+            JackAST.Call: the subroutine call that starts at the current
+            token.
+        """
+        target = None
+        name = self.take()
+        if self.tokenizer.get_name() == ".":
+            self.tokenizer.advance()
+            target, name = name, self.take()
+        self.expect("(")
+        args = []
+        while self.tokenizer.symbol() != ")":
+            args.append(self.parse_expression())
+            if self.tokenizer.get_name() == ",":
+                self.tokenizer.advance()
+        self.tokenizer.advance()  # advance past ")"
+        return JackAST.Call(target, name, args)
+
+    def parse_expression(self) -> JackAST.Node:
+        expression = self.parse_term()
+        while self.tokenizer.get_name() in OP:
+            op = self.take()
+            expression = JackAST.Binary(op, expression, self.parse_term())
+        return expression
+
+    def parse_term(self) -> JackAST.Node:
+        token_type = self.tokenizer.token_type()
+        name = self.tokenizer.get_name()
+        if token_type is SYMBOL and name == "(":
+            self.tokenizer.advance()
+            expression = self.parse_expression()
+            self.expect(")")
+            return expression
+        elif token_type is SYMBOL and name in UANRY_OP:
+            self.tokenizer.advance()
+            return JackAST.Unary(name, self.parse_term())
+        elif token_type is INT_CONST:
+            self.tokenizer.advance()
+            return JackAST.IntConst(name)
+        elif token_type is STRING_CONST:
+            self.tokenizer.advance()
+            return JackAST.StringConst(name)
+        elif token_type is KEYWORD:
+            self.tokenizer.advance()
+            return JackAST.KeywordConst(name)
+        following = self.tokenizer.peek()
+        next_token = following.value if following is not None else None
+        if next_token == "(" or next_token == ".":
+            return self.parse_call()
+        self.tokenizer.advance()
+        if next_token == "[":
+            self.tokenizer.advance()
+            index = self.parse_expression()
+            self.expect("]")
+            return JackAST.ArrayRef(name, index)
+        return JackAST.Var(name)
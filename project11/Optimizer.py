@@ -0,0 +1,400 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import copy
+import typing
+import JackAST
+
+# the largest integer constant of Jack, and the range of a 16-bit word
+MAX_CONSTANT = 32767
+WORD_MASK = 0xFFFF
+SIGN_BIT = 0x8000
+# the values of the keyword constants, this isn't a constant
+KEYWORD_VALUES = {"true": -1, "false": 0, "null": 0}
+# a call of Math.divide that recurses deeper than this never returns
+MAX_DIVIDE_DEPTH = 16
+# the static variables of pooled strings are named by this prefix and a
+# number, which no Jack identifier can be
+POOL_PREFIX = "$string"
+# the static variables of all the classes of a program are kept in RAM 16
+# to 255, so a program can't have more
+MAX_STATICS = 240
+# the pool of a program takes at most this many static variables, which
+# leaves room for classes that are compiled on their own, like the OS
+DEFAULT_POOL_SIZE = 64
+
+
+def word(value: int) -> int:
+    """
+    Returns:
+        int: the value as a signed 16-bit word, wrapped around like the
+        Hack ALU does.
+    """
+    value &= WORD_MASK
+    return value - (1 << 16) if value & SIGN_BIT else value
+
+
+def os_divide(x: int, y: int, depth: int = 0) -> typing.Optional[int]:
+    """Divides like Math.divide of the OS in project 12, with its 16-bit
+    overflows: it rounds towards zero, but doubling y overflows for some
+    big x, and then the call never returns.
+
+    Returns:
+        typing.Optional[int]: the result of Math.divide(x, y), or None if
+        the call never returns.
+    """
+    if depth > MAX_DIVIDE_DEPTH:
+        return None
+    x_negative, y_negative = x < 0, y < 0
+    # Math.abs(-32768) is -32768
+    x, y = (x if x > 0 else word(-x)), (y if y > 0 else word(-y))
+    if y > x:
+        return 0
+    q = os_divide(x, word(y + y), depth + 1)
+    if q is None:
+        return None
+    if word(x - word(word(2 * q) * y)) < y:
+        answer = word(q + q)
+    else:
+        answer = word(q + q + 1)
+    return answer if x_negative == y_negative else word(-answer)
+
+
+# the result of every operator on constants, as the VM code computes it
+UNARY_FOLDS = {"-": lambda x: word(-x), "~": lambda x: word(~x),
+               "#": lambda x: word(x << 1), "^": lambda x: x >> 1}
+BINARY_FOLDS = {"+": lambda x, y: word(x + y), "-": lambda x, y: word(x - y),
+                "*": lambda x, y: word(x * y), "/": os_divide,
+                "&": lambda x, y: word(x & y), "|": lambda x, y: word(x | y),
+                "<": lambda x, y: -1 if x < y else 0,
+                ">": lambda x, y: -1 if x > y else 0,
+                "=": lambda x, y: -1 if x == y else 0}
+
+
+def constant_value(node: JackAST.Node) -> typing.Optional[int]:
+    """
+    Returns:
+        typing.Optional[int]: the value of the node as a signed word, if it
+        is a constant: an integer, true, false, null, or - or ~ of an
+        integer. None otherwise.
+    """
+    if isinstance(node, JackAST.IntConst):
+        return node.value if node.value <= MAX_CONSTANT else None
+    elif isinstance(node, JackAST.KeywordConst):
+        return KEYWORD_VALUES.get(node.value)
+    elif isinstance(node, JackAST.Unary) and node.op in "-~" and \
+            isinstance(node.operand, JackAST.IntConst):
+        value = constant_value(node.operand)
+        return None if value is None else UNARY_FOLDS[node.op](value)
+    return None
+
+
+def constant_node(value: int) -> JackAST.Node:
+    """
+    Args:
+        value (int): a signed word.
+
+    Returns:
+        JackAST.Node: the shortest expression of the value, since integer
+        constants can't be negative.
+    """
+    if value >= 0:
+        return JackAST.IntConst(value)
+    elif value == -SIGN_BIT:
+        return JackAST.Unary("~", JackAST.IntConst(MAX_CONSTANT))
+    return JackAST.Unary("-", JackAST.IntConst(-value))
+
+
+def is_simple(node: JackAST.Node) -> bool:
+    """
+    Returns:
+        bool: True if the node is cheap, and computing it has no side
+        effects, so it can be computed twice or not at all: a constant, a
+        variable, or an array entry at such an index.
+    """
+    if isinstance(node, JackAST.ArrayRef):
+        return isinstance(node.index, (JackAST.IntConst, JackAST.Var))
+    return isinstance(node, (JackAST.IntConst, JackAST.KeywordConst,
+                             JackAST.Var)) or constant_value(node) is not None
+
+
+def power_of_two(value: int) -> typing.Optional[int]:
+    """
+    Returns:
+        typing.Optional[int]: k if abs(value) is 2 ** k, otherwise None.
+    """
+    value = abs(value)
+    if value and not value & (value - 1):
+        return value.bit_length() - 1
+    return None
+
+
+class RemoveUnreachable(JackAST.Transformer):
+    """Removes the statements that follow a return in the same block, as
+    they never run.
+    """
+
+    def visit_list(self, nodes: typing.List[JackAST.Node]) \
+            -> typing.List[JackAST.Node]:
+        nodes = super().visit_list(nodes)
+        for index, node in enumerate(nodes):
+            if isinstance(node, JackAST.Return):
+                return nodes[:index + 1]
+        return nodes
+
+
+class FoldConstants(JackAST.Transformer):
+    """Computes the operators whose operands are constants, and sums the
+    constants of e + c1 + c2, with the same 16-bit arithmetic as the VM
+    code. A division that Math.divide never returns from is kept.
+    """
+
+    def visit_Unary(self, node: JackAST.Unary) -> JackAST.Node:
+        self.generic_visit(node)
+        value = constant_value(node.operand)
+        if value is None:
+            return node
+        return constant_node(UNARY_FOLDS[node.op](value))
+
+    def visit_Binary(self, node: JackAST.Binary) -> JackAST.Node:
+        self.generic_visit(node)
+        right = constant_value(node.right)
+        if right is not None:
+            left = constant_value(node.left)
+            if left is not None:
+                value = BINARY_FOLDS[node.op](left, right)
+                if value is not None:
+                    return constant_node(value)
+            elif node.op in "+-":
+                return self.fold_sum(node, right)
+        return node
+
+    @staticmethod
+    def fold_sum(node: JackAST.Binary, right: int) -> JackAST.Node:
+        """
+        Args:
+            node (JackAST.Binary): e + c or e - c, where e isn't a constant.
+            right (int): the value of c.
+
+        Returns:
+            JackAST.Node: the node, with the constants of e + c1 + c summed.
+        """
+        total = right if node.op == "+" else word(-right)
+        expression = node.left
+        if isinstance(expression, JackAST.Binary) and expression.op in "+-":
+            inner = constant_value(expression.right)
+            if inner is not None:
+                total = word(total + (inner if expression.op == "+"
+                                      else -inner))
+                expression = expression.left
+        if total == 0:
+            return expression
+        elif total < 0 and total != -SIGN_BIT:
+            return JackAST.Binary("-", expression, JackAST.IntConst(-total))
+        return JackAST.Binary("+", expression, constant_node(total))
+
+
+class ReduceStrength(JackAST.Transformer):
+    """Replaces multiplication and division by a power of two, which call
+    the OS, with the shiftleft (#) and shiftright (^) operators. x * 2 ** k
+    is x shifted left k times. x / 2 ** k rounds towards zero like
+    Math.divide, so negative x are first rounded up by 2 ** k - 1.
+    Math.divide(-32768, y) is 0, as abs(-32768) is negative, so the result
+    is masked to 0 for that x. This needs x more than once, and is done
+    only if x is simple.
+    """
+
+    def visit_Binary(self, node: JackAST.Binary) -> JackAST.Node:
+        self.generic_visit(node)
+        if node.op == "*":
+            # the constant can be on either side, as it has no side effects
+            for constant, operand in ((node.right, node.left),
+                                      (node.left, node.right)):
+                value = constant_value(constant)
+                if value is not None:
+                    reduced = self.multiply(operand, value)
+                    if reduced is not None:
+                        return reduced
+        elif node.op == "/":
+            value = constant_value(node.right)
+            if value is not None:
+                reduced = self.divide(node.left, value)
+                if reduced is not None:
+                    return reduced
+        return node
+
+    @staticmethod
+    def shift(node: JackAST.Node, op: str, times: int) -> JackAST.Node:
+        for _ in range(times):
+            node = JackAST.Unary(op, node)
+        return node
+
+    def multiply(self, node: JackAST.Node,
+                 value: int) -> typing.Optional[JackAST.Node]:
+        """
+        Returns:
+            typing.Optional[JackAST.Node]: node * value without a call, or
+            None if there is no such expression.
+        """
+        if value == 0:
+            return JackAST.IntConst(0) if is_simple(node) else None
+        k = power_of_two(value)
+        if k is None:
+            return None
+        shifted = self.shift(node, "#", k)
+        return shifted if value > 0 else JackAST.Unary("-", shifted)
+
+    def divide(self, node: JackAST.Node,
+               value: int) -> typing.Optional[JackAST.Node]:
+        """
+        Returns:
+            typing.Optional[JackAST.Node]: node / value without a call, or
+            None if there is no such expression.
+        """
+        k = power_of_two(value)
+        if k is None or value == -SIGN_BIT or not is_simple(node):
+            return None
+        # ~(x = -32768) is 0 for that x and -1 otherwise
+        not_min = JackAST.Unary("~", JackAST.Binary(
+            "=", copy.deepcopy(node), constant_node(-SIGN_BIT)))
+        if k > 0:
+            # (x < 0) is -1 for negative x, so this adds 2 ** k - 1 to them
+            negative = JackAST.Binary("<", copy.deepcopy(node),
+                                      JackAST.IntConst(0))
+            node = JackAST.Binary("+", node, JackAST.Binary(
+                "&", negative, JackAST.IntConst((1 << k) - 1)))
+        shifted = self.shift(node, "^", k)
+        if value < 0:
+            shifted = JackAST.Unary("-", shifted)
+        return JackAST.Binary("&", shifted, not_min)
+
+
+class PoolStrings(JackAST.Transformer):
+    """Builds every string constant of a class once, the first time it is
+    used, instead of every time, and shares the string between all the uses
+    of the same constant. The strings are kept in new static variables of
+    the class.
+
+    The pool only takes pool_size constants, and the rest are built every
+    time. Since the static variables of all the classes share RAM 16 to
+    255, the classes compiled together split a single budget between their
+    pools, see plan_pools. The budget can't account for classes that are
+    compiled separately, so it is kept small by default.
+
+    A program that changes or disposes of a string constant sees the change
+    in the next use, so this pass isn't in the default pipeline.
+    """
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE) -> None:
+        # the static variable of every string constant, by its value
+        self.pool = {}
+        # the number of static variables the pool can add to the class
+        self.pool_size = pool_size
+        self.free_statics = pool_size
+
+    def visit_Class(self, node: JackAST.Class) -> JackAST.Class:
+        self.pool = {}
+        # a class still can't have more statics than a program
+        self.free_statics = min(self.pool_size, MAX_STATICS - count_statics(
+            [node]))
+        self.generic_visit(node)
+        if self.pool:
+            node.variables.append(JackAST.VarDec(
+                "STATIC", "String", list(self.pool.values())))
+        return node
+
+    def visit_StringConst(self, node: JackAST.StringConst) \
+            -> JackAST.Node:
+        if node.value not in self.pool:
+            if len(self.pool) >= self.free_statics:
+                return node
+            self.pool[node.value] = f"{POOL_PREFIX}{len(self.pool)}"
+        return JackAST.PooledString(node.value, self.pool[node.value])
+
+
+class StringConstants(JackAST.Transformer):
+    """Collects the distinct string constants of a tree, without changing
+    it.
+    """
+
+    def __init__(self) -> None:
+        self.values = set()
+
+    def visit_StringConst(self, node: JackAST.StringConst) \
+            -> JackAST.Node:
+        self.values.add(node.value)
+        return node
+
+
+def count_statics(trees: typing.Iterable[JackAST.Class]) -> int:
+    """
+    Args:
+        trees (typing.Iterable[JackAST.Class]): syntax trees of classes.
+
+    Returns:
+        int: the number of static variables the classes declare.
+    """
+    return sum(len(declaration.names) for tree in trees
+               for declaration in tree.variables
+               if declaration.kind == "STATIC")
+
+
+def plan_pools(trees: typing.List[JackAST.Class],
+               pool_size: int = DEFAULT_POOL_SIZE) -> typing.List[int]:
+    """Splits the static variables a program has left between the string
+    pools of its classes, in order, so the pools of all the classes fit in
+    RAM together. This runs before any class is compiled, so every class
+    can then be compiled on its own.
+
+    Args:
+        trees (typing.List[JackAST.Class]): syntax trees of all the classes
+            of the program, before any pass runs over them.
+        pool_size (int): the most static variables all the pools may take.
+
+    Returns:
+        typing.List[int]: the pool size of every class, in order.
+    """
+    free_statics = max(0, min(pool_size, MAX_STATICS - count_statics(trees)))
+    sizes = []
+    for tree in trees:
+        collector = StringConstants()
+        collector.visit(tree)
+        # the passes before the pool only ever remove constants, so this is
+        # as many as the class can need
+        size = min(len(collector.values), free_statics)
+        sizes.append(size)
+        free_statics -= size
+    return sizes
+
+
+# the passes over the syntax tree of a class, by name. every pass is a
+# Transformer, and the default pipeline runs the safe ones in this order.
+PASSES = {"unreachable": RemoveUnreachable, "fold": FoldConstants,
+          "strength": ReduceStrength, "strings": PoolStrings}
+DEFAULT_PASSES = ["unreachable", "fold", "strength"]
+
+
+def run_passes(tree: JackAST.Class, passes: typing.Iterable[str],
+               pool_size: int = DEFAULT_POOL_SIZE) -> JackAST.Class:
+    """
+    Args:
+        tree (JackAST.Class): the syntax tree of a class.
+        passes (typing.Iterable[str]): names of passes, in the order to run
+            them.
+        pool_size (int): the most static variables the strings pass may
+            add to the class.
+
+    Returns:
+        JackAST.Class: the tree after all the passes.
+    """
+    for name in passes:
+        if name not in PASSES:
+            raise ValueError(f"Unknown pass: {name}")
+        if PASSES[name] is PoolStrings:
+            tree = PoolStrings(pool_size).visit(tree)
+        else:
+            tree = PASSES[name]().visit(tree)
+    return tree
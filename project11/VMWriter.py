@@ -6,15 +6,95 @@ Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 import typing
 
+# the VM name of every segment
+SEGMENTS = {"CONST": "constant", "ARG": "argument", "LOCAL": "local",
+            "STATIC": "static", "THIS": "this", "THAT": "that",
+            "POINTER": "pointer", "TEMP": "temp"}
+
+
+class VMCommand(typing.NamedTuple):
+    """A VM command, in the same form as the commands that the Parser of the
+    VM translator (project 8) reads from .vm files.
+    """
+    # one of the VMWriter command types, i.e VMWriter.C_PUSH
+    cmd_type: str
+    # the first argument, or the command itself for arithmetic commands
+    arg1: typing.Optional[str] = None
+    # the second argument of push, pop, function and call
+    arg2: typing.Optional[int] = None
+
 
 class VMWriter:
     """
     Writes VM commands into a file. Encapsulates the VM command syntax.
+
+    The commands are kept in a list of chunks of text, which flush() writes
+    to the output stream and empties, so the output of a class is never
+    held in memory as a whole.
     """
-    def __init__(self, output_stream: typing.TextIO) -> None:
-        """Creates a new file and prepares it for writing VM commands."""
-        self.vmCode = ""
+    # C command types, the same as in the Parser of the VM translator
+    C_MATH = "C_ARITHMETIC"
+    C_PUSH = "C_PUSH"
+    C_POP = "C_POP"
+    C_LABEL = "C_LABEL"
+    C_GOTO = "C_GOTO"
+    C_IFGOTO = "C_IF-GOTO"
+    C_FUNCTION = "C_FUNCTION"
+    C_RETURN = "C_RETURN"
+    C_CALL = "C_CALL"
+    # the keyword of every type of command but arithmetic
+    COMMAND_WORDS = {C_PUSH: "push", C_POP: "pop", C_LABEL: "label",
+                     C_GOTO: "goto", C_IFGOTO: "if-goto",
+                     C_FUNCTION: "function", C_RETURN: "return",
+                     C_CALL: "call"}
+
+    def __init__(self, output_stream: typing.Optional[typing.TextIO],
+                 source_map: bool = False) -> None:
+        """Creates a new file and prepares it for writing VM commands.
+
+        Args:
+            output_stream (typing.Optional[typing.TextIO]): output stream.
+            source_map (bool): keep the Jack line of every command, which is
+                set in source_line before the command is written.
+        """
+        # the lines of text that weren't written to the output yet
+        self.chunks = []
         self.output = output_stream
+        self.source_line = 0
+        # (VM line, Jack line) at the start of every run of commands from
+        # the same Jack line, if a source map is kept
+        self.source_map = [] if source_map else None
+        self.command_count = 0
+
+    def add(self, cmd_type: str, arg1: typing.Optional[str] = None,
+            arg2: typing.Optional[int] = None) -> None:
+        """Buffers a single VM command.
+
+        Args:
+            cmd_type (str): the type of the command, i.e VMWriter.C_PUSH.
+            arg1 (typing.Optional[str]): the first argument, or the command
+                itself for arithmetic commands.
+            arg2 (typing.Optional[int]): the second argument, if any.
+        """
+        if cmd_type == VMWriter.C_MATH:
+            self.chunks.append(arg1 + "\n")
+        elif arg2 is not None:
+            self.chunks.append(
+                f"{VMWriter.COMMAND_WORDS[cmd_type]} {arg1} {arg2}\n")
+        elif arg1 is not None:
+            self.chunks.append(f"{VMWriter.COMMAND_WORDS[cmd_type]} {arg1}\n")
+        else:
+            self.chunks.append(VMWriter.COMMAND_WORDS[cmd_type] + "\n")
+        if self.source_map is not None:
+            self.map_command()
+
+    def map_command(self) -> None:
+        """Counts a command that was just added, and starts a new run in the
+        source map if its Jack line differs from the previous command's.
+        """
+        self.command_count += 1
+        if not self.source_map or self.source_map[-1][1] != self.source_line:
+            self.source_map.append((self.command_count, self.source_line))
 
     def write_push(self, segment: str, index: int) -> None:
         """Writes a VM push command.
@@ -24,12 +104,7 @@ class VMWriter:
             "LOCAL", "STATIC", "THIS", "THAT", "POINTER", "TEMP"
             index (int): the index to push to.
         """
-        seg = segment.lower()
-        if seg == "const":
-            seg = "constant"
-        elif seg == "arg":
-            seg = "argument"
-        self.vmCode += f"push {seg} {index}\n"
+        self.add(VMWriter.C_PUSH, SEGMENTS[segment], index)
 
     def write_pop(self, segment: str, index: int) -> None:
         """Writes a VM pop command.
@@ -39,12 +114,7 @@ class VMWriter:
             "LOCAL", "STATIC", "THIS", "THAT", "POINTER", "TEMP".
             index (int): the index to pop from.
         """
-        seg = segment.lower()
-        if seg == "const":
-            seg = "constant"
-        elif seg == "arg":
-            seg = "argument"
-        self.vmCode += f"pop {seg} {index}\n"
+        self.add(VMWriter.C_POP, SEGMENTS[segment], index)
 
     def write_arithmetic(self, command: str) -> None:
         """Writes a VM arithmetic command.
@@ -53,7 +123,7 @@ class VMWriter:
             command (str): the command to write, can be "ADD", "SUB", "NEG", 
             "EQ", "GT", "LT", "AND", "OR", "NOT".
         """
-        self.vmCode += command.lower() + "\n"
+        self.add(VMWriter.C_MATH, command.lower())
 
     def write_label(self, label: str) -> None:
         """Writes a VM label command.
@@ -61,7 +131,7 @@ class VMWriter:
         Args:
             label (str): the label to write.
         """
-        self.vmCode += f"label {label}\n"
+        self.add(VMWriter.C_LABEL, label)
 
     def write_goto(self, label: str) -> None:
         """Writes a VM goto command.
@@ -69,7 +139,7 @@ class VMWriter:
         Args:
             label (str): the label to go to.
         """
-        self.vmCode += f"goto {label}\n"
+        self.add(VMWriter.C_GOTO, label)
 
     def write_if(self, label: str) -> None:
         """Writes a VM if-goto command.
@@ -77,7 +147,7 @@ class VMWriter:
         Args:
             label (str): the label to go to.
         """
-        self.vmCode += f"if-goto {label}\n"
+        self.add(VMWriter.C_IFGOTO, label)
 
     def write_call(self, name: str, n_args: int) -> None:
         """Writes a VM call command.
@@ -86,7 +156,7 @@ class VMWriter:
             name (str): the name of the function to call.
             n_args (int): the number of arguments the function receives.
         """
-        self.vmCode += f"call {name} {n_args}\n"
+        self.add(VMWriter.C_CALL, name, n_args)
 
     def write_function(self, name: str, n_locals: int) -> None:
         """Writes a VM function command.
@@ -95,11 +165,73 @@ class VMWriter:
             name (str): the name of the function.
             n_locals (int): the number of local variables the function uses.
         """
-        self.vmCode += f"function {name} {n_locals}\n"
+        self.add(VMWriter.C_FUNCTION, name, n_locals)
 
     def write_return(self) -> None:
         """Writes a VM return command."""
-        self.vmCode += "return\n"
+        self.add(VMWriter.C_RETURN)
+
+    def flush(self) -> None:
+        """Writes the buffered commands to the output stream. Called at the
+        end of every subroutine.
+        """
+        if self.chunks:
+            self.output.write("".join(self.chunks))
+            self.chunks = []
+
+    def write(self) -> None:
+        """Writes the rest of the commands, once the class is compiled."""
+        self.flush()
+        self.output.write("\n")
+
+    def write_source_map(self, source_name: str,
+                         map_file: typing.TextIO) -> None:
+        """Writes the side-car source map of the VM code. The first line is
+        the name of the Jack file, and every following line starts a run of
+        commands, "line jack_line": the VM commands from the given line of
+        the output up to the next run came from the given Jack line.
+
+        Args:
+            source_name (str): name of the Jack file.
+            map_file (typing.TextIO): writes the map to this file.
+        """
+        runs = [source_name] + [f"{line} {source_line}"
+                                for line, source_line in self.source_map]
+        map_file.write("\n".join(runs) + "\n")
+
+
+class VMCommandWriter(VMWriter):
+    """Keeps the VM commands of a class in memory as VMCommand tuples
+    instead of writing them as text, for tools that use the compiled code
+    directly, like the VM interpreter of project 8.
+    """
+
+    def __init__(self, source_map: bool = False) -> None:
+        """Creates an empty list of commands.
+
+        Args:
+            source_map (bool): keep the Jack line of every command, like
+                VMWriter does.
+        """
+        super().__init__(None, source_map)
+        self.commands = []
+
+    def add(self, cmd_type: str, arg1: typing.Optional[str] = None,
+            arg2: typing.Optional[int] = None) -> None:
+        """Keeps a single VM command.
+
+        Args:
+            cmd_type (str): the type of the command, i.e VMWriter.C_PUSH.
+            arg1 (typing.Optional[str]): the first argument, or the command
+                itself for arithmetic commands.
+            arg2 (typing.Optional[int]): the second argument, if any.
+        """
+        self.commands.append(VMCommand(cmd_type, arg1, arg2))
+        if self.source_map is not None:
+            self.map_command()
+
+    def flush(self) -> None:
+        """The commands stay in the list, there is nothing to write."""
 
     def write(self) -> None:
-        print(self.vmCode, file=self.output)
+        """The commands stay in the list, there is nothing to write."""